@@ -0,0 +1,51 @@
+"""contract mtm snapshots
+
+Revision ID: a41c7e9d2b10
+Revises: 7d64abbea6e4
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a41c7e9d2b10"
+down_revision: Union[str, None] = '7d64abbea6e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'contract_mtm_snapshots',
+        sa.Column('contract_id', sa.Integer(), nullable=False),
+        sa.Column('farm_id', sa.Integer(), nullable=False),
+        sa.Column('cbot_symbol', sa.String(length=30), nullable=True),
+        sa.Column('cbot_ref_mes', sa.Date(), nullable=True),
+        sa.Column('fx_ref_mes', sa.Date(), nullable=True),
+        sa.Column('as_of_ts', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('dirty', sa.Boolean(), server_default='false', nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['contract_id'], ['contracts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['farm_id'], ['farms.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('contract_id'),
+    )
+    op.create_index(op.f('ix_contract_mtm_snapshots_farm_id'), 'contract_mtm_snapshots', ['farm_id'], unique=False)
+    op.create_index(op.f('ix_contract_mtm_snapshots_dirty'), 'contract_mtm_snapshots', ['dirty'], unique=False)
+    op.create_index('ix_contract_mtm_snapshots_farm_cbot', 'contract_mtm_snapshots', ['farm_id', 'cbot_symbol', 'cbot_ref_mes'], unique=False)
+    op.create_index('ix_contract_mtm_snapshots_farm_fx', 'contract_mtm_snapshots', ['farm_id', 'fx_ref_mes'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contract_mtm_snapshots_farm_fx', table_name='contract_mtm_snapshots')
+    op.drop_index('ix_contract_mtm_snapshots_farm_cbot', table_name='contract_mtm_snapshots')
+    op.drop_index(op.f('ix_contract_mtm_snapshots_dirty'), table_name='contract_mtm_snapshots')
+    op.drop_index(op.f('ix_contract_mtm_snapshots_farm_id'), table_name='contract_mtm_snapshots')
+    op.drop_table('contract_mtm_snapshots')
@@ -0,0 +1,81 @@
+"""latest quote tables (cbot_quotes_latest / fx_curve_latest)
+
+Revision ID: b7e2f0c4d913
+Revises: a41c7e9d2b10
+Create Date: 2026-10-18 10:41:03.552918
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e2f0c4d913"
+down_revision: Union[str, None] = 'a41c7e9d2b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'cbot_quotes_latest',
+        sa.Column('farm_id', sa.Integer(), nullable=False),
+        sa.Column('symbol', sa.String(length=30), nullable=False),
+        sa.Column('ref_mes', sa.Date(), nullable=False),
+        sa.Column('quote_id', sa.Integer(), nullable=False),
+        sa.Column('source_id', sa.Integer(), nullable=False),
+        sa.Column('capturado_em', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('price_usd_per_bu', sa.Numeric(precision=18, scale=6), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['farm_id'], ['farms.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['source_id'], ['cbot_sources.id'], ondelete='RESTRICT'),
+        sa.PrimaryKeyConstraint('farm_id', 'symbol', 'ref_mes'),
+    )
+    op.create_table(
+        'fx_curve_latest',
+        sa.Column('farm_id', sa.Integer(), nullable=False),
+        sa.Column('ref_mes', sa.Date(), nullable=False),
+        sa.Column('run_id', sa.Integer(), nullable=False),
+        sa.Column('as_of_ts', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('t_anos', sa.Numeric(precision=18, scale=8), nullable=False),
+        sa.Column('dolar_sint', sa.Numeric(precision=18, scale=6), nullable=False),
+        sa.Column('dolar_desc', sa.Numeric(precision=18, scale=6), nullable=False),
+        sa.Column('model_version', sa.String(length=80), nullable=False),
+        sa.Column('source', sa.String(length=40), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['farm_id'], ['farms.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('farm_id', 'ref_mes'),
+    )
+
+    # backfill a partir do histórico (mesmo critério de desempate do MTM)
+    op.execute(
+        """
+        INSERT INTO cbot_quotes_latest (farm_id, symbol, ref_mes, quote_id, source_id, capturado_em, price_usd_per_bu)
+        SELECT DISTINCT ON (farm_id, symbol, ref_mes)
+               farm_id, symbol, ref_mes, id, source_id, capturado_em, price_usd_per_bu
+          FROM cbot_quotes
+         WHERE ref_mes IS NOT NULL
+         ORDER BY farm_id, symbol, ref_mes, capturado_em DESC, id DESC
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO fx_curve_latest (farm_id, ref_mes, run_id, as_of_ts, t_anos, dolar_sint, dolar_desc, model_version, source)
+        SELECT DISTINCT ON (r.farm_id, p.ref_mes)
+               r.farm_id, p.ref_mes, r.id, r.as_of_ts, p.t_anos, p.dolar_sint, p.dolar_desc, r.model_version, r.source
+          FROM fx_model_points p
+          JOIN fx_model_runs r ON r.id = p.run_id
+         ORDER BY r.farm_id, p.ref_mes, r.as_of_ts DESC, r.id DESC, p.id DESC
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('fx_curve_latest')
+    op.drop_table('cbot_quotes_latest')
@@ -0,0 +1,59 @@
+"""contract lock coverage (ton travado por tipo)
+
+Revision ID: c5a9e31f7b24
+Revises: b7e2f0c4d913
+Create Date: 2026-10-18 14:02:17.406335
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5a9e31f7b24"
+down_revision: Union[str, None] = 'b7e2f0c4d913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'contract_lock_coverage',
+        sa.Column('contract_id', sa.Integer(), nullable=False),
+        sa.Column('farm_id', sa.Integer(), nullable=False),
+        sa.Column('cbot_ton', sa.Numeric(precision=14, scale=6), server_default='0', nullable=False),
+        sa.Column('premium_ton', sa.Numeric(precision=14, scale=6), server_default='0', nullable=False),
+        sa.Column('fx_ton', sa.Numeric(precision=14, scale=6), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['contract_id'], ['contracts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['farm_id'], ['farms.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('contract_id'),
+    )
+    op.create_index(op.f('ix_contract_lock_coverage_farm_id'), 'contract_lock_coverage', ['farm_id'], unique=False)
+
+    # backfill a partir das travas existentes
+    op.execute(
+        """
+        INSERT INTO contract_lock_coverage (contract_id, farm_id, cbot_ton, premium_ton, fx_ton)
+        SELECT c.id, c.farm_id,
+               COALESCE(hc.ton, 0), COALESCE(hp.ton, 0), COALESCE(hf.ton, 0)
+          FROM contracts c
+          LEFT JOIN (SELECT contract_id, SUM(volume_ton) AS ton FROM hedge_cbot GROUP BY contract_id) hc
+                 ON hc.contract_id = c.id
+          LEFT JOIN (SELECT contract_id, SUM(volume_ton) AS ton FROM hedge_premium GROUP BY contract_id) hp
+                 ON hp.contract_id = c.id
+          LEFT JOIN (SELECT contract_id, SUM(volume_ton) AS ton FROM hedge_fx GROUP BY contract_id) hf
+                 ON hf.contract_id = c.id
+         WHERE hc.ton IS NOT NULL OR hp.ton IS NOT NULL OR hf.ton IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_contract_lock_coverage_farm_id'), table_name='contract_lock_coverage')
+    op.drop_table('contract_lock_coverage')
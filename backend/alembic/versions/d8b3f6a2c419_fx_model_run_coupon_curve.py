@@ -0,0 +1,28 @@
+"""fx model run coupon curve (estrutura a termo do cupom)
+
+Revision ID: d8b3f6a2c419
+Revises: f1a9c3e27b48
+Create Date: 2026-10-18 17:41:05.218734
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d8b3f6a2c419"
+down_revision: Union[str, None] = 'f1a9c3e27b48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('fx_model_runs', sa.Column('coupon_curve', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('fx_model_runs', 'coupon_curve')
@@ -0,0 +1,28 @@
+"""fx model run persist reason
+
+Revision ID: e4c7a1d95b36
+Revises: d8b3f6a2c419
+Create Date: 2026-10-18 19:12:44.603918
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4c7a1d95b36"
+down_revision: Union[str, None] = 'd8b3f6a2c419'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('fx_model_runs', sa.Column('persist_reason', sa.String(length=20), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('fx_model_runs', 'persist_reason')
@@ -0,0 +1,30 @@
+"""cbot source poll stats
+
+Revision ID: f1a9c3e27b48
+Revises: c5a9e31f7b24
+Create Date: 2026-10-18 21:05:12.118204
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f1a9c3e27b48"
+down_revision: Union[str, None] = 'c5a9e31f7b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('cbot_sources', sa.Column('poll_stats', sa.JSON(), nullable=True))
+    op.add_column('cbot_sources', sa.Column('poll_stats_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('cbot_sources', 'poll_stats_at')
+    op.drop_column('cbot_sources', 'poll_stats')
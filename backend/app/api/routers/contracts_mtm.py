@@ -1,18 +1,88 @@
 # app/api/routers/contracts_mtm.py
+from datetime import datetime, timezone
+from typing import Iterator
+
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_farm_membership_from_path
-from app.db.session import get_db
-from app.schemas.contracts_mtm import ContractsMtmResponse
-from app.services.contracts_mtm_service import ContractsMtmService
+from app.core.deps import get_current_user, get_farm_membership_from_path
+from app.db.session import SessionLocal, get_db
+from app.models.user import User
+from app.schemas.contracts_mtm import (
+    ContractsMtmCacheStats,
+    ContractsMtmConsolidatedResponse,
+    ContractMtmRow,
+    ContractsMtmHistoryResponse,
+    ContractsMtmResponse,
+    ContractsMtmScenariosResponse,
+    ContractsMtmStreamFooter,
+    ContractsMtmStreamHeader,
+    ContractsMtmStreamRow,
+    ContractsMtmSummaryResponse,
+)
+from app.services.contracts_mtm_consolidated_service import ContractsMtmConsolidatedService
+from app.services.contracts_mtm_history_service import ContractsMtmHistoryService
+from app.services.contracts_mtm_scenarios_service import ContractsMtmScenariosService
+from app.services.contracts_mtm_service import ContractsMtmService, _parse_ref_mes
+from app.services.contracts_mtm_snapshot_service import ContractsMtmSnapshotService
+from app.services.contracts_mtm_summary_service import ContractsMtmSummaryService
+from app.services.mtm_cache import CachedJson, mtm_cache, mtm_version_vector
 
 router = APIRouter(
     prefix="/farms/{farm_id}/contracts-mtm",
     tags=["Contracts MTM"],
 )
 
+# visão consolidada (todas as farms do usuário)
+me_router = APIRouter(
+    prefix="/me/contracts-mtm",
+    tags=["Contracts MTM"],
+)
+
 service = ContractsMtmService()
+snapshot_service = ContractsMtmSnapshotService()
+summary_service = ContractsMtmSummaryService()
+scenarios_service = ContractsMtmScenariosService()
+history_service = ContractsMtmHistoryService()
+consolidated_service = ContractsMtmConsolidatedService()
+
+
+def _ndjson(db: Session, header: ContractsMtmStreamHeader, rows: Iterator[ContractMtmRow]) -> Iterator[str]:
+    # a sessão do stream é própria: o get_db fecha a dele antes do corpo ser enviado
+    try:
+        yield header.model_dump_json() + "\n"
+        n = 0
+        for row in rows:
+            n += 1
+            yield ContractsMtmStreamRow(row=row).model_dump_json() + "\n"
+        footer = ContractsMtmStreamFooter(rows=n, finished_ts=datetime.now(timezone.utc), next_cursor=header.next_cursor)
+        yield footer.model_dump_json() + "\n"
+    finally:
+        db.close()
+
+
+def _cache_key(farm_id: int, **params) -> tuple:
+    """Parâmetros normalizados: variações equivalentes da mesma consulta caem na mesma entrada."""
+    symbol = params["default_symbol"].strip()
+    types, states, _ = service.lock_filters(params["lock_types"], params["lock_states"], params["no_locks"])
+    projection = service.row_projection(params["fields"])
+    return (
+        farm_id,
+        params["source"],
+        params["mode"],
+        params["only_open"],
+        _parse_ref_mes(params["ref_mes"]),
+        "AUTO" if symbol.upper() == "AUTO" else symbol,
+        params["limit"],
+        params["after_id"],
+        tuple(sorted(types)),
+        tuple(sorted(states)),
+        params["no_locks"],
+        params["detail"],
+        tuple(sorted(projection)) if projection is not None else None,
+        params["as_of"],
+    )
 
 
 @router.get("", response_model=ContractsMtmResponse)
@@ -29,6 +99,11 @@ def contracts_mtm(
         description="CBOT: 'AUTO' usa o vencimento do mês do contrato. Ou informe símbolo fixo (ex: ZS=F).",
     ),
     limit: int = Query(default=200, ge=1, le=2000),
+    after_id: int | None = Query(
+        default=None,
+        ge=1,
+        description="Keyset: use o next_cursor da resposta anterior para buscar a próxima página.",
+    ),
 
     # lock filters
     lock_types: str | None = Query(default=None, description="CSV: cbot,premium,fx"),
@@ -40,10 +115,178 @@ def contracts_mtm(
         description="Se true, retorna apenas contratos sem travas (ex: FIXO_BRL). Ignora lock_types/lock_states.",
     ),
 
+    source: str = Query(
+        default="live",
+        pattern="^(live|snapshot)$",
+        description=(
+            "snapshot: lê de contract_mtm_snapshots (recalcula só contratos desatualizados). "
+            "Só vale com ref_mes vazio e default_symbol=AUTO; fora isso, cai no live."
+        ),
+    ),
+
+    detail: str = Query(
+        default="full",
+        pattern="^(summary|full)$",
+        description="summary: não monta valuation.components (breakdown de debug).",
+    ),
+    fields: str | None = Query(
+        default=None,
+        description="CSV de seções da linha: locks,quotes,valuation,totals,totals_view,filter_meta (contract sempre vem).",
+    ),
+
+    as_of: datetime | None = Query(
+        default=None,
+        description="Reavalia no passado: travas executadas até as_of e último mercado <= as_of (ignora source=snapshot).",
+    ),
+
+    fmt: str = Query(
+        default="json",
+        alias="format",
+        pattern="^(json|ndjson)$",
+        description="ndjson: stream (application/x-ndjson) com 1 linha header, 1 por contrato e 1 footer.",
+    ),
+
+    db: Session = Depends(get_db),
+    membership=Depends(get_farm_membership_from_path),
+):
+    use_snapshot = (
+        source == "snapshot" and not ref_mes and default_symbol.strip().upper() == "AUTO" and as_of is None
+    )
+
+    if fmt == "ndjson":
+        stream_db = SessionLocal()
+        try:
+            if use_snapshot:
+                header, rows = snapshot_service.stream_contracts_mtm(
+                    db=stream_db,
+                    farm_id=farm_id,
+                    mode=mode,
+                    only_open=only_open,
+                    limit=limit,
+                    lock_types=lock_types,
+                    lock_states=lock_states,
+                    no_locks=no_locks,
+                    detail=detail,
+                    fields=fields,
+                    after_id=after_id,
+                )
+            else:
+                header, rows = service.stream_contracts_mtm(
+                    db=stream_db,
+                    farm_id=farm_id,
+                    mode=mode,
+                    only_open=only_open,
+                    ref_mes=ref_mes,
+                    default_symbol=default_symbol,
+                    limit=limit,
+                    lock_types=lock_types,
+                    lock_states=lock_states,
+                    no_locks=no_locks,
+                    detail=detail,
+                    fields=fields,
+                    after_id=after_id,
+                    as_of=as_of,
+                )
+        except Exception:
+            stream_db.close()
+            raise
+
+        return StreamingResponse(_ndjson(stream_db, header, rows), media_type="application/x-ndjson")
+
+    def compute() -> ContractsMtmResponse:
+        if use_snapshot:
+            return snapshot_service.contracts_mtm(
+                db=db,
+                farm_id=farm_id,
+                mode=mode,
+                only_open=only_open,
+                limit=limit,
+                lock_types=lock_types,
+                lock_states=lock_states,
+                no_locks=no_locks,
+                detail=detail,
+                fields=fields,
+                after_id=after_id,
+            )
+
+        return service.contracts_mtm(
+            db=db,
+            farm_id=farm_id,
+            mode=mode,
+            only_open=only_open,
+            ref_mes=ref_mes,
+            default_symbol=default_symbol,
+            limit=limit,
+            lock_types=lock_types,
+            lock_states=lock_states,
+            no_locks=no_locks,
+            detail=detail,
+            fields=fields,
+            after_id=after_id,
+            as_of=as_of,
+        )
+
+    # ✅ mesma consulta + mesmas versões de entrada => resposta já calculada
+    key = _cache_key(
+        farm_id,
+        source="snapshot" if use_snapshot else "live",
+        mode=mode,
+        only_open=only_open,
+        ref_mes=ref_mes,
+        default_symbol=default_symbol,
+        limit=limit,
+        after_id=after_id,
+        lock_types=lock_types,
+        lock_states=lock_states,
+        no_locks=no_locks,
+        detail=detail,
+        fields=fields,
+        as_of=as_of,
+    )
+    cached = mtm_cache.get_or_compute(
+        key, mtm_version_vector(db, farm_id), lambda: CachedJson.of(compute()), lambda c: c.rows
+    )
+    return Response(content=cached.body, media_type="application/json")
+
+
+@router.get("/cache-stats", response_model=ContractsMtmCacheStats)
+def contracts_mtm_cache_stats(
+    farm_id: int,
+    membership=Depends(get_farm_membership_from_path),
+):
+    # contadores do processo (todas as farms)
+    return mtm_cache.stats()
+
+
+@router.get("/summary", response_model=ContractsMtmSummaryResponse)
+def contracts_mtm_summary(
+    farm_id: int,
+    mode: str = Query(default="both", pattern="^(system|manual|both)$"),
+    only_open: bool = Query(default=True),
+    ref_mes: str | None = Query(
+        default=None,
+        description="YYYY-MM-30; se informado, força o ref_mes para FX (CBOT usa ref_mes do hedge/contrato).",
+    ),
+    default_symbol: str = Query(
+        default="AUTO",
+        description="CBOT: 'AUTO' usa o vencimento do mês do contrato. Ou informe símbolo fixo (ex: ZS=F).",
+    ),
+    limit: int = Query(default=2000, ge=1, le=20000),
+
+    # lock filters (mesma semântica do contracts-mtm: soma totals * slice_pct)
+    lock_types: str | None = Query(default=None, description="CSV: cbot,premium,fx"),
+    lock_states: str | None = Query(default=None, description="CSV: locked,open"),
+    no_locks: bool = Query(default=False, description="Se true, só contratos sem travas (ex: FIXO_BRL)."),
+
+    group_by: str | None = Query(
+        default=None,
+        description="CSV: delivery_month,pricing_type,lock_state (padrão: as três).",
+    ),
+
     db: Session = Depends(get_db),
     membership=Depends(get_farm_membership_from_path),
 ):
-    return service.contracts_mtm(
+    return summary_service.summary(
         db=db,
         farm_id=farm_id,
         mode=mode,
@@ -54,4 +297,107 @@ def contracts_mtm(
         lock_types=lock_types,
         lock_states=lock_states,
         no_locks=no_locks,
+        group_by=group_by,
+    )
+
+
+@router.get("/scenarios", response_model=ContractsMtmScenariosResponse)
+def contracts_mtm_scenarios(
+    farm_id: int,
+    mode: str = Query(default="both", pattern="^(system|manual|both)$"),
+    only_open: bool = Query(default=True),
+    ref_mes: str | None = Query(
+        default=None,
+        description="YYYY-MM-30; se informado, força o ref_mes para FX (CBOT usa ref_mes do hedge/contrato).",
+    ),
+    default_symbol: str = Query(
+        default="AUTO",
+        description="CBOT: 'AUTO' usa o vencimento do mês do contrato. Ou informe símbolo fixo (ex: ZS=F).",
+    ),
+    limit: int = Query(default=2000, ge=1, le=20000),
+
+    # grade de choques (produto cartesiano dos eixos; vazio = 0)
+    cbot_cents: str | None = Query(default=None, description="CSV de cents/bu (ex: -50,-20,0,20,50)."),
+    fx_spot_pct: str | None = Query(default=None, description="CSV de % sobre o spot (ex: -5,0,5)."),
+    coupon_bp: str | None = Query(default=None, description="CSV de bp no cupom anual da curva system (ex: -100,0,100)."),
+    premium_usd_bu: str | None = Query(default=None, description="CSV de prêmio USD/bu na parte sem trava."),
+
+    db: Session = Depends(get_db),
+    membership=Depends(get_farm_membership_from_path),
+):
+    return scenarios_service.scenarios(
+        db=db,
+        farm_id=farm_id,
+        mode=mode,
+        only_open=only_open,
+        ref_mes=ref_mes,
+        default_symbol=default_symbol,
+        limit=limit,
+        cbot_cents=cbot_cents,
+        fx_spot_pct=fx_spot_pct,
+        coupon_bp=coupon_bp,
+        premium_usd_bu=premium_usd_bu,
+    )
+
+
+@router.get("/history", response_model=ContractsMtmHistoryResponse)
+def contracts_mtm_history(
+    farm_id: int,
+    from_ts: datetime = Query(alias="from", description="Início da janela (ISO 8601; sem fuso = UTC)."),
+    to_ts: datetime = Query(alias="to", description="Fim da janela; travas consideradas são as executadas até aqui."),
+    step: int = Query(default=15, ge=1, le=1440, description="Intervalo entre pontos, em minutos."),
+    mode: str = Query(default="both", pattern="^(system|manual|both)$"),
+    only_open: bool = Query(default=True),
+    ref_mes: str | None = Query(
+        default=None,
+        description="YYYY-MM-30; se informado, força o ref_mes para FX (CBOT usa ref_mes do hedge/contrato).",
+    ),
+    default_symbol: str = Query(
+        default="AUTO",
+        description="CBOT: 'AUTO' usa o vencimento do mês do contrato. Ou informe símbolo fixo (ex: ZS=F).",
+    ),
+    limit: int = Query(default=2000, ge=1, le=20000),
+
+    db: Session = Depends(get_db),
+    membership=Depends(get_farm_membership_from_path),
+):
+    return history_service.history(
+        db=db,
+        farm_id=farm_id,
+        mode=mode,
+        only_open=only_open,
+        ref_mes=ref_mes,
+        default_symbol=default_symbol,
+        limit=limit,
+        from_ts=from_ts,
+        to_ts=to_ts,
+        step_minutes=step,
+    )
+
+
+@me_router.get("", response_model=ContractsMtmConsolidatedResponse)
+def my_contracts_mtm(
+    mode: str = Query(default="both", pattern="^(system|manual|both)$"),
+    only_open: bool = Query(default=True),
+    ref_mes: str | None = Query(
+        default=None,
+        description="YYYY-MM-30; se informado, força o ref_mes para FX (CBOT usa ref_mes do hedge/contrato).",
+    ),
+    default_symbol: str = Query(
+        default="AUTO",
+        description="CBOT: 'AUTO' usa o vencimento do mês do contrato. Ou informe símbolo fixo (ex: ZS=F).",
+    ),
+    limit: int = Query(default=2000, ge=1, le=20000, description="Máximo de contratos por farm."),
+
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    return consolidated_service.consolidated(
+        db=db,
+        user=user,
+        mode=mode,
+        only_open=only_open,
+        ref_mes=ref_mes,
+        default_symbol=default_symbol,
+        limit_per_farm=limit,
     )
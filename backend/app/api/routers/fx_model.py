@@ -5,7 +5,7 @@ from sqlalchemy.orm import Session
 
 from app.core.deps import get_farm_membership_from_path
 from app.db.session import get_db
-from app.schemas.fx_model import FxModelRunRead, FxModelPointRead, FxModelRunWithPointsRead
+from app.schemas.fx_model import FxForwardPointRead, FxModelRunRead, FxModelPointRead, FxModelRunWithPointsRead
 from app.services.fx_model_service import FxModelService
 
 router = APIRouter(prefix="/farms/{farm_id}/fx/model", tags=["FX Model"])
@@ -58,6 +58,26 @@ def nearest_run(
     return service.nearest_run(db, farm_id, dts)
 
 
+@router.get("/forward", response_model=list[FxForwardPointRead])
+def forward(
+    farm_id: int,
+    dates: str = Query(..., description="YYYY-MM-DD separadas por vírgula (máx. 1000)"),
+    run_id: int | None = Query(default=None),
+    db: Session = Depends(get_db),
+    membership=Depends(get_farm_membership_from_path),
+):
+    try:
+        parsed = [date.fromisoformat(x.strip()) for x in dates.split(",") if x.strip()]
+    except ValueError:
+        from fastapi import HTTPException
+        raise HTTPException(status_code=400, detail="dates inválido (YYYY-MM-DD,...)")
+    if len(parsed) > 1000:
+        from fastapi import HTTPException
+        raise HTTPException(status_code=400, detail="máximo de 1000 datas")
+
+    return service.forwards(db, farm_id, parsed, run_id)
+
+
 @router.get("/runs/{run_id}", response_model=FxModelRunWithPointsRead)
 def get_run(
     farm_id: int,
@@ -10,6 +10,9 @@ class Settings(BaseSettings):
     JWT_ALG: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MIN: int = 10080  # 7 dias
 
+    # cache de respostas do contracts-mtm (por processo): limite em linhas somadas de todas as entradas
+    MTM_CACHE_MAX_ROWS: int = 50000
+
     @property
     def DATABASE_URL(self) -> str:
         return self.DB_URL
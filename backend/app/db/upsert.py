@@ -0,0 +1,30 @@
+# app/db/upsert.py
+"""
+INSERT ... ON CONFLICT DO UPDATE para tabelas mantidas por chave (snapshots, cobertura, *_latest).
+Evita o "SELECT e depois db.add" que dá IntegrityError quando duas requisições criam a mesma linha.
+Dialeto da sessão: postgresql em produção, sqlite nos testes.
+"""
+from __future__ import annotations
+
+from typing import Sequence
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def upsert(db: Session, model, rows: Sequence[dict], index_elements: Sequence[str]) -> None:
+    """Uma linha por chave; no conflito atualiza as demais colunas informadas (e updated_at, se houver)."""
+    if not rows:
+        return
+
+    insert = _INSERTS[db.get_bind().dialect.name]
+    stmt = insert(model).values(list(rows))
+
+    set_ = {c: stmt.excluded[c] for c in rows[0] if c not in index_elements}
+    if "updated_at" in model.__table__.c:
+        set_["updated_at"] = func.now()
+
+    db.execute(stmt.on_conflict_do_update(index_elements=list(index_elements), set_=set_))
@@ -19,6 +19,7 @@ from app.api.routers.expenses import router as expenses_router
 from app.api.routers.alerts import router as alerts_router
 from app.api.routers.dashboard import router as dashboard_router
 from app.api.routers.contracts_mtm import router as contracts_mtm
+from app.api.routers.contracts_mtm import me_router as contracts_mtm_me
 
 
 def create_app() -> FastAPI:
@@ -56,6 +57,7 @@ def create_app() -> FastAPI:
     # --- Dashboard ---
     app.include_router(dashboard_router)
     app.include_router(contracts_mtm)
+    app.include_router(contracts_mtm_me)
 
     @app.get("/health")
     def health():
@@ -10,6 +10,7 @@ from .offset_calibration import OffsetCalibration  # noqa: F401
 from .fx_model_run import FxModelRun  # noqa: F401
 from .fx_model_point import FxModelPoint  # noqa: F401
 from .fx_spot_tick import FxSpotTick  # noqa: F401
+from .fx_curve_latest import FxCurveLatest  # noqa: F401
 
 from .fx_source import FxSource  # noqa: F401
 from .fx_quote import FxQuote  # noqa: F401
@@ -17,10 +18,13 @@ from .fx_quote_check import FxQuoteCheck  # noqa: F401
 
 from .cbot_source import CbotSource  # noqa: F401
 from .cbot_quote import CbotQuote  # noqa: F401
+from .cbot_quote_latest import CbotQuoteLatest  # noqa: F401
 from .contract import Contract  # noqa: F401
 from .hedge_cbot import HedgeCbot  # noqa: F401
 from .hedge_premium import HedgePremium  # noqa: F401
 from .hedge_fx import HedgeFx  # noqa: F401
+from .contract_mtm_snapshot import ContractMtmSnapshot  # noqa: F401
+from .contract_lock_coverage import ContractLockCoverage  # noqa: F401
 from .expense_usd import ExpenseUsd  # noqa: F401
 from .alert_rule import AlertRule  # noqa: F401
 from .alert_event import AlertEvent  # noqa: F401
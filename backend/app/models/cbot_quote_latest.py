@@ -0,0 +1,23 @@
+# app/models/cbot_quote_latest.py
+from datetime import datetime, date
+from decimal import Decimal
+from sqlalchemy import ForeignKey, Date, DateTime, Integer, Numeric, String
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base_class import Base
+from app.db.mixins import TimestampMixin
+
+class CbotQuoteLatest(Base, TimestampMixin):
+    """Última cotação por (farm, symbol, ref_mes). Upsert feito pelo cbot_worker a cada gravação."""
+
+    __tablename__ = "cbot_quotes_latest"
+
+    farm_id: Mapped[int] = mapped_column(ForeignKey("farms.id", ondelete="CASCADE"), primary_key=True)
+    symbol: Mapped[str] = mapped_column(String(30), primary_key=True)
+    ref_mes: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    # sem FK: o histórico pode ser compactado sem derrubar o "latest"
+    quote_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    source_id: Mapped[int] = mapped_column(ForeignKey("cbot_sources.id", ondelete="RESTRICT"), nullable=False)
+
+    capturado_em: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    price_usd_per_bu: Mapped[Decimal] = mapped_column(Numeric(18, 6), nullable=False)
@@ -1,5 +1,7 @@
 # app/models/cbot_source.py
-from sqlalchemy import String, Boolean, UniqueConstraint
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, String, Boolean, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base_class import Base
 from app.db.mixins import TimestampMixin
@@ -11,3 +13,7 @@ class CbotSource(Base, TimestampMixin):
     id: Mapped[int] = mapped_column(primary_key=True)
     nome: Mapped[str] = mapped_column(String(60), nullable=False)
     ativo: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False, index=True)
+
+    # ✅ contadores do cbot_worker desde o start (polls/gravações/supressões), publicados a cada CBOT_STATS_EVERY_SEC
+    poll_stats: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    poll_stats_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,26 @@
+# app/models/contract_lock_coverage.py
+from decimal import Decimal
+
+from sqlalchemy import ForeignKey, Numeric
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+from app.db.mixins import TimestampMixin
+
+
+class ContractLockCoverage(Base, TimestampMixin):
+    """
+    Volume travado (ton) por tipo e contrato, mantido pelo HedgesService a cada create/delete.
+    coverage = ton / contracts.volume_total_ton é calculado no SELECT (volume do contrato pode mudar).
+    Usado para aplicar lock_types/lock_states na query de contratos, antes do MTM.
+    Sem linha = nenhuma trava.
+    """
+
+    __tablename__ = "contract_lock_coverage"
+
+    contract_id: Mapped[int] = mapped_column(ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True)
+    farm_id: Mapped[int] = mapped_column(ForeignKey("farms.id", ondelete="CASCADE"), index=True, nullable=False)
+
+    cbot_ton: Mapped[Decimal] = mapped_column(Numeric(14, 6), default=0, server_default="0", nullable=False)
+    premium_ton: Mapped[Decimal] = mapped_column(Numeric(14, 6), default=0, server_default="0", nullable=False)
+    fx_ton: Mapped[Decimal] = mapped_column(Numeric(14, 6), default=0, server_default="0", nullable=False)
@@ -0,0 +1,36 @@
+# app/models/contract_mtm_snapshot.py
+from datetime import date, datetime
+
+from sqlalchemy import JSON, Boolean, Date, DateTime, ForeignKey, Index, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+from app.db.mixins import TimestampMixin
+
+
+class ContractMtmSnapshot(Base, TimestampMixin):
+    """
+    Último MTM calculado por contrato (mode=both, ref_mes/symbol AUTO).
+    Recalculado quando as travas mudam; marcado dirty quando chega cotação/curva
+    nova para (cbot_symbol, cbot_ref_mes) ou fx_ref_mes.
+    """
+
+    __tablename__ = "contract_mtm_snapshots"
+    __table_args__ = (
+        Index("ix_contract_mtm_snapshots_farm_cbot", "farm_id", "cbot_symbol", "cbot_ref_mes"),
+        Index("ix_contract_mtm_snapshots_farm_fx", "farm_id", "fx_ref_mes"),
+    )
+
+    contract_id: Mapped[int] = mapped_column(ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True)
+    farm_id: Mapped[int] = mapped_column(ForeignKey("farms.id", ondelete="CASCADE"), index=True, nullable=False)
+
+    # dependências de mercado (para invalidação)
+    cbot_symbol: Mapped[str | None] = mapped_column(String(30), nullable=True)
+    cbot_ref_mes: Mapped[date | None] = mapped_column(Date, nullable=True)
+    fx_ref_mes: Mapped[date | None] = mapped_column(Date, nullable=True)
+
+    as_of_ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    dirty: Mapped[bool] = mapped_column(Boolean, default=False, server_default="false", nullable=False, index=True)
+
+    # ContractMtmRow sem contract/totals_view/filter_meta
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
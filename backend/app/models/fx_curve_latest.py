@@ -0,0 +1,28 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import ForeignKey, Date, DateTime, Integer, Numeric, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+from app.db.mixins import TimestampMixin
+
+
+class FxCurveLatest(Base, TimestampMixin):
+    """Último ponto da curva por (farm, ref_mes). Upsert feito pelo fx_model_worker a cada run."""
+
+    __tablename__ = "fx_curve_latest"
+
+    farm_id: Mapped[int] = mapped_column(ForeignKey("farms.id", ondelete="CASCADE"), primary_key=True)
+    ref_mes: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    # sem FK: compact_market_data pode apagar o run sem derrubar o "latest"
+    run_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    as_of_ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    t_anos: Mapped[Decimal] = mapped_column(Numeric(18, 8), nullable=False)
+    dolar_sint: Mapped[Decimal] = mapped_column(Numeric(18, 6), nullable=False)
+    dolar_desc: Mapped[Decimal] = mapped_column(Numeric(18, 6), nullable=False)
+
+    model_version: Mapped[str] = mapped_column(String(80), nullable=False)
+    source: Mapped[str] = mapped_column(String(40), nullable=False)
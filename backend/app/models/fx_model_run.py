@@ -1,7 +1,7 @@
 from datetime import datetime
 from decimal import Decimal
 
-from sqlalchemy import ForeignKey, DateTime, Numeric, String
+from sqlalchemy import JSON, ForeignKey, DateTime, Numeric, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base_class import Base
@@ -27,3 +27,7 @@ class FxModelRun(Base, TimestampMixin):
 
     model_version: Mapped[str] = mapped_column(String(80), nullable=False)
     source: Mapped[str] = mapped_column(String(40), nullable=False)
+    # estrutura a termo do cupom: [[t_anos, cupom], ...] (None = runs antigos, cupom flat)
+    coupon_curve: Mapped[list | None] = mapped_column(JSON, nullable=True)
+    # por que o worker gravou o run: first | rates | day | spot | heartbeat (None = runs antigos)
+    persist_reason: Mapped[str | None] = mapped_column(String(20), nullable=True)
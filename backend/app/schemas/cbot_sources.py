@@ -1,4 +1,5 @@
-# app/schemas/cbot_sources.py
+from datetime import datetime
+
 from pydantic import BaseModel, Field
 
 
@@ -11,6 +12,9 @@ class CbotSourceRead(BaseModel):
     id: int
     nome: str
     ativo: bool
+    # ✅ contadores do worker (None até o primeiro publish)
+    poll_stats: dict | None = None
+    poll_stats_at: datetime | None = None
 
     class Config:
         from_attributes = True
@@ -37,6 +37,9 @@ class LockCbot(BaseModel):
     locked_cents_per_bu: float | None = None
     symbol: str | None = None
     ref_mes: date | None = None
+    # todos os lotes do contrato (preço = média ponderada por ton)
+    lots: int = 0
+    locked_ton: float | None = None
 
 
 class LockPremium(BaseModel):
@@ -44,6 +47,8 @@ class LockPremium(BaseModel):
     coverage_pct: float
     premium_value: float | None = None
     premium_unit: str | None = None  # USD_BU | USD_TON
+    lots: int = 0
+    locked_ton: float | None = None
 
 
 class LockFx(BaseModel):
@@ -52,6 +57,8 @@ class LockFx(BaseModel):
     brl_per_usd: float | None = None
     tipo: str | None = None
     usd_amount: float | None = None
+    lots: int = 0
+    locked_ton: float | None = None
 
 
 class LocksInfo(BaseModel):
@@ -102,7 +109,8 @@ class ValuationSide(BaseModel):
 class Valuation(BaseModel):
     usd_per_saca: ValuationSide
     brl_per_saca: ValuationSide
-    components: dict[str, UsedComponent]
+    # detail=summary => None (breakdown de debug não é montado)
+    components: dict[str, UsedComponent] | None = None
 
 
 class TotalsSide(BaseModel):
@@ -164,10 +172,11 @@ class ContractTotalsView(BaseModel):
 
 class ContractMtmRow(BaseModel):
     contract: ContractBrief
-    locks: LocksInfo
-    quotes: QuotesInfo
-    valuation: Valuation
-    totals: ContractTotals
+    # None quando a seção fica fora do fields= (projeção)
+    locks: LocksInfo | None = None
+    quotes: QuotesInfo | None = None
+    valuation: Valuation | None = None
+    totals: ContractTotals | None = None
 
     totals_view: ContractTotalsView | None = None
     filter_meta: RowFilterMeta | None = None
@@ -182,4 +191,174 @@ class ContractsMtmResponse(BaseModel):
     # ✅ opcional, mas ajuda o front a refletir o estado do filtro
     no_locks: bool = False
 
+    # live = recalculado agora | snapshot = contract_mtm_snapshots
+    source: Literal["live", "snapshot"] = "live"
+    # snapshot: cálculo mais antigo entre as linhas servidas
+    snapshot_as_of: datetime | None = None
+
+    detail: Literal["summary", "full"] = "full"
+    # seções pedidas em fields= (None = todas)
+    fields: list[str] | None = None
+
+    # keyset: passar como after_id para a próxima página (None = última página)
+    next_cursor: int | None = None
+
     rows: list[ContractMtmRow]
+
+
+# =========================
+# format=ndjson (streaming): 1 header, N rows, 1 footer — uma linha JSON cada
+# =========================
+class ContractsMtmStreamHeader(BaseModel):
+    type: Literal["header"] = "header"
+    farm_id: int
+    as_of_ts: datetime
+    mode: str
+    fx_ref_mes: date | None = None
+    no_locks: bool = False
+    source: Literal["live", "snapshot"] = "live"
+    snapshot_as_of: datetime | None = None
+    detail: Literal["summary", "full"] = "full"
+    fields: list[str] | None = None
+    next_cursor: int | None = None
+
+
+class ContractsMtmStreamRow(BaseModel):
+    type: Literal["row"] = "row"
+    row: ContractMtmRow
+
+
+class ContractsMtmStreamFooter(BaseModel):
+    type: Literal["footer"] = "footer"
+    rows: int
+    finished_ts: datetime
+    next_cursor: int | None = None
+
+
+# =========================
+# /contracts-mtm/summary
+# =========================
+SummaryGroupBy = Literal["delivery_month", "pricing_type", "lock_state"]
+
+
+class ContractsMtmSummaryBucket(BaseModel):
+    # dimensões (None quando fora do group_by; no "total" todas None)
+    delivery_month: str | None = None   # YYYY-MM (data_entrega)
+    pricing_type: str | None = None     # tipo_precificacao
+    lock_state: Literal["locked", "open", "none"] | None = None  # none = sem travas (FIXO_BRL)
+
+    contracts: int
+    ton_total: float
+    sacas_total: float
+
+    usd_total_contract: float | None = None
+    brl_total_contract: TotalsSide
+
+    fx_locked_usd_used: TotalsSide
+    fx_unlocked_usd_used: TotalsSide
+
+
+class ContractsMtmSummaryResponse(BaseModel):
+    farm_id: int
+    as_of_ts: datetime
+    mode: str
+    fx_ref_mes: date | None = None
+    no_locks: bool = False
+
+    group_by: list[SummaryGroupBy]
+    lock_types: list[LockType] = []
+    lock_states: list[LockState] = []
+
+    total: ContractsMtmSummaryBucket
+    buckets: list[ContractsMtmSummaryBucket]
+
+
+# =========================
+# /contracts-mtm/scenarios
+# =========================
+class ContractsMtmScenario(BaseModel):
+    # choques aplicados (0 = mercado atual)
+    cbot_cents: float = 0.0        # cents/bu somados à cotação CBOT
+    fx_spot_pct: float = 0.0       # % sobre o spot (curva system e ponto manual)
+    coupon_bp: float = 0.0         # bp somados ao cupom anual da curva system
+    premium_usd_bu: float = 0.0    # prêmio (USD/bu) na parte sem trava de prêmio
+
+    usd_total_contract: float | None = None
+    brl_total_contract: TotalsSide
+    brl_delta: TotalsSide          # cenário - base
+
+
+class ContractsMtmScenariosResponse(BaseModel):
+    farm_id: int
+    as_of_ts: datetime
+    mode: str
+    fx_ref_mes: date | None = None
+
+    contracts: int
+    base: ContractsMtmScenario
+    scenarios: list[ContractsMtmScenario]
+
+
+# =========================
+# /contracts-mtm/cache-stats
+# =========================
+class ContractsMtmCacheStats(BaseModel):
+    entries: int
+    rows: int
+    max_rows: int
+    hits: int
+    misses: int
+    evictions: int
+    hit_ratio: float | None = None
+
+
+# =========================
+# /contracts-mtm/history
+# =========================
+class ContractsMtmHistoryPoint(BaseModel):
+    ts: datetime
+    usd_total_contract: float | None = None
+    brl_total_contract: TotalsSide
+
+
+class ContractsMtmHistoryResponse(BaseModel):
+    farm_id: int
+    as_of_ts: datetime
+    mode: str
+    fx_ref_mes: date | None = None
+
+    from_ts: datetime
+    to_ts: datetime
+    step_minutes: int
+
+    # travas consideradas: executadas até to_ts (o mercado varia ponto a ponto)
+    positions_as_of: datetime
+    contracts: int
+    points: list[ContractsMtmHistoryPoint]
+
+
+# =========================
+# /me/contracts-mtm (várias farms)
+# =========================
+class ContractsMtmFarmTotals(BaseModel):
+    # None no total consolidado
+    farm_id: int | None = None
+    farm_nome: str | None = None
+    role: str | None = None
+
+    contracts: int
+    ton_total: float
+    sacas_total: float
+
+    usd_total_contract: float | None = None
+    brl_total_contract: TotalsSide
+
+
+class ContractsMtmConsolidatedResponse(BaseModel):
+    user_id: int
+    as_of_ts: datetime
+    mode: str
+    fx_ref_mes: date | None = None
+
+    farms: list[ContractsMtmFarmTotals]
+    total: ContractsMtmFarmTotals
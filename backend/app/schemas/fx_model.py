@@ -25,10 +25,22 @@ class FxModelRunRead(BaseModel):
     desconto_pct: float
     model_version: str
     source: str
+    coupon_curve: list[list[float]] | None = None
+    persist_reason: str | None = None
 
     class Config:
         from_attributes = True
 
 
+class FxForwardPointRead(BaseModel):
+    """Forward avaliado numa data qualquer a partir do run (spot + estrutura a termo do cupom)."""
+
+    data: date
+    t_anos: float
+    coupon_annual: float
+    dolar_sint: float
+    dolar_desc: float
+
+
 class FxModelRunWithPointsRead(FxModelRunRead):
     points: list[FxModelPointRead] = Field(default_factory=list)
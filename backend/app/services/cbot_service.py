@@ -6,6 +6,7 @@ from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
 from app.models.cbot_quote import CbotQuote
+from app.models.cbot_quote_latest import CbotQuoteLatest
 from app.models.cbot_source import CbotSource
 
 
@@ -16,9 +17,23 @@ class CbotService:
             raise HTTPException(status_code=404, detail="CBOT source_id inválido ou inativo")
 
     def latest_quote(self, db: Session, farm_id: int, symbol: str = "ZS=F", source_id: int | None = None) -> CbotQuote | None:
-        q = db.query(CbotQuote).filter(CbotQuote.farm_id == farm_id, CbotQuote.symbol == symbol)
         if source_id is not None:
             self._ensure_source_ok(db, source_id)
+
+        # ✅ caminho rápido: cbot_quotes_latest (upsert do worker)
+        lq = db.query(CbotQuoteLatest).filter(CbotQuoteLatest.farm_id == farm_id, CbotQuoteLatest.symbol == symbol)
+        if source_id is not None:
+            lq = lq.filter(CbotQuoteLatest.source_id == source_id)
+
+        latest = lq.order_by(CbotQuoteLatest.capturado_em.desc(), CbotQuoteLatest.quote_id.desc()).first()
+        if latest:
+            row = db.get(CbotQuote, latest.quote_id)
+            if row:
+                return row
+
+        # fallback: histórico (quotes sem ref_mes, ou latest de outra fonte)
+        q = db.query(CbotQuote).filter(CbotQuote.farm_id == farm_id, CbotQuote.symbol == symbol)
+        if source_id is not None:
             q = q.filter(CbotQuote.source_id == source_id)
 
         return q.order_by(CbotQuote.capturado_em.desc(), CbotQuote.id.desc()).first()
@@ -0,0 +1,116 @@
+# app/services/contracts_mtm_consolidated_service.py
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.contract import Contract
+from app.models.farm_user import FarmUser
+from app.models.user import User
+from app.schemas.contracts_mtm import ContractsMtmConsolidatedResponse, ContractsMtmFarmTotals, TotalsSide
+from app.services.contracts_mtm_service import ContractsMtmService, _parse_ref_mes
+from app.services.farms_service import FarmsService
+from app.services.mtm_engine import exact_sum
+
+_mtm = ContractsMtmService()
+_farms = FarmsService()
+
+
+class ContractsMtmConsolidatedService:
+    """
+    Visão consolidada das farms ativas do usuário: um SELECT de contratos (IN farm_ids),
+    um statement de entradas para todas as farms e um passe do engine sobre o book inteiro.
+    """
+
+    def consolidated(
+        self,
+        db: Session,
+        user: User,
+        mode: str,
+        only_open: bool,
+        ref_mes: str | None,
+        default_symbol: str,
+        limit_per_farm: int,
+    ) -> ContractsMtmConsolidatedResponse:
+        forced_ref_mes = _parse_ref_mes(ref_mes)
+        memberships: list[FarmUser] = _farms.list_my_memberships(db, user)
+        farm_ids = [m.farm_id for m in memberships]
+
+        contracts = self._contracts(db, farm_ids, only_open, limit_per_farm) if farm_ids else []
+
+        per_farm: dict[int, dict] = {}
+        total: dict = {}
+        counts = {fid: 0 for fid in farm_ids}
+        ton = {fid: 0.0 for fid in farm_ids}
+        sacas = {fid: 0.0 for fid in farm_ids}
+
+        if contracts:
+            book, v = _mtm.value_contracts(db, farm_ids, contracts, forced_ref_mes, default_symbol)
+            is_fixo = book.positions.is_fixo
+            farm_of = np.array([c.farm_id for c in contracts], dtype=np.int64)
+
+            for fid in farm_ids:
+                mask = farm_of == fid
+                if not mask.any():
+                    continue
+                per_farm[fid] = _mtm.book_totals(v, is_fixo, mode, mask=mask)
+                counts[fid] = int(mask.sum())
+                ton[fid] = exact_sum(v.ton_total[mask])
+                sacas[fid] = exact_sum(v.sacas_total[mask])
+            total = _mtm.book_totals(v, is_fixo, mode)
+
+        farms = [
+            self._totals(
+                per_farm.get(m.farm_id, {}),
+                counts[m.farm_id],
+                ton[m.farm_id],
+                sacas[m.farm_id],
+                farm_id=m.farm_id,
+                farm_nome=m.farm.nome if m.farm else None,
+                role=m.role,
+            )
+            for m in memberships
+        ]
+
+        return ContractsMtmConsolidatedResponse(
+            user_id=user.id,
+            as_of_ts=datetime.now(timezone.utc),
+            mode=mode,
+            fx_ref_mes=forced_ref_mes,
+            farms=farms,
+            total=self._totals(total, len(contracts), sum(ton.values()), sum(sacas.values())),
+        )
+
+    def _contracts(self, db: Session, farm_ids: list[int], only_open: bool, limit_per_farm: int) -> list[Contract]:
+        """Mesma seleção do contracts-mtm (id desc, limit) aplicada a cada farm, num SELECT só."""
+        ranked = (
+            _mtm.contracts_query(db, farm_ids, only_open, False, False)
+            .with_entities(
+                Contract.id.label("id"),
+                func.row_number()
+                .over(partition_by=Contract.farm_id, order_by=Contract.id.desc())
+                .label("rn"),
+            )
+            .subquery()
+        )
+        return (
+            db.query(Contract)
+            .join(ranked, ranked.c.id == Contract.id)
+            .filter(ranked.c.rn <= limit_per_farm)
+            .order_by(Contract.farm_id, Contract.id.desc())
+            .all()
+        )
+
+    def _totals(self, t: dict, contracts: int, ton: float, sacas: float, **farm) -> ContractsMtmFarmTotals:
+        r = _mtm._r
+        return ContractsMtmFarmTotals(
+            **farm,
+            contracts=contracts,
+            ton_total=r(ton, 4) or 0.0,
+            sacas_total=r(sacas, 0) or 0.0,
+            usd_total_contract=r(t.get("usd"), 4),
+            brl_total_contract=TotalsSide(system=r(t.get("system"), 4), manual=r(t.get("manual"), 4)),
+        )
@@ -0,0 +1,161 @@
+# app/services/contracts_mtm_history_service.py
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.models.contract import Contract
+from app.schemas.contracts_mtm import ContractsMtmHistoryPoint, ContractsMtmHistoryResponse, TotalsSide
+from app.services.contracts_mtm_service import ContractsMtmService, _parse_ref_mes
+from app.services.fx_model_service import run_as_of_date
+from app.services.mtm_engine import BookMarket, value_book
+from app.services.mtm_loader import FxRunIn, MarketSeries, load_market_streams
+from app.utils.fx_curve import forward_curve
+
+MAX_POINTS = 2000
+
+_mtm = ContractsMtmService()
+
+
+class ContractsMtmHistoryService:
+    """
+    Série do valor do book em [from_ts, to_ts] a cada step: posições carregadas uma vez (travas até to_ts)
+    e mercado por as-of join em memória sobre as séries da janela (uma leitura ordenada, sem query por ponto).
+    """
+
+    def history(
+        self,
+        db: Session,
+        farm_id: int,
+        mode: str,
+        only_open: bool,
+        ref_mes: str | None,
+        default_symbol: str,
+        limit: int,
+        from_ts: datetime,
+        to_ts: datetime,
+        step_minutes: int,
+    ) -> ContractsMtmHistoryResponse:
+        forced_ref_mes = _parse_ref_mes(ref_mes)
+        from_ts, to_ts = self._utc(from_ts), self._utc(to_ts)
+        grid = self._grid(from_ts, to_ts, step_minutes)
+
+        contracts = (
+            _mtm.contracts_query(db, farm_id, only_open, False, False)
+            .order_by(Contract.id.desc())
+            .limit(limit)
+            .all()
+        )
+
+        response = ContractsMtmHistoryResponse(
+            farm_id=farm_id,
+            as_of_ts=datetime.now(timezone.utc),
+            mode=mode,
+            fx_ref_mes=forced_ref_mes,
+            from_ts=from_ts,
+            to_ts=to_ts,
+            step_minutes=step_minutes,
+            positions_as_of=to_ts,
+            contracts=len(contracts),
+            points=[],
+        )
+        if not contracts:
+            response.points = [self._point(ts, {}) for ts in grid]
+            return response
+
+        book = _mtm._load_book(db, farm_id, contracts, forced_ref_mes, default_symbol, as_of=to_ts)
+        n = len(contracts)
+        is_fixo = book.positions.is_fixo.tolist()
+
+        cbot_keys = [None if is_fixo[i] else (book.symbols[i], book.rm_cbot[i]) for i in range(n)]
+        fx_keys = [None if is_fixo[i] else book.rm_fx[i] for i in range(n)]
+
+        streams = load_market_streams(
+            db,
+            farm_id,
+            [k for k in cbot_keys if k is not None],
+            [k for k in fx_keys if k is not None],
+            from_ts,
+            to_ts,
+        )
+
+        grid_s = np.array([ts.timestamp() for ts in grid], dtype=np.float64)
+        cbot = self._asof_matrix(cbot_keys, streams.cbot, grid_s)
+        fx_system = self._asof_matrix(fx_keys, streams.fx_curve, grid_s)
+        # ref_mes sem ponto gravado no instante: curva do run vigente (mesma regra do as_of)
+        fx_system = np.where(np.isnan(fx_system), self._run_matrix(fx_keys, streams.fx_runs, grid_s), fx_system)
+        fx_manual = self._asof_matrix(fx_keys, streams.fx_manual, grid_s)
+
+        for j, ts in enumerate(grid):
+            mkt = BookMarket(cbot_cents=cbot[:, j], fx_system=fx_system[:, j], fx_manual=fx_manual[:, j])
+            totals = _mtm.book_totals(value_book(book.positions, mkt), book.positions.is_fixo, mode)
+            response.points.append(self._point(ts, totals))
+
+        return response
+
+    def _asof_matrix(
+        self,
+        keys: list[tuple[str, date] | date | None],
+        series: dict,
+        grid_s: np.ndarray,
+    ) -> np.ndarray:
+        """(contratos x pontos): último valor com ts <= ponto, por chave (NaN se não houver)."""
+        rows: dict = {}
+        for key in set(k for k in keys if k is not None):
+            s: MarketSeries | None = series.get(key)
+            if s is None or not s.ts:
+                continue
+            ts = np.array([t.timestamp() for t in s.ts], dtype=np.float64)
+            vals = np.array([np.nan if v is None else v for v in s.values], dtype=np.float64)
+            idx = np.searchsorted(ts, grid_s, side="right") - 1
+            rows[key] = np.where(idx >= 0, vals[np.clip(idx, 0, None)], np.nan)
+
+        empty = np.full(grid_s.shape[0], np.nan)
+        return np.vstack([rows.get(k, empty) if k is not None else empty for k in keys])
+
+    def _run_matrix(self, keys: list[date | None], runs: list[FxRunIn], grid_s: np.ndarray) -> np.ndarray:
+        """(contratos x pontos): forward do último run <= ponto avaliado no ref_mes de cada contrato."""
+        out = np.full((len(keys), grid_s.shape[0]), np.nan)
+        uniq = sorted({k for k in keys if k is not None})
+        if not runs or not uniq:
+            return out
+
+        # (runs x ref_mes), mesma escala de fx_model_points.dolar_sint
+        vals = np.vstack([
+            np.round(forward_curve(run.spot, run_as_of_date(run.as_of_ts), uniq, run.coupon_curve)[2], 6)
+            for run in runs
+        ])
+        ts = np.array([run.as_of_ts.timestamp() for run in runs], dtype=np.float64)
+        idx = np.searchsorted(ts, grid_s, side="right") - 1
+        col = {k: j for j, k in enumerate(uniq)}
+        for i, k in enumerate(keys):
+            if k is not None:
+                out[i] = np.where(idx >= 0, vals[np.clip(idx, 0, None), col[k]], np.nan)
+        return out
+
+    def _point(self, ts: datetime, totals: dict) -> ContractsMtmHistoryPoint:
+        r = _mtm._r
+        return ContractsMtmHistoryPoint(
+            ts=ts,
+            usd_total_contract=r(totals.get("usd"), 4),
+            brl_total_contract=TotalsSide(system=r(totals.get("system"), 4), manual=r(totals.get("manual"), 4)),
+        )
+
+    def _grid(self, from_ts: datetime, to_ts: datetime, step_minutes: int) -> list[datetime]:
+        if to_ts <= from_ts:
+            raise HTTPException(status_code=400, detail="to deve ser posterior a from")
+        step = timedelta(minutes=step_minutes)
+        n_points = int((to_ts - from_ts) / step) + 1
+        if n_points > MAX_POINTS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Janela com {n_points} pontos; máximo {MAX_POINTS} (aumente step).",
+            )
+        return [from_ts + k * step for k in range(n_points)]
+
+    def _utc(self, ts: datetime) -> datetime:
+        # sem fuso => UTC (mesma convenção dos workers ao gravar)
+        return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
@@ -0,0 +1,139 @@
+# app/services/contracts_mtm_scenarios_service.py
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from itertools import product
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.models.contract import Contract
+from app.schemas.contracts_mtm import ContractsMtmScenario, ContractsMtmScenariosResponse, TotalsSide
+from app.services.contracts_mtm_service import ContractsMtmService, _parse_ref_mes
+from app.services.mtm_engine import shock_market, value_book
+
+# grade = produto cartesiano dos eixos; acima disso a resposta deixa de ser "uma chamada"
+MAX_SCENARIOS = 2000
+
+_mtm = ContractsMtmService()
+
+
+class ContractsMtmScenariosService:
+    """
+    What-if do book: carrega contratos/travas/mercado uma vez e reavalia o engine
+    para cada choque da grade (CBOT cents, FX spot %, cupom bp, prêmio USD/bu).
+    """
+
+    def scenarios(
+        self,
+        db: Session,
+        farm_id: int,
+        mode: str,
+        only_open: bool,
+        ref_mes: str | None,
+        default_symbol: str,
+        limit: int,
+        cbot_cents: str | None = None,
+        fx_spot_pct: str | None = None,
+        coupon_bp: str | None = None,
+        premium_usd_bu: str | None = None,
+    ) -> ContractsMtmScenariosResponse:
+        forced_ref_mes = _parse_ref_mes(ref_mes)
+
+        grid = list(
+            product(
+                self._parse_axis(cbot_cents, "cbot_cents"),
+                self._parse_axis(fx_spot_pct, "fx_spot_pct"),
+                self._parse_axis(coupon_bp, "coupon_bp"),
+                self._parse_axis(premium_usd_bu, "premium_usd_bu"),
+            )
+        )
+        if len(grid) > MAX_SCENARIOS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Grade com {len(grid)} cenários; máximo {MAX_SCENARIOS}.",
+            )
+
+        contracts = (
+            _mtm.contracts_query(db, farm_id, only_open, False, False)
+            .order_by(Contract.id.desc())
+            .limit(limit)
+            .all()
+        )
+
+        response = ContractsMtmScenariosResponse(
+            farm_id=farm_id,
+            as_of_ts=datetime.now(timezone.utc),
+            mode=mode,
+            fx_ref_mes=forced_ref_mes,
+            contracts=len(contracts),
+            base=self._scenario((0.0, 0.0, 0.0, 0.0), None, None),
+            scenarios=[],
+        )
+        if not contracts:
+            response.scenarios = [self._scenario(shock, None, None) for shock in grid]
+            return response
+
+        # ✅ entradas carregadas uma vez; só o mercado muda entre cenários
+        book, base_values = _mtm.value_contracts(db, farm_id, contracts, forced_ref_mes, default_symbol)
+        fx_t = np.array([self._nan(getattr(fc, "t_anos", None)) for fc in book.fx_curve], dtype=np.float64)
+        fx_coupon = np.array(
+            [self._nan(getattr(fc, "coupon_annual", None)) for fc in book.fx_curve], dtype=np.float64
+        )
+
+        is_fixo = book.positions.is_fixo
+        base = _mtm.book_totals(base_values, is_fixo, mode)
+        response.base = self._scenario((0.0, 0.0, 0.0, 0.0), base, base)
+
+        for shock in grid:
+            if not any(shock):
+                response.scenarios.append(self._scenario(shock, base, base))
+                continue
+            c, s, bp, p = shock
+            mkt = shock_market(book.market, fx_t, fx_coupon, c, s, bp, p)
+            totals = _mtm.book_totals(value_book(book.positions, mkt), is_fixo, mode)
+            response.scenarios.append(self._scenario(shock, totals, base))
+
+        return response
+
+    def _scenario(self, shock: tuple, totals: dict | None, base: dict | None) -> ContractsMtmScenario:
+        r = _mtm._r
+        totals = totals or {}
+        base = base or {}
+
+        def delta(side: str):
+            a, b = totals.get(side), base.get(side)
+            return None if a is None or b is None else r(a - b, 4)
+
+        c, s, bp, p = shock
+        return ContractsMtmScenario(
+            cbot_cents=c,
+            fx_spot_pct=s,
+            coupon_bp=bp,
+            premium_usd_bu=p,
+            usd_total_contract=r(totals.get("usd"), 4),
+            brl_total_contract=TotalsSide(system=r(totals.get("system"), 4), manual=r(totals.get("manual"), 4)),
+            brl_delta=TotalsSide(system=delta("system"), manual=delta("manual")),
+        )
+
+    def _nan(self, v) -> float:
+        return np.nan if v is None else float(v)
+
+    def _parse_axis(self, s: str | None, name: str) -> list[float]:
+        """CSV de choques (ex: -20,0,20). Vazio = só 0."""
+        if not s or not s.strip():
+            return [0.0]
+        out: set[float] = set()
+        for part in s.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                x = float(part)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"{name}: valor inválido '{part}'")
+            if x != x or x in (float("inf"), float("-inf")):
+                raise HTTPException(status_code=400, detail=f"{name}: valor inválido '{part}'")
+            out.add(x)
+        return sorted(out) or [0.0]
@@ -4,10 +4,11 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import date, datetime, timezone
 from decimal import Decimal
-from typing import Iterable
+from typing import Iterator
 
+import numpy as np
 from fastapi import HTTPException
-from sqlalchemy import and_, func, or_
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 
 from app.models.contract import Contract
@@ -15,15 +16,10 @@ from app.models.hedge_cbot import HedgeCbot
 from app.models.hedge_premium import HedgePremium
 from app.models.hedge_fx import HedgeFx
 
-from app.models.cbot_quote import CbotQuote
-from app.models.fx_manual_point import FxManualPoint
-
-from app.models.fx_model_run import FxModelRun
-from app.models.fx_model_point import FxModelPoint
-
 from app.schemas.contracts_mtm import (
     ContractBrief,
     ContractsMtmResponse,
+    ContractsMtmStreamHeader,
     ContractMtmRow,
     LocksInfo,
     LockCbot,
@@ -42,30 +38,32 @@ from app.schemas.contracts_mtm import (
     RowFilterMeta,
     ContractTotalsView,
 )
-
-# --- Constantes de conversão (SOJA) ---
-SOY_BU_KG = 27.2155
-SACA_KG = 60.0
-
-BUSHELS_PER_SACA = SACA_KG / SOY_BU_KG
-SACAS_PER_TON = 1000.0 / SACA_KG
-TON_PER_BU = SOY_BU_KG / 1000.0
-
-# CBOT month codes
-_CBOT_MONTH_CODE = {
-    1: "F",
-    2: "G",
-    3: "H",
-    4: "J",
-    5: "K",
-    6: "M",
-    7: "N",
-    8: "Q",
-    9: "U",
-    10: "V",
-    11: "X",
-    12: "Z",
-}
+from app.services.mtm_engine import (
+    FX_MODE_LABELS,
+    SACAS_PER_TON,
+    BookMarket,
+    BookPositions,
+    BookValues,
+    exact_sum,
+    lock_filter,
+    premium_unit_code,
+    value_book,
+)
+from app.services.mtm_loader import (
+    CbotQuoteIn,
+    FxCurveIn,
+    FxManualIn,
+    FxRunIn,
+    HedgeCbotAgg,
+    HedgeFxAgg,
+    HedgePremiumAgg,
+    load_cbot_asof,
+    load_mtm_inputs,
+)
+from app.services.fx_model_service import run_as_of_date
+from app.services.lock_coverage_service import LockCoverageService
+from app.utils.contract_calendar import is_ref_mes, ref_mes_of, resolve_symbol
+from app.utils.fx_curve import forward_curve
 
 
 def _to_float(v) -> float | None:
@@ -81,45 +79,55 @@ def _to_float(v) -> float | None:
         return None
 
 
-def _ref_mes_month(d: date) -> date:
-    """Seu padrão: dia 30 do mês."""
-    return date(d.year, d.month, 30)
+def _nan_if_none(v: float | None) -> float:
+    return np.nan if v is None else v
+
+
+def _both(v: float | None) -> UsedComponent:
+    return UsedComponent(system=v, manual=v)
 
 
 def _parse_ref_mes(s: str | None) -> date | None:
-    """Valida YYYY-MM-30."""
+    """Valida YYYY-MM-30 (fevereiro: último dia do mês)."""
     if not s:
         return None
     try:
-        y, m, dd = map(int, s.split("-"))
-        if dd != 30:
-            raise ValueError("dia precisa ser 30")
-        return date(y, m, dd)
+        d = date(*map(int, s.split("-")))
     except Exception:
+        d = None
+    if d is None or not is_ref_mes(d):
         raise HTTPException(status_code=400, detail="ref_mes inválido (use YYYY-MM-30)")
+    return d
 
 
-def _auto_symbol_for_ref_mes(ref_mes: date) -> str:
-    """AUTO -> ZS{MonthCode}{YY}.CBT baseado no mês/ano do ref_mes."""
-    code = _CBOT_MONTH_CODE.get(ref_mes.month)
-    if not code:
-        raise HTTPException(status_code=400, detail="ref_mes inválido para AUTO symbol")
-    yy = str(ref_mes.year)[-2:]
-    return f"ZS{code}{yy}.CBT"
+_coverage = LockCoverageService()
 
-
-@dataclass
-class _LatestByKey:
-    map: dict
+# seções de ContractMtmRow projetáveis via fields= (contract sempre vem)
+ROW_SECTIONS = frozenset({"locks", "quotes", "valuation", "totals", "totals_view", "filter_meta"})
 
 
 @dataclass
-class _FxCurveSnap:
-    run: FxModelRun
-    point: FxModelPoint
+class _Book:
+    """Entradas do MTM: objetos tipados do loader (para materializar) + colunas (para o engine)."""
+
+    contracts: list[Contract]
+    hedge_cbot: list[HedgeCbotAgg | None]
+    hedge_premium: list[HedgePremiumAgg | None]
+    hedge_fx: list[HedgeFxAgg | None]
+    symbols: list[str | None]
+    rm_cbot: list[date | None]
+    rm_fx: list[date | None]
+    cbot_quotes: list[CbotQuoteIn | None]
+    fx_curve: list[FxCurveIn | None]
+    fx_manual: list[FxManualIn | None]
+    positions: BookPositions
+    market: BookMarket
 
 
 class ContractsMtmService:
+    # format=ndjson: contratos avaliados por lote (limita memória e adianta o 1º byte)
+    STREAM_CHUNK_SIZE = 200
+
     # =========================
     # Filters helpers (locks) - SIMPLES (locked/open)
     # =========================
@@ -140,34 +148,6 @@ class ContractsMtmService:
         p = self._clamp01(pct)
         return "locked" if p > 0.0 else "open"
 
-    def _locked_pct_and(self, pcts: list[float]) -> float:
-        # parte travada "em todos" = min(pcts)
-        if not pcts:
-            return 1.0
-        return min(self._clamp01(p) for p in pcts)
-
-    def _open_pct_and(self, pcts: list[float]) -> float:
-        # parte aberta "em todos" = 1 - max(pcts)
-        if not pcts:
-            return 0.0
-        return 1.0 - max(self._clamp01(p) for p in pcts)
-
-    def _slice_pct_from_states(self, locked_pct: float, open_pct: float, selected_states: set[str]) -> float:
-        locked_pct = self._clamp01(locked_pct)
-        open_pct = self._clamp01(open_pct)
-
-        has_locked = "locked" in selected_states
-        has_open = "open" in selected_states
-
-        # locked+open => total
-        if has_locked and has_open:
-            return 1.0
-        if has_locked:
-            return locked_pct
-        if has_open:
-            return open_pct
-        return 1.0
-
     def _mul_side(self, side: TotalsSide, k: float) -> TotalsSide:
         def m(v):
             return None if v is None else self._r(float(v) * k, 4)
@@ -221,21 +201,6 @@ class ContractsMtmService:
         # fallback: assume por saca
         return float(v)
 
-    # =========================
-    # Frete apply helper (NET)
-    # =========================
-    def _apply_frete_net(self, brl_per_saca: float | None, sacas_total: float, frete_total: float):
-        """
-        Regra: sempre NET = bruto - frete_total.
-        Retorna (brl_per_saca_net, brl_total_net, brl_total_gross) ou (None, None, None) se inválido.
-        """
-        if brl_per_saca is None or sacas_total <= 0:
-            return (None, None, None)
-        brl_total_gross = brl_per_saca * sacas_total
-        brl_total_net = brl_total_gross - float(frete_total or 0.0)
-        brl_per_saca_net = brl_total_net / sacas_total
-        return (brl_per_saca_net, brl_total_net, brl_total_gross)
-
     # =========================
     # Main
     # =========================
@@ -253,9 +218,193 @@ class ContractsMtmService:
         lock_states: str | None = None,
         # ✅ NOVO: somente contratos sem travas (FIXO_BRL)
         no_locks: bool = False,
+        # summary = sem valuation.components | fields = CSV das seções da linha
+        detail: str = "full",
+        fields: str | None = None,
+        # keyset: página começa depois deste contract_id (ordem id desc)
+        after_id: int | None = None,
+        # reavalia no passado: travas executadas até as_of + mercado "último <= as_of"
+        as_of: datetime | None = None,
     ) -> ContractsMtmResponse:
         forced_ref_mes = _parse_ref_mes(ref_mes)
+        selected_types, selected_states, filters_active = self.lock_filters(lock_types, lock_states, no_locks)
+        projection = self.row_projection(fields)
+
+        # as_of: cobertura do passado != tabela (estado atual) => filtro só no engine
+        contracts, next_cursor = self.page_contracts(
+            db, farm_id, only_open, no_locks, filters_active, limit, after_id,
+            lock_prefilter=as_of is None, selected_types=selected_types, selected_states=selected_states,
+        )
+
+        if not contracts:
+            return ContractsMtmResponse(
+                farm_id=farm_id,
+                as_of_ts=as_of or datetime.now(timezone.utc),
+                mode=mode,
+                fx_ref_mes=forced_ref_mes,
+                detail=detail,
+                fields=sorted(projection) if projection is not None else None,
+                next_cursor=next_cursor,
+                rows=[],
+            )
+
+        rows = list(
+            self.iter_rows(
+                db,
+                farm_id,
+                contracts,
+                mode,
+                forced_ref_mes,
+                default_symbol,
+                selected_types,
+                selected_states,
+                filters_active,
+                detail=detail,
+                projection=projection,
+                as_of=as_of,
+            )
+        )
+
+        return ContractsMtmResponse(
+            farm_id=farm_id,
+            as_of_ts=as_of or datetime.now(timezone.utc),
+            mode=mode,
+            fx_ref_mes=forced_ref_mes,
+            no_locks=no_locks,
+            detail=detail,
+            fields=sorted(projection) if projection is not None else None,
+            next_cursor=next_cursor,
+            rows=rows,
+        )
+
+    def stream_contracts_mtm(
+        self,
+        db: Session,
+        farm_id: int,
+        mode: str,
+        only_open: bool,
+        ref_mes: str | None,
+        default_symbol: str,
+        limit: int,
+        lock_types: str | None = None,
+        lock_states: str | None = None,
+        no_locks: bool = False,
+        detail: str = "full",
+        fields: str | None = None,
+        after_id: int | None = None,
+        as_of: datetime | None = None,
+    ) -> tuple[ContractsMtmStreamHeader, Iterator[ContractMtmRow]]:
+        """
+        format=ndjson: valida/seleciona agora (erros viram 4xx normais) e devolve
+        o header + um gerador que avalia em lotes de STREAM_CHUNK_SIZE contratos.
+        """
+        forced_ref_mes = _parse_ref_mes(ref_mes)
+        selected_types, selected_states, filters_active = self.lock_filters(lock_types, lock_states, no_locks)
+        projection = self.row_projection(fields)
+
+        # as_of: cobertura do passado != tabela (estado atual) => filtro só no engine
+        contracts, next_cursor = self.page_contracts(
+            db, farm_id, only_open, no_locks, filters_active, limit, after_id,
+            lock_prefilter=as_of is None, selected_types=selected_types, selected_states=selected_states,
+        )
+
+        header = ContractsMtmStreamHeader(
+            farm_id=farm_id,
+            as_of_ts=as_of or datetime.now(timezone.utc),
+            mode=mode,
+            fx_ref_mes=forced_ref_mes,
+            no_locks=no_locks,
+            detail=detail,
+            fields=sorted(projection) if projection is not None else None,
+            next_cursor=next_cursor,
+        )
+        rows = self.iter_rows(
+            db,
+            farm_id,
+            contracts,
+            mode,
+            forced_ref_mes,
+            default_symbol,
+            selected_types,
+            selected_states,
+            filters_active,
+            chunk_size=self.STREAM_CHUNK_SIZE,
+            detail=detail,
+            projection=projection,
+            as_of=as_of,
+        )
+        return header, rows
 
+    def iter_rows(
+        self,
+        db: Session,
+        farm_id: int,
+        contracts: list[Contract],
+        mode: str,
+        forced_ref_mes: date | None,
+        default_symbol: str,
+        selected_types: set[str],
+        selected_states: set[str],
+        filters_active: bool,
+        chunk_size: int | None = None,
+        detail: str = "full",
+        projection: set[str] | None = None,
+        as_of: datetime | None = None,
+    ) -> Iterator[ContractMtmRow]:
+        """Avalia e materializa as linhas; chunk_size=None => um lote só (todo o book)."""
+        step = chunk_size or max(len(contracts), 1)
+
+        for start in range(0, len(contracts), step):
+            chunk = contracts[start : start + step]
+            book, values = self.value_contracts(db, farm_id, chunk, forced_ref_mes, default_symbol, as_of)
+
+            if not filters_active:
+                for i in range(len(chunk)):
+                    yield self.materialize_row(book, values, i, mode, detail=detail, projection=projection)
+                continue
+
+            keep, locked_pct, open_pct, slice_pct = lock_filter(
+                values.cov_cbot,
+                values.cov_premium,
+                values.cov_fx,
+                book.positions.is_fixo,
+                selected_types,
+                selected_states,
+            )
+            for i in np.flatnonzero(keep).tolist():
+                yield self.materialize_row(
+                    book,
+                    values,
+                    i,
+                    mode,
+                    filter_slice=(locked_pct[i], open_pct[i], slice_pct[i]),
+                    selected_types=selected_types,
+                    selected_states=selected_states,
+                    detail=detail,
+                    projection=projection,
+                )
+
+    def row_projection(self, fields: str | None) -> set[str] | None:
+        """fields=CSV de seções da linha (contract sempre vem); None => linha completa."""
+        if fields is None or not fields.strip():
+            return None
+        return {f for f in self._parse_csv_set(fields) if f in ROW_SECTIONS}
+
+    def project_row(self, row: ContractMtmRow, detail: str, projection: set[str] | None) -> ContractMtmRow:
+        """Zera as seções não pedidas (usado em linhas já montadas, ex: snapshot)."""
+        if detail == "summary" and row.valuation is not None:
+            row.valuation.components = None
+        if projection is not None:
+            for name in ROW_SECTIONS - projection:
+                setattr(row, name, None)
+        return row
+
+    def lock_filters(
+        self,
+        lock_types: str | None,
+        lock_states: str | None,
+        no_locks: bool,
+    ) -> tuple[set[str], set[str], bool]:
         # filtros locks (normaliza + limita valores)
         selected_types = self._parse_csv_set(lock_types)
         selected_states = self._parse_csv_set(lock_states)
@@ -269,11 +418,59 @@ class ContractsMtmService:
             selected_states = set()
 
         filters_active = bool(selected_types) and bool(selected_states)
+        return selected_types, selected_states, filters_active
 
-        # -------------------------
-        # Query contracts (filtra cedo)
-        # -------------------------
-        q = db.query(Contract).filter(Contract.farm_id == farm_id)
+    def page_contracts(
+        self,
+        db: Session,
+        farm_id: int,
+        only_open: bool,
+        no_locks: bool,
+        filters_active: bool,
+        limit: int,
+        after_id: int | None = None,
+        lock_prefilter: bool = False,
+        selected_types: set[str] | None = None,
+        selected_states: set[str] | None = None,
+    ) -> tuple[list[Contract], int | None]:
+        """
+        Keyset (id desc): busca limit+1 para saber se há próxima página.
+        next_cursor = último id da página (vira o after_id da próxima) ou None.
+        lock_prefilter: aplica lock_types/lock_states em SQL (contract_lock_coverage); o corte exato
+        continua no engine, então a página ainda pode render menos linhas que contratos.
+        """
+        q = self.contracts_query(
+            db, farm_id, only_open, no_locks, filters_active,
+            selected_types=selected_types if lock_prefilter else None,
+            selected_states=selected_states if lock_prefilter else None,
+        )
+        if after_id is not None:
+            q = q.filter(Contract.id < after_id)
+
+        contracts = q.order_by(Contract.id.desc()).limit(limit + 1).all()
+        if len(contracts) > limit:
+            contracts = contracts[:limit]
+            return contracts, contracts[-1].id
+        return contracts, None
+
+    def contracts_query(
+        self,
+        db: Session,
+        farm_id: int | list[int],
+        only_open: bool,
+        no_locks: bool,
+        filters_active: bool,
+        selected_types: set[str] | None = None,
+        selected_states: set[str] | None = None,
+    ):
+        """
+        Query contracts (filtra cedo). farm_id pode ser lista (visão consolidada).
+        selected_types/selected_states: pré-filtro de travas em SQL (só com filters_active).
+        """
+        if isinstance(farm_id, list):
+            q = db.query(Contract).filter(Contract.farm_id.in_(farm_id))
+        else:
+            q = db.query(Contract).filter(Contract.farm_id == farm_id)
         q = q.filter(Contract.produto == "SOJA")
 
         if only_open:
@@ -290,711 +487,494 @@ class ContractsMtmService:
                         func.upper(Contract.tipo_precificacao) != "FIXO_BRL",
                     )
                 )
+                if selected_types and selected_states:
+                    q = _coverage.apply_filter(q, selected_types, selected_states)
+        return q
 
-        contracts = q.order_by(Contract.id.desc()).limit(limit).all()
-
-        if not contracts:
-            return ContractsMtmResponse(
-                farm_id=farm_id,
-                as_of_ts=datetime.now(timezone.utc),
-                mode=mode,
-                fx_ref_mes=forced_ref_mes,
-                rows=[],
-            )
-
-        contract_ids = [c.id for c in contracts]
+    def value_contracts(
+        self,
+        db: Session,
+        farm_id: int | list[int],
+        contracts: list[Contract],
+        forced_ref_mes: date | None = None,
+        default_symbol: str = "AUTO",
+        as_of: datetime | None = None,
+    ) -> tuple[_Book, BookValues]:
+        """Carrega entradas e avalia (todas as posições de uma vez)."""
+        book = self._load_book(db, farm_id, contracts, forced_ref_mes, default_symbol, as_of)
+        return book, value_book(book.positions, book.market)
+
+    def book_totals(
+        self,
+        v: BookValues,
+        is_fixo: np.ndarray,
+        mode: str,
+        mask: np.ndarray | None = None,
+    ) -> dict[str, float | None]:
+        """
+        Totais do book (usd, system, manual) com as regras de None das linhas; None = nenhum contrato com valor.
+        mask: só os contratos marcados (ex: uma farm da visão consolidada).
+        """
+        open_ = ~is_fixo
+        sys_on = mode in ("system", "both")
+        man_on = mode in ("manual", "both")
 
-        last_cbot = self._latest_hedge_cbot_by_contract(db, contract_ids)
-        last_prem = self._latest_hedge_premium_by_contract(db, contract_ids)
-        last_fx = self._latest_hedge_fx_by_contract(db, contract_ids)
+        def total(col: np.ndarray) -> float | None:
+            present = ~np.isnan(col) if mask is None else ~np.isnan(col) & mask
+            return exact_sum(col[present]) if present.any() else None
 
-        # CBOT precisa do par (symbol, ref_mes)
-        cbot_pairs_needed: set[tuple[str, date]] = set()
-        # FX por ref_mes (dia 30)
-        refmes_needed: set[date] = set()
+        # FIXO_BRL: só BRL system, independente do mode
+        return {
+            "usd": total(np.where(open_, v.usd_total_contract, np.nan)),
+            "system": total(np.where(is_fixo | sys_on, v.system.brl_total_net, np.nan)),
+            "manual": total(np.where(open_ & man_on, v.manual.brl_total_net, np.nan)),
+        }
 
-        for c in contracts:
-            tipo = (getattr(c, "tipo_precificacao", None) or "").strip().upper()
-            if tipo == "FIXO_BRL":
+    # =========================
+    # Load (ORM -> colunas)
+    # =========================
+    def _load_book(
+        self,
+        db: Session,
+        farm_id: int | list[int],
+        contracts: list[Contract],
+        forced_ref_mes: date | None,
+        default_symbol: str,
+        as_of: datetime | None = None,
+    ) -> _Book:
+        n = len(contracts)
+        is_fixo = [(getattr(c, "tipo_precificacao", None) or "").strip().upper() == "FIXO_BRL" for c in contracts]
+
+        # FX por ref_mes (dia 30): não depende das travas, então entra na mesma ida ao banco
+        rm_fxs: list[date | None] = [
+            None if is_fixo[i] else (forced_ref_mes or ref_mes_of(c.data_entrega))
+            for i, c in enumerate(contracts)
+        ]
+
+        # as_of lê o histórico CBOT: só os pares (symbol, ref_mes) previstos do book entram no ranking
+        cbot_pairs: set[tuple[str, date]] = set()
+        if as_of is not None:
+            cbot_pairs = {(resolve_symbol(default_symbol, rm), rm) for rm in rm_fxs if rm is not None}
+
+        # ✅ travas + cotações + curva FX + ponto manual: 1 statement (UNION ALL)
+        farm_ids = farm_id if isinstance(farm_id, list) else [farm_id]
+        inputs = load_mtm_inputs(db, farm_ids, [c.id for c in contracts], rm_fxs, as_of, cbot_pairs)
+
+        hcs: list[HedgeCbotAgg | None] = [None] * n
+        hps: list[HedgePremiumAgg | None] = [None] * n
+        hfs: list[HedgeFxAgg | None] = [None] * n
+        symbols: list[str | None] = [None] * n
+        rm_cbots: list[date | None] = [None] * n
+        cqs: list[CbotQuoteIn | None] = [None] * n
+        fx_snaps: list[FxCurveIn | None] = [None] * n
+        fx_mans: list[FxManualIn | None] = [None] * n
+
+        for i, c in enumerate(contracts):
+            if is_fixo[i]:
                 continue
 
-            hc = last_cbot.map.get(c.id)
-
-            rm_fx = forced_ref_mes or _ref_mes_month(c.data_entrega)
-            refmes_needed.add(rm_fx)
+            hc = inputs.hedge_cbot.get(c.id)
+            hcs[i] = hc
+            hps[i] = inputs.hedge_premium.get(c.id)
+            hfs[i] = inputs.hedge_fx.get(c.id)
 
+            rm_fx = rm_fxs[i]
             rm_cbot = getattr(hc, "ref_mes", None) if hc else None
-            rm_cbot = _ref_mes_month(rm_cbot) if rm_cbot else rm_fx
-
-            symbol = (getattr(hc, "symbol", None) or default_symbol or "").strip()
-            if symbol.upper() == "AUTO":
-                symbol = _auto_symbol_for_ref_mes(rm_cbot)
-
-            if symbol and rm_cbot:
-                cbot_pairs_needed.add((symbol, rm_cbot))
-
-        latest_cbot_quote = self._latest_cbot_by_symbol_ref_mes(db, farm_id, cbot_pairs_needed)
-        latest_fx_curve = self._latest_fx_curve_by_ref_mes(db, farm_id, refmes_needed)
-        latest_fx_manual = self._latest_fx_manual_by_ref_mes(db, farm_id, refmes_needed)
-
-        as_of_ts = datetime.now(timezone.utc)
-        rows: list[ContractMtmRow] = []
-
-        for c in contracts:
-            vol_total_ton = max(float(c.volume_total_ton or 0.0), 0.0)
-            sacas_total = float(round(vol_total_ton * SACAS_PER_TON, 0))
-
-            tipo = (getattr(c, "tipo_precificacao", None) or "").strip().upper()
-
-            # -------------------------
-            # FIXO_BRL (sem travas)
-            # -------------------------
-            if tipo == "FIXO_BRL":
-                brl_sc_gross = self._brl_fixo_per_saca(c)
-                frete_total = self._frete_brl_total(c)
-
-                brl_sc_net, brl_total_net, brl_total_gross = self._apply_frete_net(
-                    brl_per_saca=brl_sc_gross,
-                    sacas_total=sacas_total,
-                    frete_total=frete_total,
-                )
-
-                totals = ContractTotals(
-                    ton_total=self._r(vol_total_ton, 4) or 0.0,
-                    sacas_total=self._r(sacas_total, 0) or 0.0,
-                    usd_total_contract=None,
-                    brl_total_contract=TotalsSide(system=self._r(brl_total_net, 4), manual=None),
-                    fx_locked_usd_used=TotalsSide(system=None, manual=None),
-                    fx_unlocked_usd_used=TotalsSide(system=None, manual=None),
-                    fx_lock_mode=TotalsModeSide(system="none", manual="none"),
-                    fx_locked_usd_pct=TotalsSide(system=None, manual=None),
-                    fx_unlocked_usd_pct=TotalsSide(system=None, manual=None),
-                )
-
-                # se filtros locks ativos (e não estamos no modo no_locks), não inclui FIXO_BRL
-                if (not no_locks) and filters_active:
-                    continue
-
-                rows.append(
-                    ContractMtmRow(
-                        contract=ContractBrief.from_orm(c),
-                        locks=LocksInfo(
-                            cbot=LockCbot(
-                                locked=False,
-                                coverage_pct=0.0,
-                                locked_cents_per_bu=None,
-                                symbol=None,
-                                ref_mes=None,
-                            ),
-                            premium=LockPremium(
-                                locked=False,
-                                coverage_pct=0.0,
-                                premium_value=None,
-                                premium_unit=None,
-                            ),
-                            fx=LockFx(
-                                locked=False,
-                                coverage_pct=0.0,
-                                brl_per_usd=None,
-                                tipo=None,
-                                usd_amount=None,
-                            ),
-                        ),
-                        quotes=QuotesInfo(cbot_system=None, fx_system=None, fx_manual=None),
-                        valuation=Valuation(
-                            usd_per_saca=ValuationSide(system=None, manual=None),
-                            # ✅ BRL/Sc agora é líquido (já descontando frete)
-                            brl_per_saca=ValuationSide(system=self._r(brl_sc_net, 4), manual=None),
-                            components={
-                                # (opcional) ajuda muito a debugar
-                                "frete_brl_total": UsedComponent(system=self._r(frete_total, 4), manual=None),
-                                "brl_total_gross": UsedComponent(system=self._r(brl_total_gross, 4), manual=None),
-                                "brl_per_saca_gross": UsedComponent(system=self._r(brl_sc_gross, 4), manual=None),
-                                "brl_per_saca_net": UsedComponent(system=self._r(brl_sc_net, 4), manual=None),
-                            },
-                        ),
-                        totals=totals,
-                        totals_view=None,
-                        filter_meta=None,
-                    )
-                )
-                continue
-
-            # -------------------------
-            # MTM normal (CBOT/PREMIO/FX)
-            # -------------------------
-            hc: HedgeCbot | None = last_cbot.map.get(c.id)
-            hp: HedgePremium | None = last_prem.map.get(c.id)
-            hf: HedgeFx | None = last_fx.map.get(c.id)
-
-            rm_fx = forced_ref_mes or _ref_mes_month(c.data_entrega)
-
-            rm_cbot = getattr(hc, "ref_mes", None) if hc else None
-            rm_cbot = _ref_mes_month(rm_cbot) if rm_cbot else rm_fx
-
-            symbol = (getattr(hc, "symbol", None) or default_symbol or "").strip()
-            if symbol.upper() == "AUTO":
-                symbol = _auto_symbol_for_ref_mes(rm_cbot)
-
-            cq: CbotQuote | None = latest_cbot_quote.map.get((symbol, rm_cbot))
-
-            fx_snap: _FxCurveSnap | None = latest_fx_curve.map.get(rm_fx)
-            fx_man: FxManualPoint | None = latest_fx_manual.map.get(rm_fx)
-
-            # -------------------------
-            # Coverage
-            # -------------------------
-            cbot_cov = self._coverage_pct(getattr(hc, "volume_ton", None), vol_total_ton) if hc else 0.0
-            prem_cov = self._coverage_pct(getattr(hp, "volume_ton", None), vol_total_ton) if hp else 0.0
-            fx_cov = self._coverage_pct(getattr(hf, "volume_ton", None), vol_total_ton) if hf else 0.0
-
-            # -------------------------
-            # Quotes
-            # -------------------------
-            cq_cents = _to_float(getattr(cq, "price_usd_per_bu", None))
-
-            fx_sys_rate = _to_float(getattr(fx_snap.point, "dolar_sint", None)) if fx_snap else None
-            fx_sys_ts = getattr(fx_snap.run, "as_of_ts", None) if fx_snap else None
-            fx_sys_source = f"{fx_snap.run.source}:{fx_snap.run.model_version}" if fx_snap else None
-
-            quotes = QuotesInfo(
-                cbot_system=(
-                    CbotQuoteBrief(
-                        symbol=symbol,
-                        capturado_em=cq.capturado_em,
-                        cents_per_bu=self._r(float(cq.price_usd_per_bu), 4),
-                    )
-                    if cq
-                    else None
-                ),
-                fx_system=(
-                    FxQuoteBrief(
-                        capturado_em=fx_sys_ts,
-                        ref_mes=rm_fx,
-                        brl_per_usd=self._r(fx_sys_rate, 6),
-                        source=fx_sys_source or "curve_model",
-                    )
-                    if (fx_sys_rate is not None and fx_sys_ts is not None)
-                    else None
-                ),
-                fx_manual=(
-                    FxManualBrief(
-                        captured_at=fx_man.captured_at,
-                        ref_mes=fx_man.ref_mes,
-                        brl_per_usd=self._r(float(fx_man.fx), 6),
-                        source="manual",
-                    )
-                    if fx_man
-                    else None
-                ),
+            rm_cbot = ref_mes_of(rm_cbot) if rm_cbot else rm_fx
+
+            # CBOT precisa do par (symbol, ref_mes) — lookup no calendário pré-calculado
+            symbol = resolve_symbol(getattr(hc, "symbol", None) or default_symbol, rm_cbot)
+
+            symbols[i] = symbol
+            rm_cbots[i] = rm_cbot
+            cqs[i] = inputs.cbot_quotes.get((c.farm_id, symbol, rm_cbot)) if symbol and rm_cbot else None
+            fx_snaps[i] = inputs.fx_curve.get((c.farm_id, rm_fx))
+            fx_mans[i] = inputs.fx_manual.get((c.farm_id, rm_fx))
+
+        # travas com symbol/ref_mes próprios (fora dos pares previstos): 2ª ida só para esses pares
+        if as_of is not None:
+            extra = {(symbols[i], rm_cbots[i]) for i in range(n) if symbols[i] and rm_cbots[i]} - cbot_pairs
+            if extra:
+                load_cbot_asof(db, farm_ids, extra, as_of, inputs)
+                for i, c in enumerate(contracts):
+                    if (symbols[i], rm_cbots[i]) in extra:
+                        cqs[i] = inputs.cbot_quotes.get((c.farm_id, symbols[i], rm_cbots[i]))
+
+        # ref_mes sem ponto gravado (fora da grade do worker): curva do run da farm avaliada na data
+        missing = [
+            i for i in range(n)
+            if rm_fxs[i] is not None and fx_snaps[i] is None and contracts[i].farm_id in inputs.fx_runs
+        ]
+        if missing:
+            self._fx_from_runs(inputs.fx_runs, contracts, rm_fxs, fx_snaps, missing)
+
+        # entradas do loader já são float (conversão única do Decimal lá)
+        def col(objs, attr: str) -> np.ndarray:
+            return np.array(
+                [_nan_if_none(getattr(o, attr, None)) if o is not None else np.nan for o in objs],
+                dtype=np.float64,
             )
 
-            # -------------------------
-            # Locks
-            # -------------------------
-            locked_cents_raw = _to_float(getattr(hc, "cbot_usd_per_bu", None)) if hc else None
-            quote_cents_hint = cq_cents
-
-            locked_cents = (
-                self._normalize_cbot_cents(locked_cents_raw, quote_cents_hint)
-                if locked_cents_raw is not None
-                else None
-            )
-            live_cents = (
-                self._normalize_cbot_cents(quote_cents_hint, quote_cents_hint)
-                if quote_cents_hint is not None
-                else None
-            )
+        positions = BookPositions(
+            vol_total_ton=np.array([float(c.volume_total_ton or 0.0) for c in contracts], dtype=np.float64),
+            is_fixo=np.array(is_fixo, dtype=bool),
+            fixo_brl_per_saca=np.array(
+                [_nan_if_none(self._brl_fixo_per_saca(c)) if is_fixo[i] else np.nan for i, c in enumerate(contracts)],
+                dtype=np.float64,
+            ),
+            frete_brl_total=np.array([self._frete_brl_total(c) for c in contracts], dtype=np.float64),
+            cbot_hedge_ton=col(hcs, "volume_ton"),
+            cbot_locked_raw=col(hcs, "cbot_usd_per_bu"),
+            prem_hedge_ton=col(hps, "volume_ton"),
+            prem_value=col(hps, "premium_value"),
+            prem_unit=np.array(
+                [premium_unit_code(getattr(hp, "premium_unit", None)) for hp in hps],
+                dtype=np.int8,
+            ),
+            fx_hedge_ton=col(hfs, "volume_ton"),
+            fx_locked_rate=col(hfs, "brl_per_usd"),
+            fx_locked_usd_amount=col(hfs, "usd_amount"),
+        )
 
-            locks = LocksInfo(
-                cbot=LockCbot(
-                    locked=hc is not None,
-                    coverage_pct=self._r(cbot_cov, 6) or 0.0,
-                    locked_cents_per_bu=self._r(locked_cents, 4),
-                    symbol=symbol,
-                    ref_mes=getattr(hc, "ref_mes", None) if hc else None,
-                ),
-                premium=LockPremium(
-                    locked=hp is not None,
-                    coverage_pct=self._r(prem_cov, 6) or 0.0,
-                    premium_value=self._r(_to_float(getattr(hp, "premium_value", None)), 6) if hp else None,
-                    premium_unit=getattr(hp, "premium_unit", None) if hp else None,
-                ),
-                fx=LockFx(
-                    locked=hf is not None,
-                    coverage_pct=self._r(fx_cov, 6) or 0.0,
-                    brl_per_usd=self._r(_to_float(getattr(hf, "brl_per_usd", None)), 6) if hf else None,
-                    tipo=getattr(hf, "tipo", None) if hf else None,
-                    usd_amount=self._r(_to_float(getattr(hf, "usd_amount", None)), 4) if hf else None,
-                ),
-            )
+        market = BookMarket(
+            cbot_cents=col(cqs, "price_usd_per_bu"),
+            fx_system=col(fx_snaps, "dolar_sint"),
+            fx_manual=col(fx_mans, "fx"),
+        )
 
-            # -------------------------
-            # USD/saca efetivo (CBOT + Premium)
-            # -------------------------
-            locked_usd_per_bu = self._cbot_cents_to_usd_per_bu(locked_cents)
-            live_usd_per_bu = self._cbot_cents_to_usd_per_bu(live_cents)
+        return _Book(
+            contracts=contracts,
+            hedge_cbot=hcs,
+            hedge_premium=hps,
+            hedge_fx=hfs,
+            symbols=symbols,
+            rm_cbot=rm_cbots,
+            rm_fx=rm_fxs,
+            cbot_quotes=cqs,
+            fx_curve=fx_snaps,
+            fx_manual=fx_mans,
+            positions=positions,
+            market=market,
+        )
 
-            cbot_effective = self._mix_by_coverage(cbot_cov, locked_usd_per_bu, live_usd_per_bu)
+    def _fx_from_runs(
+        self,
+        runs: dict[int, FxRunIn],
+        contracts: list[Contract],
+        rm_fxs: list[date | None],
+        fx_snaps: list[FxCurveIn | None],
+        idx: list[int],
+    ) -> None:
+        by_farm: dict[int, list[int]] = {}
+        for i in idx:
+            by_farm.setdefault(contracts[i].farm_id, []).append(i)
+
+        for fid, rows in by_farm.items():
+            run = runs[fid]
+            t, _, fwd = forward_curve(run.spot, run_as_of_date(run.as_of_ts), [rm_fxs[i] for i in rows], run.coupon_curve)
+            # mesma escala da coluna fx_model_points.dolar_sint (Numeric 18,6)
+            fwd = np.round(fwd, 6)
+            coupon = run.coupon_curve.at(t)
+            for k, i in enumerate(rows):
+                fx_snaps[i] = FxCurveIn(
+                    ref_mes=rm_fxs[i],
+                    as_of_ts=run.as_of_ts,
+                    dolar_sint=float(fwd[k]),
+                    source=run.source,
+                    model_version=run.model_version,
+                    t_anos=float(t[k]),
+                    coupon_annual=float(coupon[k]),
+                )
 
-            prem_locked = self._premium_to_usd_per_bu(hp)
-            prem_effective = self._mix_by_coverage(prem_cov, prem_locked, 0.0) or 0.0
+    # =========================
+    # Materialize (colunas -> ContractMtmRow)
+    # =========================
+    def materialize_row(
+        self,
+        book: _Book,
+        v: BookValues,
+        i: int,
+        mode: str,
+        filter_slice: tuple[float, float, float] | None = None,
+        selected_types: set[str] | None = None,
+        selected_states: set[str] | None = None,
+        detail: str = "full",
+        projection: set[str] | None = None,
+    ) -> ContractMtmRow:
+        c = book.contracts[i]
+        # colunas convertidas/arredondadas uma vez por book; aqui só indexa
+        r = v.out.row(i)
+        pos = book.positions
 
-            usd_per_bu_total = (cbot_effective + prem_effective) if cbot_effective is not None else None
-            usd_per_saca = (usd_per_bu_total * BUSHELS_PER_SACA) if usd_per_bu_total is not None else None
+        if pos.is_fixo[i]:
+            return self.project_row(self._materialize_fixo_row(c, v, i, detail), "full", projection)
 
-            usd_total_contract = (usd_per_saca * sacas_total) if (usd_per_saca is not None and sacas_total > 0) else None
+        want = projection if projection is not None else ROW_SECTIONS
 
-            # -------------------------
-            # FX mix system/manual
-            # -------------------------
-            fx_locked_rate = _to_float(getattr(hf, "brl_per_usd", None)) if hf else None
-            fx_locked_usd_amount = _to_float(getattr(hf, "usd_amount", None)) if hf else None
+        hc = book.hedge_cbot[i]
+        hp = book.hedge_premium[i]
+        hf = book.hedge_fx[i]
+        symbol = book.symbols[i]
 
-            fx_sys_live = fx_sys_rate
-            fx_man_live = _to_float(getattr(fx_man, "fx", None))
+        sys_on = mode in ("system", "both")
+        man_on = mode in ("manual", "both")
 
-            brl_per_saca_system_gross, lock_usd_sys, unlock_usd_sys, mode_sys = self._fx_brl_per_saca_with_breakdown(
-                usd_per_saca=usd_per_saca,
-                sacas_total=sacas_total,
-                fx_locked_rate=fx_locked_rate,
-                fx_locked_usd_amount=fx_locked_usd_amount,
-                fx_live_rate=fx_sys_live,
-                fx_cov_fallback=fx_cov,
-            )
-            brl_per_saca_manual_gross, lock_usd_man, unlock_usd_man, mode_man = self._fx_brl_per_saca_with_breakdown(
-                usd_per_saca=usd_per_saca,
-                sacas_total=sacas_total,
-                fx_locked_rate=fx_locked_rate,
-                fx_locked_usd_amount=fx_locked_usd_amount,
-                fx_live_rate=fx_man_live,
-                fx_cov_fallback=fx_cov,
-            )
+        s = v.system
+        m = v.manual
 
-            # ✅ FRETE (sempre líquido = bruto - frete_total)
-            frete_total = self._frete_brl_total(c)
-
-            brl_per_saca_system, brl_total_system, brl_total_system_gross = self._apply_frete_net(
-                brl_per_saca=brl_per_saca_system_gross,
-                sacas_total=sacas_total,
-                frete_total=frete_total,
-            )
-            brl_per_saca_manual, brl_total_manual, brl_total_manual_gross = self._apply_frete_net(
-                brl_per_saca=brl_per_saca_manual_gross,
-                sacas_total=sacas_total,
-                frete_total=frete_total,
-            )
-
-            # FX efetivo deve refletir BRL/sc líquido
-            fx_eff_system = self._safe_div(brl_per_saca_system, usd_per_saca)
-            fx_eff_manual = self._safe_div(brl_per_saca_manual, usd_per_saca)
+        # -------------------------
+        # Locks (sempre: filtro e totals_view dependem deles)
+        # -------------------------
+        locks = LocksInfo(
+            cbot=LockCbot(
+                locked=hc is not None,
+                coverage_pct=r(v.cov_cbot, 6) or 0.0,
+                locked_cents_per_bu=r(v.cbot_locked_cents, 4),
+                symbol=symbol,
+                ref_mes=getattr(hc, "ref_mes", None) if hc else None,
+                lots=hc.lots if hc else 0,
+                locked_ton=r(pos.cbot_hedge_ton, 4) if hc else None,
+            ),
+            premium=LockPremium(
+                locked=hp is not None,
+                coverage_pct=r(v.cov_premium, 6) or 0.0,
+                premium_value=r(pos.prem_value, 6) if hp else None,
+                premium_unit=getattr(hp, "premium_unit", None) if hp else None,
+                lots=hp.lots if hp else 0,
+                locked_ton=r(pos.prem_hedge_ton, 4) if hp else None,
+            ),
+            fx=LockFx(
+                locked=hf is not None,
+                coverage_pct=r(v.cov_fx, 6) or 0.0,
+                brl_per_usd=r(pos.fx_locked_rate, 6) if hf else None,
+                tipo=getattr(hf, "tipo", None) if hf else None,
+                usd_amount=r(pos.fx_locked_usd_amount, 4) if hf else None,
+                lots=hf.lots if hf else 0,
+                locked_ton=r(pos.fx_hedge_ton, 4) if hf else None,
+            ),
+        )
 
+        valuation = None
+        if "valuation" in want:
             valuation = Valuation(
                 usd_per_saca=ValuationSide(
-                    system=self._r(usd_per_saca, 4) if mode in ("system", "both") else None,
-                    manual=self._r(usd_per_saca, 4) if mode in ("manual", "both") else None,
+                    system=r(v.usd_per_saca, 4) if sys_on else None,
+                    manual=r(v.usd_per_saca, 4) if man_on else None,
                 ),
                 brl_per_saca=ValuationSide(
                     # ✅ agora líquido
-                    system=self._r(brl_per_saca_system, 4) if mode in ("system", "both") else None,
-                    manual=self._r(brl_per_saca_manual, 4) if mode in ("manual", "both") else None,
+                    system=r(s.brl_per_saca_net, 4) if sys_on else None,
+                    manual=r(m.brl_per_saca_net, 4) if man_on else None,
                 ),
-                components={
-                    "cbot_locked_usd_per_bu": UsedComponent(system=self._r(locked_usd_per_bu, 6), manual=self._r(locked_usd_per_bu, 6)),
-                    "cbot_live_usd_per_bu": UsedComponent(system=self._r(live_usd_per_bu, 6), manual=self._r(live_usd_per_bu, 6)),
-                    "cbot_effective_usd_per_bu": UsedComponent(system=self._r(cbot_effective, 6), manual=self._r(cbot_effective, 6)),
-                    "premium_locked_usd_per_bu": UsedComponent(system=self._r(prem_locked, 6), manual=self._r(prem_locked, 6)),
-                    "premium_effective_usd_per_bu": UsedComponent(system=self._r(prem_effective, 6), manual=self._r(prem_effective, 6)),
-                    "fx_locked_brl_per_usd": UsedComponent(system=self._r(fx_locked_rate, 6), manual=self._r(fx_locked_rate, 6)),
-                    "fx_locked_usd_amount": UsedComponent(system=self._r(fx_locked_usd_amount, 4), manual=self._r(fx_locked_usd_amount, 4)),
-                    "fx_live_brl_per_usd": UsedComponent(system=self._r(fx_sys_live, 6), manual=self._r(fx_man_live, 6)),
-                    "fx_effective_brl_per_usd": UsedComponent(system=self._r(fx_eff_system, 6), manual=self._r(fx_eff_manual, 6)),
-                    # ✅ debug frete
-                    "frete_brl_total": UsedComponent(system=self._r(frete_total, 4), manual=self._r(frete_total, 4)),
-                    "brl_per_saca_gross": UsedComponent(system=self._r(brl_per_saca_system_gross, 4), manual=self._r(brl_per_saca_manual_gross, 4)),
-                    "brl_per_saca_net": UsedComponent(system=self._r(brl_per_saca_system, 4), manual=self._r(brl_per_saca_manual, 4)),
-                    "brl_total_gross": UsedComponent(system=self._r(brl_total_system_gross, 4), manual=self._r(brl_total_manual_gross, 4)),
-                    "brl_total_net": UsedComponent(system=self._r(brl_total_system, 4), manual=self._r(brl_total_manual, 4)),
-                },
+                components=self._components(book, v, i) if detail == "full" else None,
             )
 
-            lock_pct_sys = self._safe_pct(lock_usd_sys, usd_total_contract)
-            unlock_pct_sys = self._safe_pct(unlock_usd_sys, usd_total_contract)
-            lock_pct_man = self._safe_pct(lock_usd_man, usd_total_contract)
-            unlock_pct_man = self._safe_pct(unlock_usd_man, usd_total_contract)
+        totals = ContractTotals(
+            ton_total=r(v.ton_total, 4) or 0.0,
+            sacas_total=r(v.sacas_total, 0) or 0.0,
+            usd_total_contract=r(v.usd_total_contract, 4),
+            brl_total_contract=TotalsSide(
+                # ✅ agora líquido
+                system=r(s.brl_total_net, 4) if sys_on else None,
+                manual=r(m.brl_total_net, 4) if man_on else None,
+            ),
+            fx_locked_usd_used=TotalsSide(system=r(s.fx_locked_usd, 4), manual=r(m.fx_locked_usd, 4)),
+            fx_unlocked_usd_used=TotalsSide(system=r(s.fx_unlocked_usd, 4), manual=r(m.fx_unlocked_usd, 4)),
+            fx_lock_mode=TotalsModeSide(
+                system=FX_MODE_LABELS[int(s.fx_lock_mode[i])],
+                manual=FX_MODE_LABELS[int(m.fx_lock_mode[i])],
+            ),
+            fx_locked_usd_pct=TotalsSide(system=r(s.fx_locked_pct, 6), manual=r(m.fx_locked_pct, 6)),
+            fx_unlocked_usd_pct=TotalsSide(system=r(s.fx_unlocked_pct, 6), manual=r(m.fx_unlocked_pct, 6)),
+        )
 
-            totals = ContractTotals(
-                ton_total=self._r(vol_total_ton, 4) or 0.0,
-                sacas_total=self._r(sacas_total, 0) or 0.0,
-                usd_total_contract=self._r(usd_total_contract, 4),
-                brl_total_contract=TotalsSide(
-                    # ✅ agora líquido
-                    system=self._r(brl_total_system, 4) if mode in ("system", "both") else None,
-                    manual=self._r(brl_total_manual, 4) if mode in ("manual", "both") else None,
-                ),
-                fx_locked_usd_used=TotalsSide(system=self._r(lock_usd_sys, 4), manual=self._r(lock_usd_man, 4)),
-                fx_unlocked_usd_used=TotalsSide(system=self._r(unlock_usd_sys, 4), manual=self._r(unlock_usd_man, 4)),
-                fx_lock_mode=TotalsModeSide(system=mode_sys, manual=mode_man),
-                fx_locked_usd_pct=TotalsSide(system=self._r(lock_pct_sys, 6), manual=self._r(lock_pct_man, 6)),
-                fx_unlocked_usd_pct=TotalsSide(system=self._r(unlock_pct_sys, 6), manual=self._r(unlock_pct_man, 6)),
+        totals_view = None
+        filter_meta = None
+        if filter_slice is not None:
+            filter_meta, totals_view = self.filter_meta_and_view(
+                locks, totals, filter_slice, selected_types or set(), selected_states or set()
             )
 
-            # -------------------------
-            # ✅ filtros simples + fatia (AND)
-            # -------------------------
-            pct_map = {
-                "cbot": float(locks.cbot.coverage_pct or 0.0),
-                "premium": float(locks.premium.coverage_pct or 0.0),
-                "fx": float(locks.fx.coverage_pct or 0.0),
-            }
-            st_cbot = self._state_simple(pct_map["cbot"])
-            st_prem = self._state_simple(pct_map["premium"])
-            st_fx = self._state_simple(pct_map["fx"])
+        return ContractMtmRow(
+            contract=ContractBrief.from_orm(c),
+            locks=locks if "locks" in want else None,
+            quotes=self._quotes_info(book, v, i) if "quotes" in want else None,
+            valuation=valuation,
+            totals=totals if "totals" in want else None,
+            totals_view=totals_view if "totals_view" in want else None,
+            filter_meta=filter_meta if "filter_meta" in want else None,
+        )
 
-            if filters_active:
-                pcts = [pct_map[t] for t in selected_types]
-                locked_pct = self._locked_pct_and(pcts)  # min
-                open_pct = self._open_pct_and(pcts)      # 1 - max
-
-                want_locked = "locked" in selected_states
-                want_open = "open" in selected_states
-
-                # passa se a fatia escolhida existir (>0)
-                if want_locked and not want_open:
-                    if locked_pct <= 0.0:
-                        continue
-                elif want_open and not want_locked:
-                    if open_pct <= 0.0:
-                        continue
-                else:
-                    if (locked_pct <= 0.0) and (open_pct <= 0.0):
-                        continue
-
-                slice_pct = self._slice_pct_from_states(locked_pct, open_pct, selected_states)
-
-                filter_meta = RowFilterMeta(
-                    lock_types=sorted(selected_types),    # type: ignore
-                    lock_states=sorted(selected_states),  # type: ignore
-                    state_cbot=st_cbot,                   # type: ignore
-                    state_premium=st_prem,                # type: ignore
-                    state_fx=st_fx,                       # type: ignore
-                    pct_cbot=self._r(pct_map["cbot"], 6) or 0.0,
-                    pct_premium=self._r(pct_map["premium"], 6) or 0.0,
-                    pct_fx=self._r(pct_map["fx"], 6) or 0.0,
-                    locked_pct=self._r(locked_pct, 6) or 0.0,
-                    open_pct=self._r(open_pct, 6) or 0.0,
-                    slice_pct=self._r(slice_pct, 6) or 0.0,
+    def _quotes_info(self, book: _Book, v: BookValues, i: int) -> QuotesInfo:
+        r = v.out.row(i)
+        mkt = book.market
+        cq = book.cbot_quotes[i]
+        fx_snap = book.fx_curve[i]
+        fx_man = book.fx_manual[i]
+
+        fx_sys_rate = r(mkt.fx_system, 6) if fx_snap else None
+        fx_sys_ts = getattr(fx_snap, "as_of_ts", None) if fx_snap else None
+        fx_sys_source = f"{fx_snap.source}:{fx_snap.model_version}" if fx_snap else None
+
+        return QuotesInfo(
+            cbot_system=(
+                CbotQuoteBrief(
+                    symbol=book.symbols[i],
+                    capturado_em=cq.capturado_em,
+                    cents_per_bu=r(mkt.cbot_cents, 4),
                 )
-
-                totals_view = self._mul_totals_view(totals, slice_pct)
-
-                rows.append(
-                    ContractMtmRow(
-                        contract=ContractBrief.from_orm(c),
-                        locks=locks,
-                        quotes=quotes,
-                        valuation=valuation,
-                        totals=totals,
-                        totals_view=totals_view,
-                        filter_meta=filter_meta,
-                    )
+                if cq
+                else None
+            ),
+            fx_system=(
+                FxQuoteBrief(
+                    capturado_em=fx_sys_ts,
+                    ref_mes=book.rm_fx[i],
+                    brl_per_usd=fx_sys_rate,
+                    source=fx_sys_source or "curve_model",
                 )
-            else:
-                rows.append(
-                    ContractMtmRow(
-                        contract=ContractBrief.from_orm(c),
-                        locks=locks,
-                        quotes=quotes,
-                        valuation=valuation,
-                        totals=totals,
-                        totals_view=None,
-                        filter_meta=None,
-                    )
+                if (fx_sys_rate is not None and fx_sys_ts is not None)
+                else None
+            ),
+            fx_manual=(
+                FxManualBrief(
+                    captured_at=fx_man.captured_at,
+                    ref_mes=fx_man.ref_mes,
+                    brl_per_usd=r(mkt.fx_manual, 6),
+                    source="manual",
                 )
-
-        return ContractsMtmResponse(
-            farm_id=farm_id,
-            as_of_ts=as_of_ts,
-            mode=mode,
-            fx_ref_mes=forced_ref_mes,
-            no_locks=no_locks,
-            rows=rows,
+                if fx_man
+                else None
+            ),
         )
 
-    # =========================
-    # FX breakdown (igual ao seu)
-    # =========================
-    def _fx_brl_per_saca_with_breakdown(
+    def _components(self, book: _Book, v: BookValues, i: int) -> dict[str, UsedComponent]:
+        """Breakdown de debug (detail=full)."""
+        r = v.out.row(i)
+        s = v.system
+        m = v.manual
+        return {
+            "cbot_locked_usd_per_bu": _both(r(v.cbot_locked_usd_per_bu, 6)),
+            "cbot_live_usd_per_bu": _both(r(v.cbot_live_usd_per_bu, 6)),
+            "cbot_effective_usd_per_bu": _both(r(v.cbot_effective_usd_per_bu, 6)),
+            "premium_locked_usd_per_bu": _both(r(v.premium_locked_usd_per_bu, 6)),
+            "premium_effective_usd_per_bu": _both(r(v.premium_effective_usd_per_bu, 6)),
+            "fx_locked_brl_per_usd": _both(r(book.positions.fx_locked_rate, 6)),
+            "fx_locked_usd_amount": _both(r(book.positions.fx_locked_usd_amount, 4)),
+            "fx_live_brl_per_usd": UsedComponent(system=r(s.fx_live, 6), manual=r(m.fx_live, 6)),
+            "fx_effective_brl_per_usd": UsedComponent(system=r(s.fx_effective, 6), manual=r(m.fx_effective, 6)),
+            # ✅ debug frete
+            "frete_brl_total": _both(r(v.frete_brl_total, 4)),
+            "brl_per_saca_gross": UsedComponent(system=r(s.brl_per_saca_gross, 4), manual=r(m.brl_per_saca_gross, 4)),
+            "brl_per_saca_net": UsedComponent(system=r(s.brl_per_saca_net, 4), manual=r(m.brl_per_saca_net, 4)),
+            "brl_total_gross": UsedComponent(system=r(s.brl_total_gross, 4), manual=r(m.brl_total_gross, 4)),
+            "brl_total_net": UsedComponent(system=r(s.brl_total_net, 4), manual=r(m.brl_total_net, 4)),
+        }
+
+    def filter_meta_and_view(
         self,
-        usd_per_saca,
-        sacas_total,
-        fx_locked_rate,
-        fx_locked_usd_amount,
-        fx_live_rate,
-        fx_cov_fallback,
-    ):
-        if usd_per_saca is None or sacas_total <= 0:
-            return (None, None, None, "none")
-
-        usd_total = usd_per_saca * sacas_total
-
-        if fx_live_rate is None and fx_locked_rate is None:
-            return (None, 0.0, usd_total, "none")
-
-        if fx_locked_rate is None and fx_locked_usd_amount is None:
-            if fx_live_rate is None:
-                return (None, 0.0, usd_total, "none")
-            brl_total = usd_total * fx_live_rate
-            return (brl_total / sacas_total, 0.0, usd_total, "none")
-
-        if fx_locked_usd_amount is not None and fx_locked_rate is not None and usd_total > 0:
-            locked_usd = max(0.0, min(fx_locked_usd_amount, usd_total))
-            unlocked_usd = usd_total - locked_usd
-
-            live = fx_live_rate if fx_live_rate is not None else fx_locked_rate
-            brl_total = (locked_usd * fx_locked_rate) + (unlocked_usd * live)
-            return (brl_total / sacas_total, locked_usd, unlocked_usd, "usd_amount")
-
-        if fx_locked_rate is None:
-            if fx_live_rate is None:
-                return (None, 0.0, usd_total, "none")
-            brl_total = usd_total * fx_live_rate
-            return (brl_total / sacas_total, 0.0, usd_total, "none")
-
-        fx_eff = self._mix_by_coverage(fx_cov_fallback, fx_locked_rate, fx_live_rate)
-        if fx_eff is None:
-            return (None, 0.0, usd_total, "none")
-
-        cov = float(max(0.0, min(1.0, fx_cov_fallback)))
-        locked_usd = usd_total * cov
-        unlocked_usd = usd_total - locked_usd
+        locks: LocksInfo,
+        totals: ContractTotals,
+        filter_slice: tuple[float, float, float],
+        selected_types: set[str],
+        selected_states: set[str],
+    ) -> tuple[RowFilterMeta, ContractTotalsView]:
+        """✅ filtros simples + fatia (AND)"""
+        r = self._r
+        locked_pct, open_pct, slice_pct = filter_slice
+        pct_map = {
+            "cbot": float(locks.cbot.coverage_pct or 0.0),
+            "premium": float(locks.premium.coverage_pct or 0.0),
+            "fx": float(locks.fx.coverage_pct or 0.0),
+        }
+        filter_meta = RowFilterMeta(
+            lock_types=sorted(selected_types),    # type: ignore
+            lock_states=sorted(selected_states),  # type: ignore
+            state_cbot=self._state_simple(pct_map["cbot"]),       # type: ignore
+            state_premium=self._state_simple(pct_map["premium"]),  # type: ignore
+            state_fx=self._state_simple(pct_map["fx"]),           # type: ignore
+            pct_cbot=r(pct_map["cbot"], 6) or 0.0,
+            pct_premium=r(pct_map["premium"], 6) or 0.0,
+            pct_fx=r(pct_map["fx"], 6) or 0.0,
+            locked_pct=r(locked_pct, 6) or 0.0,
+            open_pct=r(open_pct, 6) or 0.0,
+            slice_pct=r(slice_pct, 6) or 0.0,
+        )
+        return filter_meta, self._mul_totals_view(totals, float(slice_pct))
+
+    def _materialize_fixo_row(self, c: Contract, v: BookValues, i: int, detail: str = "full") -> ContractMtmRow:
+        """FIXO_BRL (sem travas): só o lado system, BRL/Sc líquido de frete."""
+        r = v.out.row(i)
+        s = v.system
+
+        totals = ContractTotals(
+            ton_total=r(v.ton_total, 4) or 0.0,
+            sacas_total=r(v.sacas_total, 0) or 0.0,
+            usd_total_contract=None,
+            brl_total_contract=TotalsSide(system=r(s.brl_total_net, 4), manual=None),
+            fx_locked_usd_used=TotalsSide(system=None, manual=None),
+            fx_unlocked_usd_used=TotalsSide(system=None, manual=None),
+            fx_lock_mode=TotalsModeSide(system="none", manual="none"),
+            fx_locked_usd_pct=TotalsSide(system=None, manual=None),
+            fx_unlocked_usd_pct=TotalsSide(system=None, manual=None),
+        )
 
-        return (usd_per_saca * fx_eff, locked_usd, unlocked_usd, "coverage")
+        return ContractMtmRow(
+            contract=ContractBrief.from_orm(c),
+            locks=LocksInfo(
+                cbot=LockCbot(
+                    locked=False,
+                    coverage_pct=0.0,
+                    locked_cents_per_bu=None,
+                    symbol=None,
+                    ref_mes=None,
+                ),
+                premium=LockPremium(
+                    locked=False,
+                    coverage_pct=0.0,
+                    premium_value=None,
+                    premium_unit=None,
+                ),
+                fx=LockFx(
+                    locked=False,
+                    coverage_pct=0.0,
+                    brl_per_usd=None,
+                    tipo=None,
+                    usd_amount=None,
+                ),
+            ),
+            quotes=QuotesInfo(cbot_system=None, fx_system=None, fx_manual=None),
+            valuation=Valuation(
+                usd_per_saca=ValuationSide(system=None, manual=None),
+                # ✅ BRL/Sc agora é líquido (já descontando frete)
+                brl_per_saca=ValuationSide(system=r(s.brl_per_saca_net, 4), manual=None),
+                components=(
+                    {
+                        # (opcional) ajuda muito a debugar
+                        "frete_brl_total": UsedComponent(system=r(v.frete_brl_total, 4), manual=None),
+                        "brl_total_gross": UsedComponent(system=r(s.brl_total_gross, 4), manual=None),
+                        "brl_per_saca_gross": UsedComponent(system=r(s.brl_per_saca_gross, 4), manual=None),
+                        "brl_per_saca_net": UsedComponent(system=r(s.brl_per_saca_net, 4), manual=None),
+                    }
+                    if detail == "full"
+                    else None
+                ),
+            ),
+            totals=totals,
+            totals_view=None,
+            filter_meta=None,
+        )
 
     # =========================
     # Helpers
     # =========================
-    def _safe_pct(self, part, total):
-        if part is None or total is None:
-            return None
-        if abs(total) < 1e-12:
-            return None
-        return max(0.0, min(1.0, part / total))
-
     def _r(self, v, nd):
         if v is None:
             return None
         try:
-            return round(float(v), nd)
+            x = float(v)
         except Exception:
             return None
-
-    def _safe_div(self, a, b):
-        if a is None or b is None:
-            return None
-        if abs(b) < 1e-12:
-            return None
-        return a / b
-
-    def _mix_by_coverage(self, cov, locked, live):
-        cov = float(cov or 0.0)
-        cov = 0.0 if cov < 0 else 1.0 if cov > 1 else cov
-
-        if cov >= 0.999999:
-            return locked
-        if cov <= 0.000001:
-            return live
-
-        if locked is None and live is None:
-            return None
-        if locked is None:
-            return live
-        if live is None:
-            return locked
-
-        return (cov * locked) + ((1.0 - cov) * live)
-
-    def _cbot_cents_to_usd_per_bu(self, cents_per_bu):
-        if cents_per_bu is None:
+        if x != x:  # NaN (valor ausente no engine)
             return None
-        return float(cents_per_bu) / 100.0
-
-    def _premium_to_usd_per_bu(self, hp):
-        if not hp:
-            return 0.0
-        v = _to_float(getattr(hp, "premium_value", None))
-        unit = (getattr(hp, "premium_unit", None) or "").strip().upper()
-        if v is None:
-            return 0.0
-        if unit == "USD_BU":
-            return float(v)
-        if unit == "USD_TON":
-            return float(v) * TON_PER_BU
-        return 0.0
-
-    def _coverage_pct(self, hedge_vol_ton, contract_vol_total_ton: float) -> float:
-        hv = _to_float(hedge_vol_ton) or 0.0
-        if contract_vol_total_ton <= 0:
-            return 0.0
-        pct = hv / contract_vol_total_ton
-        return float(max(0.0, min(1.0, pct)))
-
-    def _normalize_cbot_cents(self, v, quote_cents_hint):
-        if v is None:
-            return None
-        if quote_cents_hint is None:
-            if v < 50:
-                return v * 100.0
-            return v
-        if quote_cents_hint > 100 and v < 50:
-            return v * 100.0
-        return v
-
-    # =========================
-    # Queries (latest)
-    # =========================
-    def _latest_hedge_cbot_by_contract(self, db: Session, contract_ids: list[int]) -> _LatestByKey:
-        if not contract_ids:
-            return _LatestByKey(map={})
-        sub = (
-            db.query(HedgeCbot.contract_id.label("contract_id"), func.max(HedgeCbot.executado_em).label("mx"))
-            .filter(HedgeCbot.contract_id.in_(contract_ids))
-            .group_by(HedgeCbot.contract_id)
-            .subquery()
-        )
-        rows = (
-            db.query(HedgeCbot)
-            .join(sub, and_(HedgeCbot.contract_id == sub.c.contract_id, HedgeCbot.executado_em == sub.c.mx))
-            .all()
-        )
-        return _LatestByKey(map={r.contract_id: r for r in rows})
-
-    def _latest_hedge_premium_by_contract(self, db: Session, contract_ids: list[int]) -> _LatestByKey:
-        if not contract_ids:
-            return _LatestByKey(map={})
-        sub = (
-            db.query(HedgePremium.contract_id.label("contract_id"), func.max(HedgePremium.executado_em).label("mx"))
-            .filter(HedgePremium.contract_id.in_(contract_ids))
-            .group_by(HedgePremium.contract_id)
-            .subquery()
-        )
-        rows = (
-            db.query(HedgePremium)
-            .join(sub, and_(HedgePremium.contract_id == sub.c.contract_id, HedgePremium.executado_em == sub.c.mx))
-            .all()
-        )
-        return _LatestByKey(map={r.contract_id: r for r in rows})
-
-    def _latest_hedge_fx_by_contract(self, db: Session, contract_ids: list[int]) -> _LatestByKey:
-        if not contract_ids:
-            return _LatestByKey(map={})
-        sub = (
-            db.query(HedgeFx.contract_id.label("contract_id"), func.max(HedgeFx.executado_em).label("mx"))
-            .filter(HedgeFx.contract_id.in_(contract_ids))
-            .group_by(HedgeFx.contract_id)
-            .subquery()
-        )
-        rows = (
-            db.query(HedgeFx)
-            .join(sub, and_(HedgeFx.contract_id == sub.c.contract_id, HedgeFx.executado_em == sub.c.mx))
-            .all()
-        )
-        return _LatestByKey(map={r.contract_id: r for r in rows})
-
-    def _latest_cbot_by_symbol_ref_mes(self, db: Session, farm_id: int, pairs: set[tuple[str, date]]) -> _LatestByKey:
-        pairs = {(s.strip(), rm) for (s, rm) in pairs if s and s.strip() and rm}
-        if not pairs:
-            return _LatestByKey(map={})
-
-        symbols = sorted({s for (s, _) in pairs})
-        ref_meses = sorted({rm for (_, rm) in pairs})
-
-        ranked = (
-            db.query(
-                CbotQuote.id.label("id"),
-                func.row_number()
-                .over(
-                    partition_by=(CbotQuote.symbol, CbotQuote.ref_mes),
-                    order_by=(CbotQuote.capturado_em.desc(), CbotQuote.id.desc()),
-                )
-                .label("rn"),
-            )
-            .filter(
-                CbotQuote.farm_id == farm_id,
-                CbotQuote.symbol.in_(symbols),
-                CbotQuote.ref_mes.in_(ref_meses),
-            )
-            .subquery()
-        )
-
-        rows = (
-            db.query(CbotQuote)
-            .join(ranked, CbotQuote.id == ranked.c.id)
-            .filter(ranked.c.rn == 1)
-            .all()
-        )
-
-        wanted = set(pairs)
-        return _LatestByKey(map={(r.symbol, r.ref_mes): r for r in rows if (r.symbol, r.ref_mes) in wanted})
-
-    def _latest_fx_curve_by_ref_mes(self, db: Session, farm_id: int, ref_meses: Iterable[date]) -> _LatestByKey:
-        ref_meses = {rm for rm in ref_meses if rm}
-        if not ref_meses:
-            return _LatestByKey(map={})
-
-        ranked = (
-            db.query(
-                FxModelPoint.id.label("point_id"),
-                FxModelPoint.ref_mes.label("ref_mes"),
-                func.row_number()
-                .over(
-                    partition_by=FxModelPoint.ref_mes,
-                    order_by=(FxModelRun.as_of_ts.desc(), FxModelRun.id.desc(), FxModelPoint.id.desc()),
-                )
-                .label("rn"),
-            )
-            .join(FxModelRun, FxModelRun.id == FxModelPoint.run_id)
-            .filter(FxModelRun.farm_id == farm_id, FxModelPoint.ref_mes.in_(list(ref_meses)))
-            .subquery()
-        )
-
-        rows = (
-            db.query(FxModelRun, FxModelPoint)
-            .join(FxModelPoint, FxModelPoint.run_id == FxModelRun.id)
-            .join(ranked, FxModelPoint.id == ranked.c.point_id)
-            .filter(ranked.c.rn == 1)
-            .all()
-        )
-
-        m: dict[date, _FxCurveSnap] = {}
-        for run, point in rows:
-            m[point.ref_mes] = _FxCurveSnap(run=run, point=point)
-
-        return _LatestByKey(map=m)
-
-    def _latest_fx_manual_by_ref_mes(self, db: Session, farm_id: int, ref_meses: Iterable[date]) -> _LatestByKey:
-        ref_meses = {rm for rm in ref_meses if rm}
-        if not ref_meses:
-            return _LatestByKey(map={})
-
-        ranked = (
-            db.query(
-                FxManualPoint.id.label("id"),
-                func.row_number()
-                .over(
-                    partition_by=FxManualPoint.ref_mes,
-                    order_by=(FxManualPoint.captured_at.desc(), FxManualPoint.id.desc()),
-                )
-                .label("rn"),
-            )
-            .filter(FxManualPoint.farm_id == farm_id, FxManualPoint.ref_mes.in_(list(ref_meses)))
-            .subquery()
-        )
-
-        rows = (
-            db.query(FxManualPoint)
-            .join(ranked, FxManualPoint.id == ranked.c.id)
-            .filter(ranked.c.rn == 1)
-            .all()
-        )
-        return _LatestByKey(map={r.ref_mes: r for r in rows})
+        return round(x, nd)
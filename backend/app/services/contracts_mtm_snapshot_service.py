@@ -0,0 +1,267 @@
+# app/services/contracts_mtm_snapshot_service.py
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+from typing import Iterable, Iterator
+
+import numpy as np
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.db.upsert import upsert
+from app.models.contract import Contract
+from app.models.contract_mtm_snapshot import ContractMtmSnapshot
+from app.schemas.contracts_mtm import ContractBrief, ContractMtmRow, ContractsMtmResponse, ContractsMtmStreamHeader
+from app.services.contracts_mtm_service import ContractsMtmService
+from app.services.mtm_engine import lock_filter
+
+# o snapshot guarda só o que depende do MTM; contract/filtros são montados na leitura
+_SNAPSHOT_EXCLUDE = {"contract", "totals_view", "filter_meta"}
+
+_mtm = ContractsMtmService()
+
+
+class ContractsMtmSnapshotService:
+    # =========================
+    # Manutenção
+    # =========================
+    def refresh_contracts(self, db: Session, farm_id: int, contract_ids: Iterable[int]) -> int:
+        """
+        Recalcula (upsert) o snapshot dos contratos informados.
+        Não faz commit: roda na transação de quem chamou (ex: create/delete de hedge).
+        """
+        ids = sorted({int(i) for i in contract_ids})
+        if not ids:
+            return 0
+
+        contracts = (
+            db.query(Contract)
+            .filter(Contract.farm_id == farm_id, Contract.id.in_(ids))
+            .order_by(Contract.id.desc())
+            .all()
+        )
+        if not contracts:
+            return 0
+
+        book, values = _mtm.value_contracts(db, farm_id, contracts)
+        as_of_ts = datetime.now(timezone.utc)
+
+        rows = [
+            {
+                "contract_id": c.id,
+                "farm_id": farm_id,
+                "cbot_symbol": book.symbols[i],
+                "cbot_ref_mes": book.rm_cbot[i],
+                "fx_ref_mes": book.rm_fx[i],
+                "as_of_ts": as_of_ts,
+                "dirty": False,
+                "payload": _mtm.materialize_row(book, values, i, "both").model_dump(mode="json", exclude=_SNAPSHOT_EXCLUDE),
+            }
+            for i, c in enumerate(contracts)
+        ]
+
+        # ✅ upsert: leituras concorrentes do mesmo contrato sem snapshot não colidem na PK
+        upsert(db, ContractMtmSnapshot, rows, ["contract_id"])
+
+        # objetos já carregados na sessão passam a refletir o upsert
+        db.query(ContractMtmSnapshot).filter(ContractMtmSnapshot.contract_id.in_(ids)).populate_existing().all()
+        return len(contracts)
+
+    def mark_dirty(
+        self,
+        db: Session,
+        farm_id: int,
+        contract_ids: Iterable[int] | None = None,
+        cbot_pairs: Iterable[tuple[str, date]] | None = None,
+        fx_ref_meses: Iterable[date] | None = None,
+    ) -> int:
+        """Marca como desatualizados os snapshots afetados (recalculados na próxima leitura)."""
+        conds = []
+
+        ids = sorted({int(i) for i in (contract_ids or [])})
+        if ids:
+            conds.append(ContractMtmSnapshot.contract_id.in_(ids))
+
+        for symbol, rm in set(cbot_pairs or []):
+            conds.append(and_(ContractMtmSnapshot.cbot_symbol == symbol, ContractMtmSnapshot.cbot_ref_mes == rm))
+
+        ref_meses = sorted({rm for rm in (fx_ref_meses or []) if rm})
+        if ref_meses:
+            conds.append(ContractMtmSnapshot.fx_ref_mes.in_(ref_meses))
+
+        if not conds:
+            return 0
+
+        return (
+            db.query(ContractMtmSnapshot)
+            .filter(
+                ContractMtmSnapshot.farm_id == farm_id,
+                ContractMtmSnapshot.dirty.is_(False),
+                or_(*conds),
+            )
+            .update({ContractMtmSnapshot.dirty: True}, synchronize_session=False)
+        )
+
+    # =========================
+    # Leitura
+    # =========================
+    def contracts_mtm(
+        self,
+        db: Session,
+        farm_id: int,
+        mode: str,
+        only_open: bool,
+        limit: int,
+        lock_types: str | None = None,
+        lock_states: str | None = None,
+        no_locks: bool = False,
+        detail: str = "full",
+        fields: str | None = None,
+        after_id: int | None = None,
+    ) -> ContractsMtmResponse:
+        """
+        Mesmo contrato de resposta do ContractsMtmService.contracts_mtm (ref_mes=None, default_symbol=AUTO),
+        servido a partir de contract_mtm_snapshots. Só os contratos sem snapshot ou dirty são recalculados.
+        """
+        header, rows = self.stream_contracts_mtm(
+            db, farm_id, mode, only_open, limit, lock_types, lock_states, no_locks, detail, fields, after_id
+        )
+
+        return ContractsMtmResponse(
+            farm_id=farm_id,
+            as_of_ts=header.as_of_ts,
+            mode=mode,
+            no_locks=no_locks,
+            source="snapshot",
+            snapshot_as_of=header.snapshot_as_of,
+            detail=header.detail,
+            fields=header.fields,
+            next_cursor=header.next_cursor,
+            rows=list(rows),
+        )
+
+    def stream_contracts_mtm(
+        self,
+        db: Session,
+        farm_id: int,
+        mode: str,
+        only_open: bool,
+        limit: int,
+        lock_types: str | None = None,
+        lock_states: str | None = None,
+        no_locks: bool = False,
+        detail: str = "full",
+        fields: str | None = None,
+        after_id: int | None = None,
+    ) -> tuple[ContractsMtmStreamHeader, Iterator[ContractMtmRow]]:
+        """format=ndjson: snapshots já garantidos frescos aqui; o gerador só monta as linhas."""
+        selected_types, selected_states, filters_active = _mtm.lock_filters(lock_types, lock_states, no_locks)
+        projection = _mtm.row_projection(fields)
+
+        contracts, next_cursor = _mtm.page_contracts(
+            db, farm_id, only_open, no_locks, filters_active, limit, after_id,
+            lock_prefilter=True, selected_types=selected_types, selected_states=selected_states,
+        )
+
+        as_of_ts = datetime.now(timezone.utc)
+        snaps = self._snapshots_fresh(db, farm_id, [c.id for c in contracts]) if contracts else {}
+
+        header = ContractsMtmStreamHeader(
+            farm_id=farm_id,
+            as_of_ts=as_of_ts,
+            mode=mode,
+            no_locks=no_locks,
+            source="snapshot",
+            snapshot_as_of=min((s.as_of_ts for s in snaps.values()), default=None),
+            detail=detail,
+            fields=sorted(projection) if projection is not None else None,
+            next_cursor=next_cursor,
+        )
+        rows = self._iter_rows(
+            contracts, snaps, mode, selected_types, selected_states, filters_active, detail, projection
+        )
+        return header, rows
+
+    def _iter_rows(
+        self,
+        contracts: list[Contract],
+        snaps: dict[int, ContractMtmSnapshot],
+        mode: str,
+        selected_types: set[str],
+        selected_states: set[str],
+        filters_active: bool,
+        detail: str = "full",
+        projection: set[str] | None = None,
+    ) -> Iterator[ContractMtmRow]:
+        step = _mtm.STREAM_CHUNK_SIZE
+
+        for start in range(0, len(contracts), step):
+            chunk = contracts[start : start + step]
+
+            rows = [
+                ContractMtmRow(contract=ContractBrief.from_orm(c), **snaps[c.id].payload)
+                for c in chunk
+            ]
+
+            is_fixo = np.array(
+                [(c.tipo_precificacao or "").strip().upper() == "FIXO_BRL" for c in chunk],
+                dtype=bool,
+            )
+
+            for row, fixo in zip(rows, is_fixo.tolist()):
+                if not fixo:
+                    self._apply_mode(row, mode)
+
+            if not filters_active:
+                for row in rows:
+                    yield _mtm.project_row(row, detail, projection)
+                continue
+
+            keep, locked_pct, open_pct, slice_pct = lock_filter(
+                np.array([r.locks.cbot.coverage_pct for r in rows], dtype=np.float64),
+                np.array([r.locks.premium.coverage_pct for r in rows], dtype=np.float64),
+                np.array([r.locks.fx.coverage_pct for r in rows], dtype=np.float64),
+                is_fixo,
+                selected_types,
+                selected_states,
+            )
+            for i in np.flatnonzero(keep).tolist():
+                row = rows[i]
+                row.filter_meta, row.totals_view = _mtm.filter_meta_and_view(
+                    row.locks,
+                    row.totals,
+                    (locked_pct[i], open_pct[i], slice_pct[i]),
+                    selected_types,
+                    selected_states,
+                )
+                yield _mtm.project_row(row, detail, projection)
+
+    def _snapshots_fresh(self, db: Session, farm_id: int, contract_ids: list[int]) -> dict[int, ContractMtmSnapshot]:
+        snaps = {
+            s.contract_id: s
+            for s in db.query(ContractMtmSnapshot).filter(ContractMtmSnapshot.contract_id.in_(contract_ids)).all()
+        }
+
+        stale = [cid for cid in contract_ids if cid not in snaps or snaps[cid].dirty]
+        if stale:
+            self.refresh_contracts(db, farm_id, stale)
+            db.commit()
+            snaps.update(
+                {
+                    s.contract_id: s
+                    for s in db.query(ContractMtmSnapshot).filter(ContractMtmSnapshot.contract_id.in_(stale)).all()
+                }
+            )
+
+        return snaps
+
+    def _apply_mode(self, row: ContractMtmRow, mode: str) -> None:
+        """Snapshot é calculado com mode=both; aqui esconde o lado não pedido."""
+        if mode == "system":
+            row.valuation.usd_per_saca.manual = None
+            row.valuation.brl_per_saca.manual = None
+            row.totals.brl_total_contract.manual = None
+        elif mode == "manual":
+            row.valuation.usd_per_saca.system = None
+            row.valuation.brl_per_saca.system = None
+            row.totals.brl_total_contract.system = None
@@ -0,0 +1,204 @@
+# app/services/contracts_mtm_summary_service.py
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.contract import Contract
+from app.schemas.contracts_mtm import (
+    ContractsMtmSummaryBucket,
+    ContractsMtmSummaryResponse,
+    TotalsSide,
+)
+from app.services.contracts_mtm_service import ContractsMtmService, _parse_ref_mes
+from app.services.mtm_engine import group_sum, lock_filter
+
+GROUP_BY_DIMS = ("delivery_month", "pricing_type", "lock_state")
+
+_ALL_LOCK_TYPES = {"cbot", "premium", "fx"}
+
+_mtm = ContractsMtmService()
+
+
+class ContractsMtmSummaryService:
+    """
+    Agregado do book no servidor: mesmos filtros/fatia (slice_pct) do contracts_mtm,
+    somados por delivery_month / pricing_type / lock_state em uma passada (bincount).
+    """
+
+    def summary(
+        self,
+        db: Session,
+        farm_id: int,
+        mode: str,
+        only_open: bool,
+        ref_mes: str | None,
+        default_symbol: str,
+        limit: int,
+        lock_types: str | None = None,
+        lock_states: str | None = None,
+        no_locks: bool = False,
+        group_by: str | None = None,
+    ) -> ContractsMtmSummaryResponse:
+        forced_ref_mes = _parse_ref_mes(ref_mes)
+        selected_types, selected_states, filters_active = _mtm.lock_filters(lock_types, lock_states, no_locks)
+        dims = self._parse_group_by(group_by)
+
+        contracts = (
+            _mtm.contracts_query(
+                db, farm_id, only_open, no_locks, filters_active,
+                selected_types=selected_types, selected_states=selected_states,
+            )
+            .order_by(Contract.id.desc())
+            .limit(limit)
+            .all()
+        )
+
+        buckets: list[ContractsMtmSummaryBucket] = []
+        total = self._empty_bucket()
+
+        if contracts:
+            total, buckets = self._aggregate(
+                db, farm_id, contracts, mode, forced_ref_mes, default_symbol,
+                selected_types, selected_states, filters_active, dims,
+            )
+
+        return ContractsMtmSummaryResponse(
+            farm_id=farm_id,
+            as_of_ts=datetime.now(timezone.utc),
+            mode=mode,
+            fx_ref_mes=forced_ref_mes,
+            no_locks=no_locks,
+            group_by=list(dims),  # type: ignore
+            lock_types=sorted(selected_types) if filters_active else [],    # type: ignore
+            lock_states=sorted(selected_states) if filters_active else [],  # type: ignore
+            total=total,
+            buckets=buckets,
+        )
+
+    def _aggregate(
+        self,
+        db: Session,
+        farm_id: int,
+        contracts: list[Contract],
+        mode: str,
+        forced_ref_mes,
+        default_symbol: str,
+        selected_types: set[str],
+        selected_states: set[str],
+        filters_active: bool,
+        dims: tuple[str, ...],
+    ) -> tuple[ContractsMtmSummaryBucket, list[ContractsMtmSummaryBucket]]:
+        book, v = _mtm.value_contracts(db, farm_id, contracts, forced_ref_mes, default_symbol)
+        is_fixo = book.positions.is_fixo
+        n = len(contracts)
+
+        # fatia: igual ao totals_view das linhas (totals * slice_pct)
+        if filters_active:
+            keep, _, _, slice_pct = lock_filter(
+                v.cov_cbot, v.cov_premium, v.cov_fx, is_fixo, selected_types, selected_states
+            )
+            k = np.clip(slice_pct, 0.0, 1.0)
+        else:
+            keep = np.ones(n, dtype=bool)
+            k = np.ones(n)
+
+        # estado: locked se todos os tipos (do filtro, ou os 3) têm alguma trava — mesma regra AND
+        _, locked_pct, _, _ = lock_filter(
+            v.cov_cbot,
+            v.cov_premium,
+            v.cov_fx,
+            is_fixo,
+            selected_types if filters_active else _ALL_LOCK_TYPES,
+            {"locked"},
+        )
+        states = np.where(is_fixo, "none", np.where(locked_pct > 0.0, "locked", "open"))
+
+        idx = np.flatnonzero(keep)
+        if idx.size == 0:
+            return self._empty_bucket(), []
+
+        groups: dict[tuple, int] = {}
+        codes = np.array(
+            [groups.setdefault(self._key(contracts[i], str(states[i]), dims), len(groups)) for i in idx.tolist()],
+            dtype=np.int64,
+        )
+
+        sys_on = mode in ("system", "both")
+        man_on = mode in ("manual", "both")
+        s = v.system
+        m = v.manual
+        open_ = ~is_fixo
+
+        # mesmas regras de None das linhas (FIXO_BRL: só BRL system, independente do mode)
+        metrics = {
+            "ton_total": v.ton_total,
+            "sacas_total": v.sacas_total,
+            "usd_total_contract": np.where(open_, v.usd_total_contract, np.nan),
+            "brl_system": np.where(is_fixo | sys_on, s.brl_total_net, np.nan),
+            "brl_manual": np.where(open_ & man_on, m.brl_total_net, np.nan),
+            "fx_locked_system": np.where(open_, s.fx_locked_usd, np.nan),
+            "fx_locked_manual": np.where(open_, m.fx_locked_usd, np.nan),
+            "fx_unlocked_system": np.where(open_, s.fx_unlocked_usd, np.nan),
+            "fx_unlocked_manual": np.where(open_, m.fx_unlocked_usd, np.nan),
+        }
+
+        kk = k[idx]
+        per_group = {name: group_sum(codes, len(groups), col[idx] * kk) for name, col in metrics.items()}
+        counts = np.bincount(codes, minlength=len(groups))
+
+        zeros = np.zeros(codes.shape[0], dtype=np.int64)
+        per_total = {name: group_sum(zeros, 1, col[idx] * kk) for name, col in metrics.items()}
+
+        total = self._bucket({}, int(idx.size), per_total, 0)
+        buckets = [
+            self._bucket(dict(zip(dims, key)), int(counts[g]), per_group, g)
+            for key, g in sorted(groups.items(), key=lambda kv: tuple(x or "" for x in kv[0]))
+        ]
+        return total, buckets
+
+    def _key(self, c: Contract, state: str, dims: tuple[str, ...]) -> tuple:
+        values = {
+            "delivery_month": c.data_entrega.strftime("%Y-%m") if c.data_entrega else None,
+            "pricing_type": (c.tipo_precificacao or "").strip().upper() or None,
+            "lock_state": state,
+        }
+        return tuple(values[d] for d in dims)
+
+    def _bucket(self, dims: dict, contracts: int, sums: dict, g: int) -> ContractsMtmSummaryBucket:
+        r = _mtm._r
+
+        def val(name: str, nd: int):
+            total, present = sums[name]
+            return r(total[g], nd) if present[g] > 0 else None
+
+        return ContractsMtmSummaryBucket(
+            **dims,
+            contracts=contracts,
+            ton_total=val("ton_total", 4) or 0.0,
+            sacas_total=val("sacas_total", 0) or 0.0,
+            usd_total_contract=val("usd_total_contract", 4),
+            brl_total_contract=TotalsSide(system=val("brl_system", 4), manual=val("brl_manual", 4)),
+            fx_locked_usd_used=TotalsSide(system=val("fx_locked_system", 4), manual=val("fx_locked_manual", 4)),
+            fx_unlocked_usd_used=TotalsSide(system=val("fx_unlocked_system", 4), manual=val("fx_unlocked_manual", 4)),
+        )
+
+    def _empty_bucket(self) -> ContractsMtmSummaryBucket:
+        return ContractsMtmSummaryBucket(
+            contracts=0,
+            ton_total=0.0,
+            sacas_total=0.0,
+            usd_total_contract=None,
+            brl_total_contract=TotalsSide(system=None, manual=None),
+            fx_locked_usd_used=TotalsSide(system=None, manual=None),
+            fx_unlocked_usd_used=TotalsSide(system=None, manual=None),
+        )
+
+    def _parse_group_by(self, group_by: str | None) -> tuple[str, ...]:
+        if group_by is None:
+            return GROUP_BY_DIMS
+        wanted = _mtm._parse_csv_set(group_by)
+        # mantém a ordem canônica das dimensões
+        return tuple(d for d in GROUP_BY_DIMS if d in wanted)
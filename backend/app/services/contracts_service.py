@@ -5,12 +5,15 @@ from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
 from app.models.contract import Contract
+from app.services.contracts_mtm_snapshot_service import ContractsMtmSnapshotService
 from app.utils.units import saca_to_ton
 
 ALLOWED_TIPO = {"CBOT_PREMIO", "FIXO_BRL"}
 ALLOWED_UNIT = {"TON", "SACA"}
 ALLOWED_STATUS = {"ABERTO", "PARCIAL", "FECHADO", "CANCELADO"}  # ajuste como quiser
 
+_snapshots = ContractsMtmSnapshotService()
+
 
 class ContractsService:
     def _norm_tipo(self, v: str) -> str:
@@ -192,6 +195,9 @@ class ContractsService:
                     detail="Contrato FIXO_BRL exige preco_fixo_brl_value e preco_fixo_brl_unit",
                 )
 
+        # volume/preço/frete/entrega mudam o MTM
+        db.flush()
+        _snapshots.refresh_contracts(db, farm_id, [c.id])
         db.commit()
         db.refresh(c)
         return c
@@ -8,6 +8,9 @@ from sqlalchemy.orm import Session
 
 from app.models.fx_manual_point import FxManualPoint
 from app.models.fx_source import FxSource
+from app.services.contracts_mtm_snapshot_service import ContractsMtmSnapshotService
+
+_snapshots = ContractsMtmSnapshotService()
 
 
 class FxManualPointsService:
@@ -35,6 +38,7 @@ class FxManualPointsService:
             fx=payload.fx,
         )
         db.add(row)
+        _snapshots.mark_dirty(db, farm_id, fx_ref_meses=[payload.ref_mes])
         try:
             db.commit()
         except IntegrityError:
@@ -68,6 +72,7 @@ class FxManualPointsService:
 
     def update(self, db: Session, farm_id: int, point_id: int, payload) -> FxManualPoint:
         row = self.get(db, farm_id, point_id)
+        old_ref_mes = row.ref_mes
 
         if payload.captured_at is not None:
             row.captured_at = payload.captured_at
@@ -77,6 +82,7 @@ class FxManualPointsService:
         if payload.fx is not None:
             row.fx = payload.fx
 
+        _snapshots.mark_dirty(db, farm_id, fx_ref_meses=[old_ref_mes, row.ref_mes])
         try:
             db.commit()
         except IntegrityError:
@@ -88,4 +94,5 @@ class FxManualPointsService:
     def delete(self, db: Session, farm_id: int, point_id: int) -> None:
         row = self.get(db, farm_id, point_id)
         db.delete(row)
+        _snapshots.mark_dirty(db, farm_id, fx_ref_meses=[row.ref_mes])
         db.commit()
@@ -1,16 +1,55 @@
 # app/services/fx_model_service.py
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
+from dateutil import tz
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
 from app.models.fx_model_run import FxModelRun
 from app.models.fx_model_point import FxModelPoint
+from app.models.fx_curve_latest import FxCurveLatest
+from app.schemas.fx_model import FxForwardPointRead
+from app.utils.fx_curve import CouponCurve, forward_curve
+
+_BR_TZ = tz.gettz("America/Sao_Paulo")
+
+
+def run_as_of_date(as_of_ts: datetime) -> date:
+    """Data-base do t_anos de um run (o worker conta os dias a partir da data BR)."""
+    return as_of_ts.astimezone(_BR_TZ).date()
+
+
+def run_forwards(
+    spot: float,
+    as_of_ts: datetime,
+    coupon_curve: list | None,
+    coupon_annual: float | None,
+    dates: list[date],
+):
+    """
+    Forward de um run em datas quaisquer (mesma conta do fx_model_worker: t conta da data BR do run).
+    Runs sem coupon_curve usam o coupon_annual flat. Retorna (t_anos, cupom(t), cupom_t, fwd).
+    """
+    curve = CouponCurve.from_knots(coupon_curve, fallback=coupon_annual)
+    t, cupom_t, fwd = forward_curve(spot, run_as_of_date(as_of_ts), dates, curve)
+    return t, curve.at(t), cupom_t, fwd
 
 
 class FxModelService:
     def latest_run(self, db: Session, farm_id: int) -> FxModelRun | None:
+        # ✅ caminho rápido: fx_curve_latest (upsert do worker) aponta o run mais novo
+        latest = (
+            db.query(FxCurveLatest)
+            .filter(FxCurveLatest.farm_id == farm_id)
+            .order_by(FxCurveLatest.as_of_ts.desc(), FxCurveLatest.run_id.desc())
+            .first()
+        )
+        if latest:
+            run = db.get(FxModelRun, latest.run_id)
+            if run:
+                return run
+
         return (
             db.query(FxModelRun)
             .filter(FxModelRun.farm_id == farm_id)
@@ -57,6 +96,27 @@ class FxModelService:
 
         return before or after
 
+    def forwards(self, db: Session, farm_id: int, dates: list[date], run_id: int | None = None) -> list[FxForwardPointRead]:
+        """Curva avaliada nas datas pedidas (qualquer data de entrega, não só os pontos gravados)."""
+        run = self.get_run(db, farm_id, run_id) if run_id is not None else self.latest_run(db, farm_id)
+        if not run or not dates:
+            return []
+
+        t, coupon, _, fwd = run_forwards(
+            float(run.spot_usdbrl), run.as_of_ts, run.coupon_curve, float(run.coupon_annual), dates
+        )
+        desc = 1.0 - float(run.desconto_pct or 0)
+        return [
+            FxForwardPointRead(
+                data=d,
+                t_anos=round(float(t[i]), 8),
+                coupon_annual=round(float(coupon[i]), 6),
+                dolar_sint=round(float(fwd[i]), 6),
+                dolar_desc=round(float(fwd[i]) * desc, 6),
+            )
+            for i, d in enumerate(dates)
+        ]
+
     def list_points(self, db: Session, farm_id: int, run_id: int) -> list[FxModelPoint]:
         # garante que o run pertence à farm
         self.get_run(db, farm_id, run_id)
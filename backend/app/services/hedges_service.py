@@ -9,12 +9,17 @@ from app.models.contract import Contract
 from app.models.hedge_cbot import HedgeCbot
 from app.models.hedge_premium import HedgePremium
 from app.models.hedge_fx import HedgeFx
+from app.services.contracts_mtm_snapshot_service import ContractsMtmSnapshotService
+from app.services.lock_coverage_service import LockCoverageService
 
 
 ALLOWED_UNIT = {"TON", "SACA"}
 ALLOWED_PREMIUM_UNIT = {"USD_BU", "USD_TON"}
 ALLOWED_FX_TIPO = {"CURVA_SCRIPT", "MANUAL"}  # ajuste se quiser
 
+_snapshots = ContractsMtmSnapshotService()
+_coverage = LockCoverageService()
+
 
 class HedgesService:
     # ---------- Normalizações ----------
@@ -209,6 +214,9 @@ class HedgesService:
             observacao=payload.observacao,
         )
         db.add(h)
+        db.flush()
+        _coverage.refresh_contracts(db, farm_id, [c.id])
+        _snapshots.refresh_contracts(db, farm_id, [c.id])
         db.commit()
         db.refresh(h)
         return h
@@ -234,6 +242,9 @@ class HedgesService:
             observacao=payload.observacao,
         )
         db.add(h)
+        db.flush()
+        _coverage.refresh_contracts(db, farm_id, [c.id])
+        _snapshots.refresh_contracts(db, farm_id, [c.id])
         db.commit()
         db.refresh(h)
         return h
@@ -264,6 +275,9 @@ class HedgesService:
             observacao=payload.observacao,
         )
         db.add(h)
+        db.flush()
+        _coverage.refresh_contracts(db, farm_id, [c.id])
+        _snapshots.refresh_contracts(db, farm_id, [c.id])
         db.commit()
         db.refresh(h)
         return h
@@ -322,6 +336,9 @@ class HedgesService:
         # ✅ Ajusta FX automaticamente (remove/trim excedente)
         self._auto_trim_fx_to_usd_formed(db, contract_id)
 
+        db.flush()
+        _coverage.refresh_contracts(db, farm_id, [contract_id])
+        _snapshots.refresh_contracts(db, farm_id, [contract_id])
         db.commit()
 
     def delete_premium(self, db: Session, farm_id: int, contract_id: int, hedge_id: int, user_id: int) -> None:
@@ -346,6 +363,9 @@ class HedgesService:
         # ✅ Ajusta FX automaticamente (remove/trim excedente)
         self._auto_trim_fx_to_usd_formed(db, contract_id)
 
+        db.flush()
+        _coverage.refresh_contracts(db, farm_id, [contract_id])
+        _snapshots.refresh_contracts(db, farm_id, [contract_id])
         db.commit()
 
     def delete_fx(self, db: Session, farm_id: int, contract_id: int, hedge_id: int, user_id: int) -> None:
@@ -365,4 +385,7 @@ class HedgesService:
             raise HTTPException(status_code=404, detail="Hedge FX não encontrado")
 
         db.delete(h)
+        db.flush()
+        _coverage.refresh_contracts(db, farm_id, [contract_id])
+        _snapshots.refresh_contracts(db, farm_id, [contract_id])
         db.commit()
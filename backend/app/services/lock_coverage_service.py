@@ -0,0 +1,103 @@
+# app/services/lock_coverage_service.py
+from __future__ import annotations
+
+from typing import Iterable
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Query, Session
+
+from app.db.upsert import upsert
+from app.models.contract import Contract
+from app.models.contract_lock_coverage import ContractLockCoverage
+from app.models.hedge_cbot import HedgeCbot
+from app.models.hedge_fx import HedgeFx
+from app.models.hedge_premium import HedgePremium
+
+# tipo de trava (lock_types) -> (tabela de hedge, coluna de ton na cobertura)
+_KINDS = {
+    "cbot": (HedgeCbot, ContractLockCoverage.cbot_ton),
+    "premium": (HedgePremium, ContractLockCoverage.premium_ton),
+    "fx": (HedgeFx, ContractLockCoverage.fx_ton),
+}
+
+
+class LockCoverageService:
+    # =========================
+    # Manutenção
+    # =========================
+    def refresh_contracts(self, db: Session, farm_id: int, contract_ids: Iterable[int]) -> int:
+        """
+        Recalcula (upsert) o ton travado por tipo dos contratos informados: 1 SELECT com as 3 somas.
+        Não faz commit: roda na transação de quem chamou (create/delete de hedge).
+        """
+        ids = sorted({int(i) for i in contract_ids})
+        if not ids:
+            return 0
+
+        def ton(model):
+            return (
+                select(func.coalesce(func.sum(model.volume_ton), 0))
+                .where(model.contract_id == Contract.id)
+                .scalar_subquery()
+            )
+
+        rows = (
+            db.query(
+                Contract.id,
+                ton(HedgeCbot).label("cbot_ton"),
+                ton(HedgePremium).label("premium_ton"),
+                ton(HedgeFx).label("fx_ton"),
+            )
+            .filter(Contract.farm_id == farm_id, Contract.id.in_(ids))
+            .all()
+        )
+
+        # ✅ upsert: dois creates concorrentes no contrato sem linha de cobertura não colidem na PK
+        upsert(
+            db,
+            ContractLockCoverage,
+            [
+                {
+                    "contract_id": r.id,
+                    "farm_id": farm_id,
+                    "cbot_ton": r.cbot_ton,
+                    "premium_ton": r.premium_ton,
+                    "fx_ton": r.fx_ton,
+                }
+                for r in rows
+            ],
+            ["contract_id"],
+        )
+        return len(rows)
+
+    # =========================
+    # Filtro (query de contratos)
+    # =========================
+    def apply_filter(self, q: Query, selected_types: set[str], selected_states: set[str]) -> Query:
+        """
+        Pré-filtro SQL equivalente ao lock_filter do engine (regra AND sobre os tipos escolhidos):
+          locked: todos os tipos com ton > 0
+          open:   todos os tipos com ton < volume do contrato
+        Nunca descarta um contrato que o engine manteria (o engine ainda aplica o corte exato, com o
+        arredondamento de 6 casas), só evita avaliar os que seriam jogados fora.
+        """
+        types = [t for t in sorted(selected_types) if t in _KINDS]
+        want_locked = "locked" in selected_states
+        want_open = "open" in selected_states
+        if not types or not (want_locked or want_open):
+            return q
+
+        vol = Contract.volume_total_ton
+        tons = [func.coalesce(_KINDS[t][1], 0) for t in types]
+
+        locked = and_(vol > 0, *[t > 0 for t in tons])
+        open_ = and_(*[or_(vol <= 0, t < vol) for t in tons])
+
+        if want_locked and not want_open:
+            cond = locked
+        elif want_open and not want_locked:
+            cond = open_
+        else:
+            cond = or_(locked, open_)
+
+        return q.outerjoin(ContractLockCoverage, ContractLockCoverage.contract_id == Contract.id).filter(cond)
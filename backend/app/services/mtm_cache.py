@@ -0,0 +1,149 @@
+# app/services/mtm_cache.py
+"""
+Cache de respostas do contracts-mtm (LRU em memória, por processo).
+
+Chave = farm + parâmetros normalizados; cada entrada guarda o vetor de versões
+das entradas do MTM (contratos, travas, cotação CBOT, run FX, ponto manual) de
+quando foi calculada. Se o vetor atual for igual, a resposta sai do cache sem
+passar pelo engine; se mudou, recalcula e substitui (invalidação exata).
+
+O valor guardado é a resposta já serializada (CachedJson, imutável): um hit devolve os mesmos
+bytes a todas as requisições sem cópia e sem passar de novo pelo Pydantic, e nenhum chamador
+consegue alterar o que as próximas requisições vão receber.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.cbot_quote_latest import CbotQuoteLatest
+from app.models.contract import Contract
+from app.models.fx_manual_point import FxManualPoint
+from app.models.fx_model_run import FxModelRun
+from app.models.hedge_cbot import HedgeCbot
+from app.models.hedge_fx import HedgeFx
+from app.models.hedge_premium import HedgePremium
+
+
+def mtm_version_vector(db: Session, farm_id: int) -> tuple:
+    """
+    Uma query (subqueries escalares). max(id) + count pegam inserts e deletes;
+    max(updated_at) pega edições feitas pelo ORM.
+    """
+    cols = [
+        *_stats(Contract, Contract.farm_id == farm_id, Contract.updated_at),
+        *_hedge_stats(HedgeCbot, farm_id),
+        *_hedge_stats(HedgePremium, farm_id),
+        *_hedge_stats(HedgeFx, farm_id),
+        # upsert do worker: quote_id novo é sempre o maior id => muda a cada tick gravado
+        *_stats(
+            CbotQuoteLatest,
+            CbotQuoteLatest.farm_id == farm_id,
+            CbotQuoteLatest.capturado_em,
+            CbotQuoteLatest.quote_id,
+        ),
+        select(func.max(FxModelRun.id)).where(FxModelRun.farm_id == farm_id).scalar_subquery(),
+        *_stats(FxManualPoint, FxManualPoint.farm_id == farm_id, FxManualPoint.updated_at, FxManualPoint.id),
+    ]
+    return tuple(db.execute(select(*cols)).one())
+
+
+def _stats(model, where, *max_cols) -> list:
+    out = [select(func.count()).select_from(model).where(where).scalar_subquery()]
+    out += [select(func.max(c)).where(where).scalar_subquery() for c in max_cols]
+    return out
+
+
+def _hedge_stats(model, farm_id: int) -> list:
+    def sub(expr):
+        return (
+            select(expr)
+            .select_from(model)
+            .join(Contract, Contract.id == model.contract_id)
+            .where(Contract.farm_id == farm_id)
+            .scalar_subquery()
+        )
+
+    return [sub(func.count()), sub(func.max(model.id)), sub(func.max(model.updated_at))]
+
+
+class CachedJson(NamedTuple):
+    """Corpo JSON de uma resposta + nº de linhas (peso no LRU)."""
+
+    body: bytes
+    rows: int
+
+    @classmethod
+    def of(cls, response) -> "CachedJson":
+        return cls(response.model_dump_json().encode(), len(response.rows))
+
+
+class MtmResultCache:
+    """
+    LRU limitado pelo total de linhas guardadas (peso de cada entrada = linhas + 1).
+    Os valores são compartilhados entre requisições: guarde só objetos imutáveis (ex: CachedJson).
+    """
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        self._data: OrderedDict[Hashable, tuple[tuple, Any, int]] = OrderedDict()
+        self._weight = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key: Hashable, version: tuple, compute: Callable[[], Any], weight: Callable[[Any], int]):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] == version:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # calcula fora do lock (requisições concorrentes iguais podem calcular em dobro; a última vence)
+        value = compute()
+        self._put(key, version, value, int(weight(value)) + 1)
+        return value
+
+    def _put(self, key: Hashable, version: tuple, value: Any, w: int) -> None:
+        if w > self.max_rows:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._weight -= old[2]
+            self._data[key] = (version, value, w)
+            self._weight += w
+            while self._weight > self.max_rows and self._data:
+                _, (_, _, ew) = self._data.popitem(last=False)
+                self._weight -= ew
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._weight = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "rows": self._weight,
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / total) if total else None,
+            }
+
+
+mtm_cache = MtmResultCache(settings.MTM_CACHE_MAX_ROWS)
@@ -0,0 +1,483 @@
+# app/services/mtm_engine.py
+"""
+Motor vetorizado de MTM (NumPy).
+
+Recebe o book inteiro em colunas (uma posição por contrato) e calcula cobertura,
+USD/saca, BRL/saca bruto/líquido e o split FX travado/aberto de todos os
+contratos de uma vez, para os lados system e manual.
+
+Convenção: valor ausente (None no ORM) = NaN nos arrays.
+
+Política de conversão/arredondamento (dinheiro):
+- Decimal (Numeric) -> float64 uma vez só, no load (mtm_loader / colunas do contrato).
+- Engine todo em float64, sem arredondar no meio.
+- Saída: cada coluna vira lista Python uma vez por book (OutputColumns): NaN -> None e round()
+  nas casas do campo (4 = USD/BRL e preço por saca, 6 = taxas/pcts/preço por bu, 0 = sacas).
+  round() do Python é half-even sobre o valor binário exato: mesmo float => mesmo JSON.
+- Totais do book: exact_sum (math.fsum) sobre as colunas sem arredondar, que não depende da
+  ordem nem do particionamento (lotes, farms); arredonda só no fim.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# --- Constantes de conversão (SOJA) ---
+SOY_BU_KG = 27.2155
+SACA_KG = 60.0
+
+BUSHELS_PER_SACA = SACA_KG / SOY_BU_KG
+SACAS_PER_TON = 1000.0 / SACA_KG
+TON_PER_BU = SOY_BU_KG / 1000.0
+
+# premium_unit -> código
+PREMIUM_UNIT_NONE = 0
+PREMIUM_UNIT_USD_BU = 1
+PREMIUM_UNIT_USD_TON = 2
+
+# fx_lock_mode -> código
+FX_MODE_NONE = 0
+FX_MODE_USD_AMOUNT = 1
+FX_MODE_COVERAGE = 2
+
+FX_MODE_LABELS = ("none", "usd_amount", "coverage")
+
+_EPS = 1e-12
+
+
+def premium_unit_code(unit: str | None) -> int:
+    u = (unit or "").strip().upper()
+    if u == "USD_BU":
+        return PREMIUM_UNIT_USD_BU
+    if u == "USD_TON":
+        return PREMIUM_UNIT_USD_TON
+    return PREMIUM_UNIT_NONE
+
+
+@dataclass
+class BookPositions:
+    """Lado "contrato + travas" do book (não muda com o mercado)."""
+
+    vol_total_ton: np.ndarray        # volume bruto do contrato (pode vir <= 0)
+    is_fixo: np.ndarray              # bool: FIXO_BRL (sem travas)
+    fixo_brl_per_saca: np.ndarray    # preço fixo já em BRL/sc (NaN se ausente)
+    frete_brl_total: np.ndarray      # frete total em BRL (0 se não houver)
+
+    cbot_hedge_ton: np.ndarray       # NaN = sem trava CBOT
+    cbot_locked_raw: np.ndarray      # cbot_usd_per_bu como gravado (cents ou USD)
+
+    prem_hedge_ton: np.ndarray       # NaN = sem trava prêmio
+    prem_value: np.ndarray
+    prem_unit: np.ndarray            # PREMIUM_UNIT_*
+
+    fx_hedge_ton: np.ndarray         # NaN = sem trava FX
+    fx_locked_rate: np.ndarray
+    fx_locked_usd_amount: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.vol_total_ton.shape[0])
+
+
+@dataclass
+class BookMarket:
+    """Lado "mercado" do book, alinhado por contrato."""
+
+    cbot_cents: np.ndarray           # cotação CBOT (cents/bu), NaN = sem cotação
+    fx_system: np.ndarray            # curva do modelo (BRL/USD)
+    fx_manual: np.ndarray            # ponto manual (BRL/USD)
+    premium_live: np.ndarray | None = None  # prêmio (USD/bu) da parte sem trava; None = 0
+
+
+@dataclass
+class SideValues:
+    fx_live: np.ndarray
+    brl_per_saca_gross: np.ndarray
+    brl_per_saca_net: np.ndarray
+    brl_total_gross: np.ndarray
+    brl_total_net: np.ndarray
+    fx_effective: np.ndarray
+    fx_locked_usd: np.ndarray
+    fx_unlocked_usd: np.ndarray
+    fx_lock_mode: np.ndarray         # FX_MODE_*
+    fx_locked_pct: np.ndarray
+    fx_unlocked_pct: np.ndarray
+
+
+class OutputColumns:
+    """Colunas do book no formato de saída (lista de float|None já arredondada), calculadas sob demanda."""
+
+    def __init__(self) -> None:
+        # (id(array), casas) -> (array, lista); guarda o array para o id não ser reaproveitado
+        self._cols: dict[tuple[int, int], tuple[np.ndarray, list[float | None]]] = {}
+
+    def __call__(self, a: np.ndarray, nd: int) -> list[float | None]:
+        key = (id(a), nd)
+        hit = self._cols.get(key)
+        if hit is None:
+            hit = self._cols[key] = (a, out_col(a, nd))
+        return hit[1]
+
+    def row(self, i: int):
+        """r(coluna, casas) -> valor de saída da linha i (mesmo formato do antigo _r(col[i], casas))."""
+        cols = self._cols
+
+        def r(a: np.ndarray, nd: int) -> float | None:
+            hit = cols.get((id(a), nd))
+            return (hit[1] if hit is not None else self(a, nd))[i]
+
+        return r
+
+
+@dataclass
+class BookValues:
+    ton_total: np.ndarray
+    sacas_total: np.ndarray
+
+    cov_cbot: np.ndarray
+    cov_premium: np.ndarray
+    cov_fx: np.ndarray
+
+    cbot_locked_cents: np.ndarray
+    cbot_locked_usd_per_bu: np.ndarray
+    cbot_live_usd_per_bu: np.ndarray
+    cbot_effective_usd_per_bu: np.ndarray
+    premium_locked_usd_per_bu: np.ndarray
+    premium_effective_usd_per_bu: np.ndarray
+
+    usd_per_saca: np.ndarray
+    usd_total_contract: np.ndarray
+    frete_brl_total: np.ndarray
+
+    system: SideValues
+    manual: SideValues
+
+    out: OutputColumns = field(default_factory=OutputColumns, repr=False, compare=False)
+
+
+# =========================
+# Saída
+# =========================
+def out_col(a: np.ndarray, nd: int) -> list[float | None]:
+    """
+    Coluna float64 -> lista Python arredondada em nd casas (NaN -> None), igual a round(x, nd) por célula.
+    rint(x*10^nd)/10^nd é exato fora de empates; onde o produto cai perto de ,5 (o erro de x*10^nd
+    pode trocar o lado) ou não é representável, decide com o round() do Python.
+    """
+    scale = 10.0**nd
+    with np.errstate(invalid="ignore", over="ignore"):
+        y = a * scale
+        out = np.rint(y) / scale
+        frac = np.abs(y - np.trunc(y))
+        slow = ~np.isnan(a) & (
+            ~(np.abs(y) < 2.0**52) | (np.abs(frac - 0.5) <= np.abs(y) * 1e-15)
+        )
+    vals = out.tolist()
+    for k in np.flatnonzero(slow).tolist():
+        vals[k] = round(float(a[k]), nd)
+    return [None if x != x else x for x in vals]
+
+
+def exact_sum(a: np.ndarray) -> float:
+    """Soma correta (fsum): reprodutível independente da ordem/particionamento das parcelas."""
+    return math.fsum(a.tolist())
+
+
+# =========================
+# Primitivas vetorizadas
+# =========================
+def mix_by_coverage(cov: np.ndarray, locked: np.ndarray, live: np.ndarray) -> np.ndarray:
+    cov = np.clip(np.nan_to_num(cov, nan=0.0), 0.0, 1.0)
+
+    out = cov * locked + (1.0 - cov) * live
+    out = np.where(np.isnan(live), locked, out)
+    out = np.where(np.isnan(locked), live, out)
+
+    out = np.where(cov <= 0.000001, live, out)
+    out = np.where(cov >= 0.999999, locked, out)
+    return out
+
+
+def coverage_pct(hedge_ton: np.ndarray, contract_ton: np.ndarray) -> np.ndarray:
+    hv = np.nan_to_num(hedge_ton, nan=0.0)
+    pct = np.divide(hv, contract_ton, out=np.zeros_like(hv), where=contract_ton > 0)
+    pct = np.clip(pct, 0.0, 1.0)
+    # sem trava => 0
+    return np.where(np.isnan(hedge_ton), 0.0, pct)
+
+
+def normalize_cbot_cents(v: np.ndarray, quote_cents_hint: np.ndarray) -> np.ndarray:
+    """Valores < 50 foram gravados em USD/bu; converte para cents (com hint da cotação)."""
+    scale = np.where(np.isnan(quote_cents_hint), v < 50, (quote_cents_hint > 100) & (v < 50))
+    return np.where(scale, v * 100.0, v)
+
+
+def premium_to_usd_per_bu(value: np.ndarray, unit: np.ndarray, has_hedge: np.ndarray) -> np.ndarray:
+    v = np.where(unit == PREMIUM_UNIT_USD_TON, value * TON_PER_BU, value)
+    v = np.where(unit == PREMIUM_UNIT_NONE, 0.0, v)
+    v = np.where(np.isnan(v) | ~has_hedge, 0.0, v)
+    return v
+
+
+def safe_div(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    ok = ~np.isnan(a) & ~np.isnan(b) & (np.abs(b) >= _EPS)
+    return np.divide(a, b, out=np.full_like(a, np.nan), where=ok)
+
+
+def safe_pct(part: np.ndarray, total: np.ndarray) -> np.ndarray:
+    return np.clip(safe_div(part, total), 0.0, 1.0)
+
+
+def apply_frete_net(brl_per_saca: np.ndarray, sacas_total: np.ndarray, frete_total: np.ndarray):
+    """NET = bruto - frete_total. Retorna (per_saca_net, total_net, total_gross)."""
+    ok = ~np.isnan(brl_per_saca) & (sacas_total > 0)
+    gross = np.where(ok, brl_per_saca * sacas_total, np.nan)
+    net = gross - np.nan_to_num(frete_total, nan=0.0)
+    per_saca = np.divide(net, sacas_total, out=np.full_like(net, np.nan), where=ok)
+    return per_saca, net, gross
+
+
+def fx_brl_per_saca_with_breakdown(
+    usd_per_saca: np.ndarray,
+    sacas_total: np.ndarray,
+    fx_locked_rate: np.ndarray,
+    fx_locked_usd_amount: np.ndarray,
+    fx_live_rate: np.ndarray,
+    fx_cov: np.ndarray,
+):
+    """
+    Modos: "usd_amount" (trava por montante), "coverage" (mistura pela cobertura)
+    ou "none" (tudo no câmbio ao vivo). Retorna (brl_per_saca, locked_usd, unlocked_usd, mode).
+    """
+    n = usd_per_saca.shape[0]
+    nan = np.full(n, np.nan)
+
+    valid = ~np.isnan(usd_per_saca) & (sacas_total > 0)
+    usd_total = np.where(valid, usd_per_saca * sacas_total, np.nan)
+
+    has_live = ~np.isnan(fx_live_rate)
+    has_rate = ~np.isnan(fx_locked_rate)
+    has_amount = ~np.isnan(fx_locked_usd_amount)
+
+    # "none" com live disponível: tudo no câmbio ao vivo
+    live_only = np.divide(usd_total * fx_live_rate, sacas_total, out=nan.copy(), where=valid)
+
+    # usd_amount: trava por montante
+    by_amount = has_amount & has_rate & (usd_total > 0)
+    locked_amt = np.clip(fx_locked_usd_amount, 0.0, np.where(usd_total > 0, usd_total, 0.0))
+    live_or_locked = np.where(has_live, fx_live_rate, fx_locked_rate)
+    brl_amt = (locked_amt * fx_locked_rate) + ((usd_total - locked_amt) * live_or_locked)
+    per_saca_amt = np.divide(brl_amt, sacas_total, out=nan.copy(), where=valid)
+
+    # coverage: mistura pela cobertura
+    fx_eff = mix_by_coverage(fx_cov, fx_locked_rate, fx_live_rate)
+    cov = np.clip(fx_cov, 0.0, 1.0)
+    locked_cov = usd_total * cov
+    by_cov = has_rate & ~by_amount & ~np.isnan(fx_eff)
+
+    brl = np.where(has_live, live_only, np.nan)
+    locked = np.zeros(n)
+    unlocked = usd_total.copy()
+    mode = np.full(n, FX_MODE_NONE, dtype=np.int8)
+
+    brl = np.where(by_amount, per_saca_amt, brl)
+    locked = np.where(by_amount, locked_amt, locked)
+    unlocked = np.where(by_amount, usd_total - locked_amt, unlocked)
+    mode = np.where(by_amount, FX_MODE_USD_AMOUNT, mode)
+
+    brl = np.where(by_cov, usd_per_saca * fx_eff, brl)
+    brl = np.where(has_rate & ~by_amount & np.isnan(fx_eff), np.nan, brl)
+    locked = np.where(by_cov, locked_cov, locked)
+    unlocked = np.where(by_cov, usd_total - locked_cov, unlocked)
+    mode = np.where(by_cov, FX_MODE_COVERAGE, mode)
+
+    brl = np.where(valid, brl, np.nan)
+    locked = np.where(valid, locked, np.nan)
+    unlocked = np.where(valid, unlocked, np.nan)
+    mode = np.where(valid, mode, FX_MODE_NONE).astype(np.int8)
+
+    return brl, locked, unlocked, mode
+
+
+# =========================
+# Kernel
+# =========================
+def _value_side(
+    pos: BookPositions,
+    fx_live: np.ndarray,
+    usd_per_saca: np.ndarray,
+    usd_total: np.ndarray,
+    sacas_total: np.ndarray,
+    cov_fx: np.ndarray,
+    fixo_gross: np.ndarray,
+) -> SideValues:
+    gross, lock_usd, unlock_usd, mode = fx_brl_per_saca_with_breakdown(
+        usd_per_saca=usd_per_saca,
+        sacas_total=sacas_total,
+        fx_locked_rate=pos.fx_locked_rate,
+        fx_locked_usd_amount=pos.fx_locked_usd_amount,
+        fx_live_rate=fx_live,
+        fx_cov=cov_fx,
+    )
+    gross = np.where(pos.is_fixo, fixo_gross, gross)
+
+    net_sc, net_total, gross_total = apply_frete_net(gross, sacas_total, pos.frete_brl_total)
+
+    return SideValues(
+        fx_live=fx_live,
+        brl_per_saca_gross=gross,
+        brl_per_saca_net=net_sc,
+        brl_total_gross=gross_total,
+        brl_total_net=net_total,
+        fx_effective=safe_div(net_sc, usd_per_saca),
+        fx_locked_usd=lock_usd,
+        fx_unlocked_usd=unlock_usd,
+        fx_lock_mode=mode,
+        fx_locked_pct=safe_pct(lock_usd, usd_total),
+        fx_unlocked_pct=safe_pct(unlock_usd, usd_total),
+    )
+
+
+def value_book(pos: BookPositions, mkt: BookMarket) -> BookValues:
+    """Avalia todas as posições contra o mercado informado (um único passe em colunas)."""
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        ton = np.maximum(np.nan_to_num(pos.vol_total_ton, nan=0.0), 0.0)
+        sacas = np.round(ton * SACAS_PER_TON, 0)
+
+        cov_cbot = coverage_pct(pos.cbot_hedge_ton, ton)
+        cov_prem = coverage_pct(pos.prem_hedge_ton, ton)
+        cov_fx = coverage_pct(pos.fx_hedge_ton, ton)
+
+        locked_cents = normalize_cbot_cents(pos.cbot_locked_raw, mkt.cbot_cents)
+        live_cents = normalize_cbot_cents(mkt.cbot_cents, mkt.cbot_cents)
+
+        locked_usd_bu = locked_cents / 100.0
+        live_usd_bu = live_cents / 100.0
+        cbot_eff = mix_by_coverage(cov_cbot, locked_usd_bu, live_usd_bu)
+
+        prem_locked = premium_to_usd_per_bu(pos.prem_value, pos.prem_unit, ~np.isnan(pos.prem_hedge_ton))
+        prem_live = np.zeros_like(prem_locked) if mkt.premium_live is None else mkt.premium_live
+        prem_eff = mix_by_coverage(cov_prem, prem_locked, prem_live)
+
+        usd_per_saca = (cbot_eff + prem_eff) * BUSHELS_PER_SACA
+        usd_total = np.where(sacas > 0, usd_per_saca * sacas, np.nan)
+
+        # FIXO_BRL não tem perna USD
+        nan = np.full(len(pos), np.nan)
+        usd_per_saca = np.where(pos.is_fixo, nan, usd_per_saca)
+        usd_total = np.where(pos.is_fixo, nan, usd_total)
+
+        system = _value_side(pos, mkt.fx_system, usd_per_saca, usd_total, sacas, cov_fx, pos.fixo_brl_per_saca)
+        manual = _value_side(pos, mkt.fx_manual, usd_per_saca, usd_total, sacas, cov_fx, nan)
+
+    return BookValues(
+        ton_total=ton,
+        sacas_total=sacas,
+        cov_cbot=cov_cbot,
+        cov_premium=cov_prem,
+        cov_fx=cov_fx,
+        cbot_locked_cents=locked_cents,
+        cbot_locked_usd_per_bu=locked_usd_bu,
+        cbot_live_usd_per_bu=live_usd_bu,
+        cbot_effective_usd_per_bu=cbot_eff,
+        premium_locked_usd_per_bu=prem_locked,
+        premium_effective_usd_per_bu=prem_eff,
+        usd_per_saca=usd_per_saca,
+        usd_total_contract=usd_total,
+        frete_brl_total=pos.frete_brl_total,
+        system=system,
+        manual=manual,
+    )
+
+
+# =========================
+# Cenários (what-if)
+# =========================
+def shock_market(
+    mkt: BookMarket,
+    fx_t_years: np.ndarray,
+    fx_coupon: np.ndarray,
+    cbot_cents: float = 0.0,
+    fx_spot_pct: float = 0.0,
+    coupon_bp: float = 0.0,
+    premium_usd_bu: float = 0.0,
+) -> BookMarket:
+    """
+    Mercado chocado (as posições não mudam). FX segue a curva do worker (app/utils/fx_curve.py):
+    fwd = spot * (1 + cupom) ** t  =>  fwd' = fwd * (1 + pct) * ((1 + cupom') / (1 + cupom)) ** t,
+    com cupom' = max(cupom + bp, 0). Sem t/cupom (NaN) o choque de cupom não se aplica.
+    O ponto manual só recebe o choque de spot.
+    """
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        spot_k = 1.0 + fx_spot_pct / 100.0
+
+        c0 = fx_coupon
+        c1 = np.maximum(c0 + coupon_bp / 10000.0, 0.0)
+        coupon_k = np.power((1.0 + c1) / (1.0 + c0), fx_t_years)
+        coupon_k = np.where(np.isnan(coupon_k), 1.0, coupon_k)
+
+        prem = np.full(mkt.cbot_cents.shape[0], float(premium_usd_bu))
+        if mkt.premium_live is not None:
+            prem = prem + mkt.premium_live
+
+        return BookMarket(
+            cbot_cents=mkt.cbot_cents + cbot_cents,
+            fx_system=mkt.fx_system * spot_k * coupon_k,
+            fx_manual=mkt.fx_manual * spot_k,
+            premium_live=prem,
+        )
+
+
+# =========================
+# Filtros de trava (locked/open)
+# =========================
+def lock_filter(
+    cov_cbot: np.ndarray,
+    cov_premium: np.ndarray,
+    cov_fx: np.ndarray,
+    is_fixo: np.ndarray,
+    selected_types: set[str],
+    selected_states: set[str],
+):
+    """
+    Regra AND: locked_pct = min(pcts), open_pct = 1 - max(pcts) sobre os tipos escolhidos.
+    Retorna (keep, locked_pct, open_pct, slice_pct).
+    """
+    cols = {
+        "cbot": np.round(cov_cbot, 6),
+        "premium": np.round(cov_premium, 6),
+        "fx": np.round(cov_fx, 6),
+    }
+    n = is_fixo.shape[0]
+    if selected_types:
+        pcts = np.vstack([np.clip(cols[t], 0.0, 1.0) for t in sorted(selected_types)])
+        locked_pct = pcts.min(axis=0)
+        open_pct = 1.0 - pcts.max(axis=0)
+    else:
+        locked_pct = np.ones(n)
+        open_pct = np.zeros(n)
+
+    want_locked = "locked" in selected_states
+    want_open = "open" in selected_states
+
+    if want_locked and not want_open:
+        keep = locked_pct > 0.0
+        slice_pct = locked_pct
+    elif want_open and not want_locked:
+        keep = open_pct > 0.0
+        slice_pct = open_pct
+    else:
+        keep = (locked_pct > 0.0) | (open_pct > 0.0)
+        slice_pct = np.ones(n)
+
+    keep = keep & ~is_fixo
+    return keep, locked_pct, open_pct, slice_pct
+
+
+def group_sum(codes: np.ndarray, n_groups: int, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Soma por grupo (codes = índice do grupo por contrato) ignorando NaN. Retorna (soma, qtd presentes)."""
+    present = ~np.isnan(values)
+    sums = np.bincount(codes, weights=np.where(present, values, 0.0), minlength=n_groups)
+    counts = np.bincount(codes, weights=present.astype(np.float64), minlength=n_groups)
+    return sums, counts
@@ -0,0 +1,761 @@
+# app/services/mtm_loader.py
+"""
+Carga das entradas do MTM em UMA ida ao banco.
+
+Travas agregadas (3 tipos), última cotação CBOT, ponto da curva FX e ponto manual
+vêm de um único SELECT (CTEs + UNION ALL num formato "longo" comum) e são
+devolvidos tipados em MtmInputs. A página de contratos continua sendo a query
+anterior (ela define os contract_ids e os ref_mes de FX).
+
+Com as_of, o mercado vem do histórico (cbot_quotes, fx_model_runs/points,
+fx_manual_points). load_market_streams traz a janela de uma série temporal
+(ponto de partida + eventos ordenados) para reavaliar o book em vários instantes.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Iterable
+
+import numpy as np
+
+from sqlalchemy import Date, DateTime, Integer, Numeric, String, case, cast, func, literal, null, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models.cbot_quote import CbotQuote
+from app.models.cbot_quote_latest import CbotQuoteLatest
+from app.models.fx_curve_latest import FxCurveLatest
+from app.models.fx_manual_point import FxManualPoint
+from app.models.fx_model_point import FxModelPoint
+from app.models.fx_model_run import FxModelRun
+from app.models.hedge_cbot import HedgeCbot
+from app.models.hedge_fx import HedgeFx
+from app.models.hedge_premium import HedgePremium
+from app.services.mtm_engine import TON_PER_BU
+from app.utils.fx_curve import CouponCurve
+
+
+# =========================
+# Bundle tipado
+# =========================
+@dataclass
+class HedgeCbotAgg:
+    """Todos os lotes CBOT do contrato: toneladas somadas + preço médio ponderado (VWAP)."""
+
+    contract_id: int
+    lots: int
+    volume_ton: float
+    cbot_usd_per_bu: float | None
+    # do lote mais recente
+    symbol: str | None
+    ref_mes: date | None
+
+
+@dataclass
+class HedgePremiumAgg:
+    contract_id: int
+    lots: int
+    volume_ton: float
+    premium_value: float | None
+    premium_unit: str | None
+
+
+@dataclass
+class HedgeFxAgg:
+    contract_id: int
+    lots: int
+    volume_ton: float
+    usd_amount: float | None
+    brl_per_usd: float | None   # ponderado por usd_amount (ou por ton se não houver montante)
+    tipo: str | None
+
+
+@dataclass
+class CbotQuoteIn:
+    symbol: str
+    ref_mes: date
+    capturado_em: datetime
+    price_usd_per_bu: float
+
+
+@dataclass
+class FxCurveIn:
+    ref_mes: date
+    as_of_ts: datetime
+    dolar_sint: float
+    source: str
+    model_version: str
+    # para choques de cupom: fwd = spot * (1 + cupom) ** t_anos (None se o run foi compactado)
+    t_anos: float | None = None
+    coupon_annual: float | None = None
+
+
+@dataclass
+class FxRunIn:
+    """Run FX mais recente (ou <= as_of) da farm: avalia a curva em ref_mes fora dos pontos gravados."""
+
+    as_of_ts: datetime
+    spot: float
+    coupon_curve: CouponCurve
+    source: str
+    model_version: str
+
+
+@dataclass
+class FxManualIn:
+    ref_mes: date
+    captured_at: datetime
+    fx: float
+
+
+@dataclass
+class MtmInputs:
+    hedge_cbot: dict[int, HedgeCbotAgg] = field(default_factory=dict)
+    hedge_premium: dict[int, HedgePremiumAgg] = field(default_factory=dict)
+    hedge_fx: dict[int, HedgeFxAgg] = field(default_factory=dict)
+    # mercado é por farm: chaves começam pelo farm_id
+    cbot_quotes: dict[tuple[int, str, date], CbotQuoteIn] = field(default_factory=dict)
+    fx_curve: dict[tuple[int, date], FxCurveIn] = field(default_factory=dict)
+    fx_manual: dict[tuple[int, date], FxManualIn] = field(default_factory=dict)
+    fx_runs: dict[int, FxRunIn] = field(default_factory=dict)
+
+
+@dataclass
+class MarketSeries:
+    """Valores de um insumo de mercado em ordem crescente de ts (para as-of join)."""
+
+    ts: list[datetime] = field(default_factory=list)
+    values: list[float | None] = field(default_factory=list)
+
+
+@dataclass
+class MarketStreams:
+    cbot: dict[tuple[str, date], MarketSeries] = field(default_factory=dict)
+    fx_curve: dict[date, MarketSeries] = field(default_factory=dict)
+    fx_manual: dict[date, MarketSeries] = field(default_factory=dict)
+    # runs da farm em ordem de ts: curva para ref_mes sem ponto gravado
+    fx_runs: list[FxRunIn] = field(default_factory=list)
+
+
+# =========================
+# Helpers
+# =========================
+def _f(v) -> float | None:
+    if v is None:
+        return None
+    if isinstance(v, Decimal):
+        return float(v)
+    return float(v)
+
+
+def _wavg(weighted_sum, weight, fallback_avg) -> float | None:
+    """Média ponderada do agregado SQL; sem peso (>0) cai na média simples dos lotes."""
+    w = _f(weight)
+    if w is not None and w > 0:
+        ws = _f(weighted_sum)
+        return None if ws is None else ws / w
+    return _f(fallback_avg)
+
+
+def _split_pairs(pairs: Iterable[tuple[str, date]]) -> tuple[list[str], list[date]]:
+    """(symbol, ref_mes) -> symbols e ref_meses para IN (o filtro exato do par fica no parse/lookup)."""
+    pairs = {(s, rm) for (s, rm) in pairs if s and rm}
+    return sorted({s for (s, _) in pairs}), sorted({rm for (_, rm) in pairs})
+
+
+_N_NUM = 7
+_N_TXT = 3
+
+# tipos das colunas do formato "longo"
+_LONG_TYPES = {
+    "contract_id": Integer(),
+    "farm_id": Integer(),
+    "sym": String(),
+    "d": Date(),
+    "ts": DateTime(timezone=True),
+    "lots": Integer(),
+    **{f"t{k}": String() for k in range(1, _N_TXT + 1)},
+    **{f"n{k}": Numeric() for k in range(1, _N_NUM + 1)},
+}
+
+
+def _long(kind: str, **cols) -> list:
+    """Colunas comuns do UNION ALL; as ausentes viram NULL tipado (o Postgres exige tipos compatíveis)."""
+    out = [literal(kind).label("kind")]
+    for name, typ in _LONG_TYPES.items():
+        expr = cols.get(name)
+        out.append((expr if expr is not None else cast(null(), typ)).label(name))
+    return out
+
+
+# =========================
+# Loader
+# =========================
+def load_mtm_inputs(
+    db: Session,
+    farm_ids: Iterable[int],
+    contract_ids: list[int],
+    fx_ref_meses: Iterable[date],
+    as_of: datetime | None = None,
+    cbot_pairs: Iterable[tuple[str, date]] = (),
+) -> MtmInputs:
+    """
+    Uma ida ao banco: travas (todos os lotes) dos contract_ids, cotações CBOT "latest" das farms,
+    curva FX e ponto manual mais recentes dos fx_ref_meses.
+    Várias farms entram no mesmo statement (IN + partição por farm).
+    as_of: travas executadas até as_of e mercado "último <= as_of" (lê o histórico, não as tabelas latest);
+    o ranking do histórico CBOT fica restrito aos cbot_pairs (symbol, ref_mes) do book.
+    """
+    farms = sorted({int(f) for f in farm_ids})
+    ids = sorted({int(i) for i in contract_ids})
+    ref_meses = sorted({rm for rm in fx_ref_meses if rm})
+
+    if as_of is None:
+        market = [_cbot_latest_part(farms), _fx_curve_part(farms, ref_meses), _fx_run_latest_part(farms)]
+    else:
+        symbols, cbot_ref_meses = _split_pairs(cbot_pairs)
+        market = [
+            _cbot_asof_part(farms, as_of, symbols, cbot_ref_meses),
+            _fx_curve_asof_part(farms, ref_meses, as_of),
+            _fx_run_asof_part(farms, as_of),
+        ]
+
+    parts = [
+        _hedge_cbot_part(ids, as_of),
+        _hedge_premium_part(ids, as_of),
+        _hedge_fx_part(ids, as_of),
+        *market,
+        _fx_manual_part(farms, ref_meses, as_of),
+    ]
+
+    out = MtmInputs()
+    for r in db.execute(union_all(*parts)).all():
+        _PARSERS[r.kind](out, r)
+    return out
+
+
+def load_cbot_asof(
+    db: Session,
+    farm_ids: Iterable[int],
+    cbot_pairs: Iterable[tuple[str, date]],
+    as_of: datetime,
+    out: MtmInputs,
+) -> MtmInputs:
+    """Cotações "último <= as_of" de pares que só aparecem depois das travas (symbol/ref_mes da trava)."""
+    symbols, ref_meses = _split_pairs(cbot_pairs)
+    if symbols:
+        for r in db.execute(_cbot_asof_part(sorted({int(f) for f in farm_ids}), as_of, symbols, ref_meses)).all():
+            _parse_cbot_quote(out, r)
+    return out
+
+
+def load_market_streams(
+    db: Session,
+    farm_id: int,
+    cbot_pairs: Iterable[tuple[str, date]],
+    fx_ref_meses: Iterable[date],
+    from_ts: datetime,
+    to_ts: datetime,
+) -> MarketStreams:
+    """
+    Uma ida ao banco para a janela [from_ts, to_ts]: o último valor <= from_ts de cada chave
+    (ponto de partida) + todos os eventos em (from_ts, to_ts], em ordem de ts.
+    O as-of join por timestamp é feito depois, em memória (searchsorted).
+    """
+    pairs = {(s, rm) for (s, rm) in cbot_pairs if s and rm}
+    symbols, cbot_ref_meses = _split_pairs(pairs)
+    ref_meses = sorted({rm for rm in fx_ref_meses if rm})
+
+    u = union_all(
+        _cbot_asof_part([farm_id], from_ts, symbols, cbot_ref_meses),
+        _cbot_events_part(farm_id, symbols, cbot_ref_meses, from_ts, to_ts),
+        _fx_curve_asof_part([farm_id], ref_meses, from_ts),
+        _fx_curve_events_part(farm_id, ref_meses, from_ts, to_ts),
+        _fx_manual_part([farm_id], ref_meses, from_ts),
+        _fx_manual_events_part(farm_id, ref_meses, from_ts, to_ts),
+        _fx_run_asof_part([farm_id], from_ts),
+        _fx_run_events_part(farm_id, from_ts, to_ts),
+    )
+
+    out = MarketStreams()
+    for r in db.execute(u.order_by(u.selected_columns.ts)).all():
+        if r.kind == "fx_run":
+            out.fx_runs.append(_fx_run_in(r))
+            continue
+        if r.kind == "cbot_quote":
+            if (r.sym, r.d) not in pairs:
+                continue
+            target = out.cbot.setdefault((r.sym, r.d), MarketSeries())
+        elif r.kind == "fx_curve":
+            target = out.fx_curve.setdefault(r.d, MarketSeries())
+        else:
+            target = out.fx_manual.setdefault(r.d, MarketSeries())
+        target.ts.append(r.ts)
+        target.values.append(_f(r.n1))
+    return out
+
+
+# =========================
+# Partes do UNION ALL (uma por tipo de entrada)
+# =========================
+def _hedge_cbot_part(ids: list[int], as_of: datetime | None = None):
+    w = {"partition_by": HedgeCbot.contract_id}
+    px = HedgeCbot.cbot_usd_per_bu
+    # lotes gravados em USD/bu (< 50) viram cents para não misturar escalas no VWAP
+    px_cents = case((px < 50, px * 100), else_=px)
+
+    ranked = (
+        select(
+            HedgeCbot.contract_id.label("contract_id"),
+            HedgeCbot.symbol.label("symbol"),
+            HedgeCbot.ref_mes.label("ref_mes"),
+            cast(func.count().over(**w), Integer).label("lots"),
+            func.sum(HedgeCbot.volume_ton).over(**w).label("ton"),
+            func.sum(HedgeCbot.volume_ton * px).over(**w).label("px_x_ton"),
+            func.sum(HedgeCbot.volume_ton * px_cents).over(**w).label("cents_x_ton"),
+            func.avg(px).over(**w).label("px_avg"),
+            func.avg(px_cents).over(**w).label("cents_avg"),
+            func.min(px).over(**w).label("px_min"),
+            func.max(px).over(**w).label("px_max"),
+            func.row_number().over(order_by=(HedgeCbot.executado_em.desc(), HedgeCbot.id.desc()), **w).label("rn"),
+        )
+        .where(HedgeCbot.contract_id.in_(ids), *_executed_until(HedgeCbot, as_of))
+        .cte("mtm_hedge_cbot")
+    )
+    c = ranked.c
+    return select(
+        *_long(
+            "hedge_cbot",
+            contract_id=c.contract_id,
+            sym=c.symbol,
+            d=c.ref_mes,
+            lots=c.lots,
+            n1=c.ton,
+            n2=c.px_x_ton,
+            n3=c.cents_x_ton,
+            n4=c.px_avg,
+            n5=c.cents_avg,
+            n6=c.px_min,
+            n7=c.px_max,
+        )
+    ).where(c.rn == 1)
+
+
+def _hedge_premium_part(ids: list[int], as_of: datetime | None = None):
+    w = {"partition_by": HedgePremium.contract_id}
+    val = HedgePremium.premium_value
+    unit = func.upper(func.trim(HedgePremium.premium_unit))
+    # USD/bu por lote (unidade desconhecida = 0, como no engine)
+    usd_bu = case((unit == "USD_BU", val), (unit == "USD_TON", val * TON_PER_BU), else_=0)
+
+    ranked = (
+        select(
+            HedgePremium.contract_id.label("contract_id"),
+            HedgePremium.premium_unit.label("premium_unit"),
+            cast(func.count().over(**w), Integer).label("lots"),
+            func.sum(HedgePremium.volume_ton).over(**w).label("ton"),
+            func.sum(HedgePremium.volume_ton * val).over(**w).label("val_x_ton"),
+            func.sum(HedgePremium.volume_ton * usd_bu).over(**w).label("usd_bu_x_ton"),
+            func.avg(val).over(**w).label("val_avg"),
+            func.avg(usd_bu).over(**w).label("usd_bu_avg"),
+            func.min(unit).over(**w).label("unit_min"),
+            func.max(unit).over(**w).label("unit_max"),
+            func.row_number()
+            .over(order_by=(HedgePremium.executado_em.desc(), HedgePremium.id.desc()), **w)
+            .label("rn"),
+        )
+        .where(HedgePremium.contract_id.in_(ids), *_executed_until(HedgePremium, as_of))
+        .cte("mtm_hedge_premium")
+    )
+    c = ranked.c
+    return select(
+        *_long(
+            "hedge_premium",
+            contract_id=c.contract_id,
+            lots=c.lots,
+            t1=c.premium_unit,
+            t2=c.unit_min,
+            t3=c.unit_max,
+            n1=c.ton,
+            n2=c.val_x_ton,
+            n3=c.usd_bu_x_ton,
+            n4=c.val_avg,
+            n5=c.usd_bu_avg,
+        )
+    ).where(c.rn == 1)
+
+
+def _hedge_fx_part(ids: list[int], as_of: datetime | None = None):
+    w = {"partition_by": HedgeFx.contract_id}
+    rate = HedgeFx.brl_per_usd
+
+    ranked = (
+        select(
+            HedgeFx.contract_id.label("contract_id"),
+            HedgeFx.tipo.label("tipo"),
+            cast(func.count().over(**w), Integer).label("lots"),
+            func.sum(HedgeFx.volume_ton).over(**w).label("ton"),
+            func.sum(HedgeFx.usd_amount).over(**w).label("usd"),
+            func.sum(HedgeFx.usd_amount * rate).over(**w).label("rate_x_usd"),
+            func.sum(HedgeFx.volume_ton * rate).over(**w).label("rate_x_ton"),
+            func.avg(rate).over(**w).label("rate_avg"),
+            func.row_number().over(order_by=(HedgeFx.executado_em.desc(), HedgeFx.id.desc()), **w).label("rn"),
+        )
+        .where(HedgeFx.contract_id.in_(ids), *_executed_until(HedgeFx, as_of))
+        .cte("mtm_hedge_fx")
+    )
+    c = ranked.c
+    return select(
+        *_long(
+            "hedge_fx",
+            contract_id=c.contract_id,
+            lots=c.lots,
+            t1=c.tipo,
+            n1=c.ton,
+            n2=c.usd,
+            n3=c.rate_x_usd,
+            n4=c.rate_x_ton,
+            n5=c.rate_avg,
+        )
+    ).where(c.rn == 1)
+
+
+def _executed_until(model, as_of: datetime | None) -> list:
+    return [] if as_of is None else [model.executado_em <= as_of]
+
+
+def _cbot_latest_part(farm_ids: list[int]):
+    # cbot_quotes_latest tem 1 linha por (farm, symbol, ref_mes): a farm inteira é pequena,
+    # e o symbol de cada contrato só é resolvido depois das travas
+    q = CbotQuoteLatest
+    return select(
+        *_long("cbot_quote", farm_id=q.farm_id, sym=q.symbol, d=q.ref_mes, ts=q.capturado_em, n1=q.price_usd_per_bu)
+    ).where(q.farm_id.in_(farm_ids))
+
+
+def _fx_curve_part(farm_ids: list[int], ref_meses: list[date]):
+    q = FxCurveLatest
+    return (
+        select(
+            *_long(
+                "fx_curve",
+                farm_id=q.farm_id,
+                d=q.ref_mes,
+                ts=q.as_of_ts,
+                t1=q.source,
+                t2=q.model_version,
+                n1=q.dolar_sint,
+                t3=cast(FxModelRun.coupon_curve, String),
+                n2=q.t_anos,
+                n3=FxModelRun.coupon_annual,
+            )
+        )
+        .select_from(q)
+        .outerjoin(FxModelRun, FxModelRun.id == q.run_id)
+        .where(q.farm_id.in_(farm_ids), q.ref_mes.in_(ref_meses))
+    )
+
+
+def _cbot_asof_part(farm_ids: list[int], as_of: datetime, symbols: list[str], ref_meses: list[date]):
+    """
+    Último tick <= as_of por (symbol, ref_mes), a partir do histórico (cbot_quotes).
+    Restrito aos symbols/ref_meses pedidos: o row_number não percorre o histórico inteiro da farm.
+    """
+    conds = [
+        CbotQuote.farm_id.in_(farm_ids),
+        CbotQuote.capturado_em <= as_of,
+        CbotQuote.symbol.in_(symbols),
+        CbotQuote.ref_mes.in_(ref_meses),
+    ]
+
+    ranked = (
+        select(
+            CbotQuote.farm_id.label("farm_id"),
+            CbotQuote.symbol.label("symbol"),
+            CbotQuote.ref_mes.label("ref_mes"),
+            CbotQuote.capturado_em.label("capturado_em"),
+            CbotQuote.price_usd_per_bu.label("price"),
+            func.row_number()
+            .over(
+                partition_by=(CbotQuote.farm_id, CbotQuote.symbol, CbotQuote.ref_mes),
+                order_by=(CbotQuote.capturado_em.desc(), CbotQuote.id.desc()),
+            )
+            .label("rn"),
+        )
+        .where(*conds)
+        .cte("mtm_cbot_asof")
+    )
+    c = ranked.c
+    return select(
+        *_long("cbot_quote", farm_id=c.farm_id, sym=c.symbol, d=c.ref_mes, ts=c.capturado_em, n1=c.price)
+    ).where(c.rn == 1)
+
+
+def _fx_curve_asof_part(farm_ids: list[int], ref_meses: list[date], as_of: datetime):
+    """Ponto do último run <= as_of por ref_mes (fx_model_runs + fx_model_points)."""
+    ranked = (
+        select(
+            FxModelRun.farm_id.label("farm_id"),
+            FxModelPoint.ref_mes.label("ref_mes"),
+            FxModelRun.as_of_ts.label("as_of_ts"),
+            FxModelRun.source.label("source"),
+            FxModelRun.model_version.label("model_version"),
+            FxModelPoint.dolar_sint.label("dolar_sint"),
+            FxModelPoint.t_anos.label("t_anos"),
+            FxModelRun.coupon_annual.label("coupon_annual"),
+            cast(FxModelRun.coupon_curve, String).label("coupon_curve"),
+            func.row_number()
+            .over(
+                partition_by=(FxModelRun.farm_id, FxModelPoint.ref_mes),
+                order_by=(FxModelRun.as_of_ts.desc(), FxModelRun.id.desc()),
+            )
+            .label("rn"),
+        )
+        .join(FxModelRun, FxModelRun.id == FxModelPoint.run_id)
+        .where(
+            FxModelRun.farm_id.in_(farm_ids),
+            FxModelRun.as_of_ts <= as_of,
+            FxModelPoint.ref_mes.in_(ref_meses),
+        )
+        .cte("mtm_fx_curve_asof")
+    )
+    c = ranked.c
+    return select(
+        *_long(
+            "fx_curve",
+            farm_id=c.farm_id,
+            d=c.ref_mes,
+            ts=c.as_of_ts,
+            t1=c.source,
+            t2=c.model_version,
+            t3=c.coupon_curve,
+            n1=c.dolar_sint,
+            n2=c.t_anos,
+            n3=c.coupon_annual,
+        )
+    ).where(c.rn == 1)
+
+
+def _fx_run_columns(run):
+    return _long(
+        "fx_run",
+        farm_id=run.farm_id,
+        ts=run.as_of_ts,
+        t1=run.source,
+        t2=run.model_version,
+        t3=cast(run.coupon_curve, String),
+        n1=run.spot_usdbrl,
+        n3=run.coupon_annual,
+    )
+
+
+def _fx_run_latest_part(farm_ids: list[int]):
+    """Run mais novo por farm: fx_curve_latest (tabela pequena) aponta o run_id."""
+    latest = (
+        select(FxCurveLatest.farm_id.label("farm_id"), func.max(FxCurveLatest.run_id).label("run_id"))
+        .where(FxCurveLatest.farm_id.in_(farm_ids))
+        .group_by(FxCurveLatest.farm_id)
+        .subquery("mtm_fx_run_latest")
+    )
+    return select(*_fx_run_columns(FxModelRun)).join(latest, latest.c.run_id == FxModelRun.id)
+
+
+def _fx_run_asof_part(farm_ids: list[int], as_of: datetime):
+    ranked = (
+        select(
+            FxModelRun.id.label("id"),
+            func.row_number()
+            .over(partition_by=FxModelRun.farm_id, order_by=(FxModelRun.as_of_ts.desc(), FxModelRun.id.desc()))
+            .label("rn"),
+        )
+        .where(FxModelRun.farm_id.in_(farm_ids), FxModelRun.as_of_ts <= as_of)
+        .cte("mtm_fx_run_asof")
+    )
+    return (
+        select(*_fx_run_columns(FxModelRun))
+        .join(ranked, ranked.c.id == FxModelRun.id)
+        .where(ranked.c.rn == 1)
+    )
+
+
+def _fx_manual_part(farm_ids: list[int], ref_meses: list[date], as_of: datetime | None = None):
+    conds = [FxManualPoint.farm_id.in_(farm_ids), FxManualPoint.ref_mes.in_(ref_meses)]
+    if as_of is not None:
+        conds.append(FxManualPoint.captured_at <= as_of)
+
+    ranked = (
+        select(
+            FxManualPoint.farm_id.label("farm_id"),
+            FxManualPoint.ref_mes.label("ref_mes"),
+            FxManualPoint.captured_at.label("captured_at"),
+            FxManualPoint.fx.label("fx"),
+            func.row_number()
+            .over(
+                partition_by=(FxManualPoint.farm_id, FxManualPoint.ref_mes),
+                order_by=(FxManualPoint.captured_at.desc(), FxManualPoint.id.desc()),
+            )
+            .label("rn"),
+        )
+        .where(*conds)
+        .cte("mtm_fx_manual")
+    )
+    c = ranked.c
+    return select(*_long("fx_manual", farm_id=c.farm_id, d=c.ref_mes, ts=c.captured_at, n1=c.fx)).where(c.rn == 1)
+
+
+# --- eventos da janela (from_ts, to_ts] (só o valor; o as-of é feito em memória) ---
+def _cbot_events_part(farm_id: int, symbols: list[str], ref_meses: list[date], from_ts: datetime, to_ts: datetime):
+    q = CbotQuote
+    return select(
+        *_long("cbot_quote", sym=q.symbol, d=q.ref_mes, ts=q.capturado_em, n1=q.price_usd_per_bu)
+    ).where(
+        q.farm_id == farm_id,
+        q.symbol.in_(symbols),
+        q.ref_mes.in_(ref_meses),
+        q.capturado_em > from_ts,
+        q.capturado_em <= to_ts,
+    )
+
+
+def _fx_curve_events_part(farm_id: int, ref_meses: list[date], from_ts: datetime, to_ts: datetime):
+    return (
+        select(*_long("fx_curve", d=FxModelPoint.ref_mes, ts=FxModelRun.as_of_ts, n1=FxModelPoint.dolar_sint))
+        .select_from(FxModelPoint)
+        .join(FxModelRun, FxModelRun.id == FxModelPoint.run_id)
+        .where(
+            FxModelRun.farm_id == farm_id,
+            FxModelRun.as_of_ts > from_ts,
+            FxModelRun.as_of_ts <= to_ts,
+            FxModelPoint.ref_mes.in_(ref_meses),
+        )
+    )
+
+
+def _fx_run_events_part(farm_id: int, from_ts: datetime, to_ts: datetime):
+    return select(*_fx_run_columns(FxModelRun)).where(
+        FxModelRun.farm_id == farm_id,
+        FxModelRun.as_of_ts > from_ts,
+        FxModelRun.as_of_ts <= to_ts,
+    )
+
+
+def _fx_manual_events_part(farm_id: int, ref_meses: list[date], from_ts: datetime, to_ts: datetime):
+    q = FxManualPoint
+    return select(*_long("fx_manual", d=q.ref_mes, ts=q.captured_at, n1=q.fx)).where(
+        q.farm_id == farm_id,
+        q.ref_mes.in_(ref_meses),
+        q.captured_at > from_ts,
+        q.captured_at <= to_ts,
+    )
+
+
+# =========================
+# Parse (linha longa -> objeto tipado)
+# =========================
+def _parse_hedge_cbot(out: MtmInputs, r) -> None:
+    # mesma escala em todos os lotes => VWAP cru (o engine normaliza como antes)
+    same_scale = _f(r.n6) >= 50 or _f(r.n7) < 50
+    price = _wavg(r.n2, r.n1, r.n4) if same_scale else _wavg(r.n3, r.n1, r.n5)
+    out.hedge_cbot[r.contract_id] = HedgeCbotAgg(
+        contract_id=r.contract_id,
+        lots=int(r.lots),
+        volume_ton=_f(r.n1) or 0.0,
+        cbot_usd_per_bu=price,
+        symbol=r.sym,
+        ref_mes=r.d,
+    )
+
+
+def _parse_hedge_premium(out: MtmInputs, r) -> None:
+    if r.t2 == r.t3:
+        # todos na mesma unidade: mantém a unidade gravada
+        value, unit = _wavg(r.n2, r.n1, r.n4), r.t1
+    else:
+        value, unit = _wavg(r.n3, r.n1, r.n5), "USD_BU"
+    out.hedge_premium[r.contract_id] = HedgePremiumAgg(
+        contract_id=r.contract_id,
+        lots=int(r.lots),
+        volume_ton=_f(r.n1) or 0.0,
+        premium_value=value,
+        premium_unit=unit,
+    )
+
+
+def _parse_hedge_fx(out: MtmInputs, r) -> None:
+    usd = _f(r.n2)
+    # montante travado: taxa média ponderada pelo USD (BRL travado = Σ usd_i * taxa_i)
+    if usd is not None and usd > 0:
+        brl_per_usd = _wavg(r.n3, usd, r.n5)
+    else:
+        brl_per_usd = _wavg(r.n4, r.n1, r.n5)
+    out.hedge_fx[r.contract_id] = HedgeFxAgg(
+        contract_id=r.contract_id,
+        lots=int(r.lots),
+        volume_ton=_f(r.n1) or 0.0,
+        usd_amount=usd,
+        brl_per_usd=brl_per_usd,
+        tipo=r.t1,
+    )
+
+
+def _parse_cbot_quote(out: MtmInputs, r) -> None:
+    out.cbot_quotes[(r.farm_id, r.sym, r.d)] = CbotQuoteIn(
+        symbol=r.sym, ref_mes=r.d, capturado_em=r.ts, price_usd_per_bu=_f(r.n1)
+    )
+
+
+def _parse_fx_curve(out: MtmInputs, r) -> None:
+    out.fx_curve[(r.farm_id, r.d)] = FxCurveIn(
+        ref_mes=r.d,
+        as_of_ts=r.ts,
+        dolar_sint=_f(r.n1),
+        source=r.t1,
+        model_version=r.t2,
+        t_anos=_f(r.n2),
+        coupon_annual=_coupon_at(r.t3, _f(r.n3), _f(r.n2)),
+    )
+
+
+@lru_cache(maxsize=256)
+def _coupon_curve(raw: str | None, fallback: float | None) -> CouponCurve:
+    """coupon_curve (JSON em texto) -> CouponCurve; runs sem estrutura a termo: cupom flat."""
+    return CouponCurve.from_knots(json.loads(raw) if raw else None, fallback=fallback)
+
+
+def _coupon_at(raw: str | None, fallback: float | None, t_anos: float | None) -> float | None:
+    # choque de cupom (cenários) precisa do cupom do prazo do ponto, não só o do run
+    if not raw or t_anos is None:
+        return fallback
+    return float(_coupon_curve(raw, fallback).at(np.float64(t_anos)))
+
+
+def _fx_run_in(r) -> FxRunIn:
+    return FxRunIn(
+        as_of_ts=r.ts,
+        spot=_f(r.n1),
+        coupon_curve=_coupon_curve(r.t3, _f(r.n3)),
+        source=r.t1,
+        model_version=r.t2,
+    )
+
+
+def _parse_fx_run(out: MtmInputs, r) -> None:
+    out.fx_runs[r.farm_id] = _fx_run_in(r)
+
+
+def _parse_fx_manual(out: MtmInputs, r) -> None:
+    out.fx_manual[(r.farm_id, r.d)] = FxManualIn(ref_mes=r.d, captured_at=r.ts, fx=_f(r.n1))
+
+
+_PARSERS = {
+    "hedge_cbot": _parse_hedge_cbot,
+    "hedge_premium": _parse_hedge_premium,
+    "hedge_fx": _parse_hedge_fx,
+    "cbot_quote": _parse_cbot_quote,
+    "fx_curve": _parse_fx_curve,
+    "fx_run": _parse_fx_run,
+    "fx_manual": _parse_fx_manual,
+}
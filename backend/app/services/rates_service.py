@@ -3,12 +3,21 @@ from __future__ import annotations
 
 from datetime import date
 from fastapi import HTTPException
+from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.models.interest_rate import InterestRate
 from app.models.offset_calibration import OffsetCalibration
 
+# canal LISTEN/NOTIFY do fx_model_worker (cache de taxas/offset por farm); payload = farm_id
+RATES_CHANNEL = "rates_changed"
+
+
+def _notify_rates_changed(db: Session, farm_id: int) -> None:
+    """✅ NOTIFY na mesma transação: só é entregue no commit (rollback não avisa ninguém)."""
+    db.execute(text("SELECT pg_notify(:ch, :payload)"), {"ch": RATES_CHANNEL, "payload": str(farm_id)})
+
 
 class RatesService:
     # ---------- Interest ----------
@@ -30,6 +39,8 @@ class RatesService:
         )
         db.add(row)
         try:
+            db.flush()
+            _notify_rates_changed(db, farm_id)
             db.commit()
         except IntegrityError:
             db.rollback()
@@ -79,6 +90,7 @@ class RatesService:
         if payload.sofr_annual is not None:
             row.sofr_annual = payload.sofr_annual
 
+        _notify_rates_changed(db, farm_id)
         db.commit()
         db.refresh(row)
         return row
@@ -102,6 +114,7 @@ class RatesService:
             row.sofr_annual = sofr
             # opcional: manter created_by original ou atualizar?
             # aqui vou manter o original.
+            _notify_rates_changed(db, farm_id)
             db.commit()
             db.refresh(row)
             return row
@@ -117,6 +130,7 @@ class RatesService:
             note=note,
         )
         db.add(row)
+        _notify_rates_changed(db, farm_id)
         db.commit()
         db.refresh(row)
         return row
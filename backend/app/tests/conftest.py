@@ -0,0 +1,179 @@
+# app/tests/conftest.py
+"""
+Fixtures dos testes: SQLite em memória com o schema dos models (create_all) e um builder
+de book pequeno (farm, cotações, run FX, pontos manuais, contratos e travas).
+As tabelas *_latest são preenchidas como o worker faria (backfill_latest).
+"""
+from __future__ import annotations
+
+import os
+
+os.environ.setdefault("DB_URL", "sqlite://")
+
+from datetime import date, datetime, timezone  # noqa: E402
+from decimal import Decimal  # noqa: E402
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+import app.models as M  # noqa: E402
+from app.db.base_class import Base  # noqa: E402
+from app.models.fx_manual_point import FxManualPoint  # noqa: E402
+from app.services.mtm_cache import mtm_cache  # noqa: E402
+
+AS_OF = datetime(2026, 3, 2, 15, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    mtm_cache.clear()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture()
+def book(db):
+    return BookBuilder(db)
+
+
+def _d(x) -> Decimal | None:
+    return None if x is None else Decimal(str(x))
+
+
+class BookBuilder:
+    def __init__(self, db, parent: "BookBuilder | None" = None, farm_nome: str = "farm teste"):
+        self.db = db
+        self.farm = M.Farm(nome=farm_nome)
+        if parent is None:
+            self.user = M.User(nome="teste", email="teste@x", hashed_password="x")
+            self.cbot_source = M.CbotSource(nome="YAHOO", ativo=True)
+            self.fx_source = M.FxSource(nome="manual", ativo=True)
+            db.add_all([self.user, self.cbot_source, self.fx_source])
+        else:
+            self.user, self.cbot_source, self.fx_source = parent.user, parent.cbot_source, parent.fx_source
+        db.add(self.farm)
+        db.flush()
+        db.add(M.FarmUser(farm_id=self.farm.id, user_id=self.user.id, role="OWNER", ativo=True))
+        db.flush()
+
+    def other_farm(self, nome: str) -> "BookBuilder":
+        """Outra farm do mesmo usuário (mesmas fontes), para a visão consolidada."""
+        return BookBuilder(self.db, parent=self, farm_nome=nome)
+
+    @property
+    def farm_id(self) -> int:
+        return self.farm.id
+
+    # --- mercado ---
+    def cbot_quote(self, symbol: str, ref_mes: date, cents: float, ts: datetime = AS_OF) -> M.CbotQuote:
+        q = M.CbotQuote(
+            farm_id=self.farm_id, source_id=self.cbot_source.id, capturado_em=ts,
+            symbol=symbol, ref_mes=ref_mes, price_usd_per_bu=_d(cents),
+        )
+        self.db.add(q)
+        self.db.flush()
+        return q
+
+    def fx_run(self, points: dict[date, float], ts: datetime = AS_OF, spot: float = 5.3, **run) -> M.FxModelRun:
+        r = M.FxModelRun(
+            farm_id=self.farm_id, as_of_ts=ts, spot_usdbrl=_d(spot), cdi_annual=_d(0.14),
+            sofr_annual=_d(0.043), offset_value=_d(0.004), coupon_annual=_d(0.09),
+            desconto_pct=_d(0), model_version="v1", source="yahoo", **run,
+        )
+        self.db.add(r)
+        self.db.flush()
+        for rm, px in points.items():
+            self.db.add(M.FxModelPoint(run_id=r.id, ref_mes=rm, t_anos=_d(0.5), dolar_sint=_d(px), dolar_desc=_d(px)))
+        self.db.flush()
+        return r
+
+    def fx_manual(self, ref_mes: date, fx: float, ts: datetime = AS_OF) -> FxManualPoint:
+        p = FxManualPoint(farm_id=self.farm_id, source_id=self.fx_source.id, captured_at=ts, ref_mes=ref_mes, fx=_d(fx))
+        self.db.add(p)
+        self.db.flush()
+        return p
+
+    # --- book ---
+    def contract(self, ton: float, entrega: date, tipo: str = "CBOT_PREMIO", **kw) -> M.Contract:
+        for k in ("preco_fixo_brl_value", "frete_brl_total", "frete_brl_per_ton"):
+            if k in kw:
+                kw[k] = _d(kw[k])
+        c = M.Contract(
+            farm_id=self.farm_id, created_by_user_id=self.user.id, produto="SOJA", tipo_precificacao=tipo,
+            volume_input_value=_d(ton), volume_input_unit="TON", volume_total_ton=_d(ton),
+            data_entrega=entrega, status=kw.pop("status", "ABERTO"), **kw,
+        )
+        self.db.add(c)
+        self.db.flush()
+        return c
+
+    def hedge_cbot(self, c, ton: float, price: float, ts: datetime = AS_OF, **kw) -> M.HedgeCbot:
+        return self._add(M.HedgeCbot(
+            contract_id=c.id, executed_by_user_id=self.user.id, executado_em=ts,
+            volume_input_value=_d(ton), volume_input_unit="TON", volume_ton=_d(ton), cbot_usd_per_bu=_d(price), **kw,
+        ))
+
+    def hedge_premium(self, c, ton: float, value: float, unit: str, ts: datetime = AS_OF) -> M.HedgePremium:
+        return self._add(M.HedgePremium(
+            contract_id=c.id, executed_by_user_id=self.user.id, executado_em=ts,
+            volume_input_value=_d(ton), volume_input_unit="TON", volume_ton=_d(ton),
+            premium_value=_d(value), premium_unit=unit,
+        ))
+
+    def hedge_fx(self, c, ton: float, usd_amount: float, rate: float, ts: datetime = AS_OF) -> M.HedgeFx:
+        return self._add(M.HedgeFx(
+            contract_id=c.id, executed_by_user_id=self.user.id, executado_em=ts, volume_ton=_d(ton),
+            usd_amount=_d(usd_amount), brl_per_usd=_d(rate), ref_mes=None, tipo="MANUAL",
+        ))
+
+    def _add(self, obj):
+        self.db.add(obj)
+        self.db.flush()
+        return obj
+
+    def commit(self) -> None:
+        """Commit + tabelas *_latest + cobertura de travas (o que worker/HedgesService mantêm)."""
+        from app.services.lock_coverage_service import LockCoverageService
+
+        self.db.flush()
+        backfill_latest(self.db)
+        ids = [c.id for c in self.db.query(M.Contract).filter(M.Contract.farm_id == self.farm_id)]
+        LockCoverageService().refresh_contracts(self.db, self.farm_id, ids)
+        self.db.commit()
+
+
+def backfill_latest(db) -> None:
+    """Recria cbot_quotes_latest / fx_curve_latest a partir do histórico (mesma regra do upsert dos workers)."""
+    db.query(M.CbotQuoteLatest).delete()
+    db.query(M.FxCurveLatest).delete()
+
+    best: dict = {}
+    for q in db.query(M.CbotQuote).filter(M.CbotQuote.ref_mes.isnot(None)):
+        k = (q.farm_id, q.symbol, q.ref_mes)
+        if k not in best or (q.capturado_em, q.id) > (best[k].capturado_em, best[k].id):
+            best[k] = q
+    for q in best.values():
+        db.add(M.CbotQuoteLatest(
+            farm_id=q.farm_id, symbol=q.symbol, ref_mes=q.ref_mes, quote_id=q.id, source_id=q.source_id,
+            capturado_em=q.capturado_em, price_usd_per_bu=q.price_usd_per_bu,
+        ))
+
+    best = {}
+    for r, p in db.query(M.FxModelRun, M.FxModelPoint).join(M.FxModelPoint, M.FxModelPoint.run_id == M.FxModelRun.id):
+        k = (r.farm_id, p.ref_mes)
+        if k not in best or (r.as_of_ts, r.id) > (best[k][0].as_of_ts, best[k][0].id):
+            best[k] = (r, p)
+    for r, p in best.values():
+        db.add(M.FxCurveLatest(
+            farm_id=r.farm_id, ref_mes=p.ref_mes, run_id=r.id, as_of_ts=r.as_of_ts, t_anos=p.t_anos,
+            dolar_sint=p.dolar_sint, dolar_desc=p.dolar_desc, model_version=r.model_version, source=r.source,
+        ))
+    db.flush()
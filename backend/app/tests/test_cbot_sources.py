@@ -0,0 +1,21 @@
+# app/tests/test_cbot_sources.py
+"""GET /cbot/sources expõe os contadores publicados pelo cbot_worker."""
+from __future__ import annotations
+
+from app.models.cbot_source import CbotSource
+from app.schemas.cbot_sources import CbotSourceRead
+from app.services.cbot_sources_service import CbotSourcesService
+from app.tests.conftest import AS_OF
+
+
+def test_list_exposes_worker_poll_stats(db):
+    stats = {"polls": 12, "closed_polls": 0, "fetch_fail": 1, "written": 30, "same": 14, "band": 3, "skip": 1}
+    db.add(CbotSource(nome="YAHOO", ativo=True, poll_stats=stats, poll_stats_at=AS_OF))
+    db.add(CbotSource(nome="MANUAL", ativo=True))
+    db.commit()
+
+    rows = {r.nome: CbotSourceRead.model_validate(r) for r in CbotSourcesService().list(db)}
+
+    assert rows["YAHOO"].poll_stats == stats
+    assert rows["YAHOO"].poll_stats_at.replace(tzinfo=None) == AS_OF.replace(tzinfo=None)
+    assert (rows["MANUAL"].poll_stats, rows["MANUAL"].poll_stats_at) == (None, None)
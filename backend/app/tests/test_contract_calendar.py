@@ -0,0 +1,92 @@
+# app/tests/test_contract_calendar.py
+"""Calendário CBOT: month codes, ref_mes de fevereiro, símbolos contínuos/outras raízes e o ref_mes da API."""
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.contracts_mtm_service import _parse_ref_mes
+from app.utils.contract_calendar import (
+    CODE_TO_MONTH,
+    MONTH_CODES,
+    auto_symbol,
+    is_ref_mes,
+    ref_mes_for,
+    ref_mes_of,
+    resolve_symbol,
+    symbol_ref_mes,
+)
+
+
+@pytest.mark.parametrize("year", [2000, 2026, 2028, 2099])
+def test_month_code_round_trip(year):
+    for month, code in enumerate(MONTH_CODES, start=1):
+        rm = ref_mes_for(year, month)
+        symbol = auto_symbol(rm)
+        assert symbol == f"ZS{code}{year % 100:02d}.CBT"
+        assert CODE_TO_MONTH[code] == month
+        assert symbol_ref_mes(symbol) == rm
+        assert is_ref_mes(rm)
+
+
+@pytest.mark.parametrize(
+    ("year", "expected"),
+    # 2100: fora da tabela pré-calculada (mesma regra calculada na hora)
+    [(2026, date(2026, 2, 28)), (2028, date(2028, 2, 29)), (2100, date(2100, 2, 28))],
+)
+def test_february_ref_mes_is_last_day(year, expected):
+    assert ref_mes_for(year, 2) == expected
+    assert ref_mes_of(date(year, 2, 3)) == expected
+    assert auto_symbol(expected) == f"ZSG{year % 100:02d}.CBT"
+    assert is_ref_mes(expected)
+    assert not is_ref_mes(date(year, 2, 27))
+
+
+def test_other_months_use_day_30():
+    assert ref_mes_of(date(2026, 7, 1)) == ref_mes_of(date(2026, 7, 31)) == date(2026, 7, 30)
+    assert not is_ref_mes(date(2026, 7, 31))
+
+
+@pytest.mark.parametrize(
+    ("symbol", "expected"),
+    [
+        ("ZSN26.CBT", date(2026, 7, 30)),
+        (" zsx25 ", date(2025, 11, 30)),
+        ("ZMN26.CBT", date(2026, 7, 30)),   # farelo: outra raiz, mesmo month code
+        ("ZLZ27.CBT", date(2027, 12, 30)),  # óleo
+        ("ZS=F", None),                     # contínuo: sem vencimento
+        ("ZSA26.CBT", None),                # month code inválido
+        ("ZS.CBT", None),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_symbol_ref_mes(symbol, expected):
+    assert symbol_ref_mes(symbol) == expected
+
+
+def test_february_symbols():
+    assert symbol_ref_mes("ZSG26.CBT") == date(2026, 2, 28)
+    assert symbol_ref_mes("ZMG28.CBT") == date(2028, 2, 29)
+
+
+def test_resolve_symbol():
+    assert resolve_symbol("AUTO", date(2026, 7, 30)) == "ZSN26.CBT"
+    assert resolve_symbol(" auto ", date(2028, 2, 29)) == "ZSG28.CBT"
+    assert resolve_symbol("AUTO", None) == ""
+    assert resolve_symbol(" ZS=F ", date(2026, 7, 30)) == "ZS=F"
+    assert resolve_symbol(None, date(2026, 7, 30)) == ""
+
+
+def test_parse_ref_mes_accepts_february_last_day():
+    assert _parse_ref_mes("2026-02-28") == date(2026, 2, 28)
+    assert _parse_ref_mes("2028-02-29") == date(2028, 2, 29)
+    assert _parse_ref_mes("2026-07-30") == date(2026, 7, 30)
+    assert _parse_ref_mes(None) is None
+
+    for bad in ("2026-02-30", "2026-02-27", "2028-02-28", "2026-07-31", "2026-07", "julho"):
+        with pytest.raises(HTTPException) as exc:
+            _parse_ref_mes(bad)
+        assert exc.value.status_code == 400
@@ -0,0 +1,62 @@
+# app/tests/test_contracts_mtm_asof.py
+"""Reavaliação as_of: mercado "último <= as_of" lido do histórico, restrito aos pares do book."""
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from app.services.contracts_mtm_service import ContractsMtmService
+from app.services.mtm_loader import load_mtm_inputs
+from app.tests.conftest import AS_OF
+
+RM_N = date(2026, 7, 30)
+RM_U = date(2026, 9, 30)
+
+_mtm = ContractsMtmService()
+
+
+def _book(book):
+    for k in range(3):
+        ts = AS_OF + timedelta(minutes=k)
+        book.cbot_quote("ZSN26.CBT", RM_N, 1000.0 + k, ts=ts)
+        book.cbot_quote("ZSU26.CBT", RM_U, 1100.0 + k, ts=ts)
+        book.cbot_quote("ZSX26.CBT", date(2026, 11, 30), 1200.0 + k, ts=ts)  # fora do book
+    book.fx_run({RM_N: 5.4, RM_U: 5.5})
+
+    plain = book.contract(100, date(2026, 7, 10))
+    # trava com symbol próprio: par (ZSU26, set) só aparece depois de carregar as travas
+    hedged = book.contract(100, date(2026, 7, 20))
+    book.hedge_cbot(hedged, 50, 1050.0, ts=AS_OF - timedelta(days=1), symbol=" ZSU26.CBT", ref_mes=RM_U)
+    book.commit()
+    return plain, hedged
+
+
+def _rows(db, book, as_of=None):
+    resp = _mtm.contracts_mtm(db, book.farm_id, "both", False, None, "AUTO", 100, as_of=as_of)
+    return {r.contract.id: r for r in resp.rows}
+
+
+def test_asof_after_last_tick_matches_live(db, book):
+    _book(book)
+    live = _rows(db, book)
+    asof = _rows(db, book, AS_OF + timedelta(hours=1))
+    assert {k: r.model_dump(exclude={"quotes"}) for k, r in asof.items()} == {
+        k: r.model_dump(exclude={"quotes"}) for k, r in live.items()
+    }
+
+
+def test_asof_picks_last_tick_before_as_of(db, book):
+    plain, hedged = _book(book)
+    rows = _rows(db, book, AS_OF + timedelta(minutes=1, seconds=30))
+
+    assert rows[plain.id].quotes.cbot_system.cents_per_bu == 1001.0
+    assert rows[hedged.id].quotes.cbot_system.symbol == "ZSU26.CBT"
+    assert rows[hedged.id].quotes.cbot_system.cents_per_bu == 1101.0
+    assert rows[hedged.id].locks.cbot.ref_mes == RM_U
+
+
+def test_asof_ranks_only_book_pairs(db, book):
+    plain, _ = _book(book)
+    inputs = load_mtm_inputs(
+        db, [book.farm_id], [plain.id], [RM_N], AS_OF + timedelta(hours=1), {("ZSN26.CBT", RM_N)}
+    )
+    assert {k[1:] for k in inputs.cbot_quotes} == {("ZSN26.CBT", RM_N)}
@@ -0,0 +1,81 @@
+# app/tests/test_contracts_mtm_consolidated.py
+"""Visão consolidada: cada farm com o próprio mercado (chaves por farm) e limit aplicado por farm."""
+from __future__ import annotations
+
+import math
+from datetime import date
+
+import pytest
+
+from app.services.contracts_mtm_consolidated_service import ContractsMtmConsolidatedService
+from app.services.contracts_mtm_service import ContractsMtmService
+
+RM = date(2026, 7, 30)
+
+_mtm = ContractsMtmService()
+_consolidated = ContractsMtmConsolidatedService()
+
+
+def _farm_book(b, cents: float, fx: float, n: int):
+    # mesmo symbol/ref_mes nas duas farms, cotação e curva FX diferentes
+    b.cbot_quote("ZSN26.CBT", RM, cents)
+    b.fx_run({RM: fx})
+    b.fx_manual(RM, fx + 0.1)
+    for k in range(n):
+        c = b.contract(100 + 10 * k, date(2026, 7, 10))
+        if k % 2:
+            b.hedge_cbot(c, 50, cents + 15)
+            b.hedge_fx(c, 50, 20000, fx - 0.2)
+    b.contract(80, date(2026, 7, 12), tipo="FIXO_BRL", preco_fixo_brl_value=125)
+    b.commit()
+
+
+def _books(book):
+    other = book.other_farm("farm 2")
+    _farm_book(book, 1000.0, 5.4, 4)
+    _farm_book(other, 1120.0, 5.1, 6)
+    return book, other
+
+
+def _single_farm(db, b, limit: int) -> dict:
+    rows = _mtm.contracts_mtm(db, b.farm_id, "both", True, None, "AUTO", limit).rows
+
+    def total(values):
+        present = [v for v in values if v is not None]
+        return math.fsum(present) if present else None
+
+    return {
+        "contracts": len(rows),
+        "usd": total(r.totals.usd_total_contract for r in rows),
+        "system": total(r.totals.brl_total_contract.system for r in rows),
+        "manual": total(r.totals.brl_total_contract.manual for r in rows),
+    }
+
+
+@pytest.mark.parametrize("limit", [1000, 3])
+def test_each_farm_matches_its_single_farm_book(db, book, limit):
+    farms = _books(book)
+    resp = _consolidated.consolidated(db, book.user, "both", True, None, "AUTO", limit)
+    by_farm = {f.farm_id: f for f in resp.farms}
+
+    assert set(by_farm) == {b.farm_id for b in farms}
+    for b in farms:
+        got, want = by_farm[b.farm_id], _single_farm(db, b, limit)
+        assert got.contracts == want["contracts"] == min(limit, 5 if b is book else 7)
+        assert got.usd_total_contract == pytest.approx(want["usd"], abs=1e-3)
+        assert got.brl_total_contract.system == pytest.approx(want["system"], abs=1e-3)
+        assert got.brl_total_contract.manual == pytest.approx(want["manual"], abs=1e-3)
+
+    assert resp.total.contracts == sum(f.contracts for f in resp.farms)
+    assert resp.total.brl_total_contract.system == pytest.approx(
+        sum(f.brl_total_contract.system for f in resp.farms), abs=1e-3
+    )
+
+
+def test_limit_per_farm_keeps_newest_of_each_farm(db, book):
+    farms = _books(book)
+    contracts = _consolidated._contracts(db, [b.farm_id for b in farms], True, 2)
+
+    for b in farms:
+        newest = [c.id for c in _mtm.page_contracts(db, b.farm_id, True, False, False, 2)[0]]
+        assert [c.id for c in contracts if c.farm_id == b.farm_id] == newest
@@ -0,0 +1,107 @@
+# app/tests/test_contracts_mtm_golden.py
+"""
+Engine vetorizado x caminho antigo (linha a linha).
+
+fixtures/contracts_mtm_golden.json foi gravado com o ContractsMtmService do baseline
+(antes do mtm_engine) sobre o book de build_golden_book. Campos que só existem no caminho
+novo (lots/locked_ton das travas, metadados da resposta) ficam de fora da comparação.
+"""
+from __future__ import annotations
+
+import json
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from app.services.contracts_mtm_service import ContractsMtmService
+
+GOLDEN = Path(__file__).parent / "fixtures" / "contracts_mtm_golden.json"
+
+# nome do caso -> kwargs do contracts_mtm
+CASES = {
+    "both": dict(mode="both", only_open=False, ref_mes=None, default_symbol="AUTO"),
+    "system_open": dict(mode="system", only_open=True, ref_mes=None, default_symbol="AUTO"),
+    "manual": dict(mode="manual", only_open=False, ref_mes=None, default_symbol="AUTO"),
+    "forced_ref_mes": dict(mode="both", only_open=False, ref_mes="2026-07-30", default_symbol="ZSN26.CBT"),
+    "cbot_fx_locked": dict(mode="both", only_open=False, ref_mes=None, default_symbol="AUTO",
+                           lock_types="cbot,fx", lock_states="locked"),
+    "premium_open": dict(mode="both", only_open=False, ref_mes=None, default_symbol="AUTO",
+                         lock_types="premium", lock_states="open"),
+    "no_locks": dict(mode="both", only_open=False, ref_mes=None, default_symbol="AUTO", no_locks=True),
+}
+
+_MONTHS = [date(2026, m, 30) for m in range(3, 12)]
+_CODES = "FGHJKMNQUVXZ"
+
+
+def build_golden_book(book) -> None:
+    """
+    Book pequeno cobrindo: cobertura parcial/total/excedente, trava CBOT em USD e em cents,
+    prêmio USD_BU/USD_TON, FX por usd_amount e por cobertura, FX manual presente/ausente,
+    frete total e por ton, FIXO_BRL em BRL/SC e BRL/TON, contrato fechado e volume zero.
+    """
+    for k, rm in enumerate(_MONTHS):
+        book.cbot_quote(f"ZS{_CODES[rm.month - 1]}26.CBT", rm, 1000.25 + 7.5 * k)
+    book.fx_run({rm: round(5.35 + 0.021 * k, 6) for k, rm in enumerate(_MONTHS)})
+    for k, rm in enumerate(_MONTHS[:5]):  # manual só até julho
+        book.fx_manual(rm, round(5.5 + 0.013 * k, 6))
+
+    # parcial: CBOT em USD/bu (10.5 -> 1050 cents), prêmio USD_BU total, FX por usd_amount, frete total
+    c = book.contract(1000, date(2026, 5, 12), frete_brl_total=1500)
+    book.hedge_cbot(c, 500, 10.5)
+    book.hedge_premium(c, 1000, 0.5, "USD_BU")
+    book.hedge_fx(c, 300, 50000, 5.25)
+
+    # total: CBOT em cents, prêmio USD_TON parcial, frete por ton, sem FX manual (novembro)
+    c = book.contract(300, date(2026, 11, 5), frete_brl_per_ton=25)
+    book.hedge_cbot(c, 300, 1050.25)
+    book.hedge_premium(c, 150, 20.0, "USD_TON")
+
+    # excedente de FX (usd_amount > USD do contrato) e trava CBOT com símbolo explícito
+    c = book.contract(120, date(2026, 7, 20))
+    book.hedge_cbot(c, 60, 980.0, symbol="ZSN26.CBT", ref_mes=date(2026, 7, 30))
+    book.hedge_fx(c, 120, 10_000_000, 5.1)
+
+    # sem travas; prêmio com unidade inválida (ignorado)
+    book.contract(450.5, date(2026, 6, 3), frete_brl_total=800, frete_brl_per_ton=10)
+    c = book.contract(200, date(2026, 8, 14))
+    book.hedge_premium(c, 100, -0.3, "XX")
+
+    # FIXO_BRL
+    book.contract(100, date(2026, 4, 10), tipo="FIXO_BRL", preco_fixo_brl_value=130.5,
+                  preco_fixo_brl_unit="BRL/SC", frete_brl_total=1500)
+    book.contract(100, date(2026, 9, 10), tipo="FIXO_BRL", preco_fixo_brl_value=2175,
+                  preco_fixo_brl_unit="BRL/TON")
+    book.contract(50, date(2026, 9, 10), tipo="FIXO_BRL", preco_fixo_brl_value=None)
+
+    # fechado e volume zero
+    c = book.contract(250, date(2026, 6, 25), status="FECHADO")
+    book.hedge_cbot(c, 250, 10.0)
+    c = book.contract(0, date(2026, 10, 1))
+    book.hedge_cbot(c, 50, 1000.0)
+
+    book.commit()
+
+
+def comparable(resp: dict) -> dict:
+    """Só o que o caminho antigo também produz."""
+    rows = []
+    for row in resp["rows"]:
+        row = {k: row[k] for k in ("contract", "locks", "quotes", "valuation", "totals", "totals_view", "filter_meta")}
+        row["locks"] = {k: {f: v for f, v in lk.items() if f not in ("lots", "locked_ton")} for k, lk in row["locks"].items()}
+        rows.append(row)
+    return {"mode": resp["mode"], "rows": rows}
+
+
+@pytest.fixture()
+def golden() -> dict:
+    return json.loads(GOLDEN.read_text())
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_engine_matches_row_by_row_path(db, book, golden, case):
+    build_golden_book(book)
+    resp = ContractsMtmService().contracts_mtm(db=db, farm_id=book.farm_id, limit=2000, **CASES[case])
+    got = comparable(json.loads(resp.model_dump_json()))
+    assert got == golden[case]
@@ -0,0 +1,91 @@
+# app/tests/test_contracts_mtm_pagination.py
+"""Keyset do contracts-mtm: after_id/next_cursor percorre o book inteiro, sem repetir nem pular linha."""
+from __future__ import annotations
+
+import json
+from datetime import date
+
+import pytest
+
+from app.api.routers import contracts_mtm as router
+from app.services.contracts_mtm_service import ContractsMtmService
+
+RM = date(2026, 7, 30)
+
+_mtm = ContractsMtmService()
+
+
+def _book(book, n: int = 11) -> list[int]:
+    """n contratos alternando sem trava / CBOT parcial / CBOT+FX total."""
+    book.cbot_quote("ZSN26.CBT", RM, 1000.0)
+    book.fx_run({RM: 5.4})
+    ids = []
+    for k in range(n):
+        c = book.contract(100 + k, date(2026, 7, 10))
+        if k % 3 == 1:
+            book.hedge_cbot(c, 40, 1010.0)
+        elif k % 3 == 2:
+            book.hedge_cbot(c, 100 + k, 1010.0)
+            book.hedge_fx(c, 100 + k, 50000, 5.2)
+        ids.append(c.id)
+    book.commit()
+    return ids
+
+
+def _walk(fetch, limit: int) -> tuple[list[int], list[int | None]]:
+    """Segue next_cursor até o fim; devolve os ids na ordem servida e os cursores de cada página."""
+    seen: list[int] = []
+    cursors: list[int | None] = []
+    after_id = None
+    for _ in range(100):
+        page = fetch(limit=limit, after_id=after_id)
+        seen += [r["contract"]["id"] for r in page["rows"]]
+        cursors.append(page["next_cursor"])
+        after_id = page["next_cursor"]
+        if after_id is None:
+            return seen, cursors
+    raise AssertionError("next_cursor não terminou")
+
+
+def _router_page(db, farm_id: int, **kw) -> dict:
+    params = dict(
+        mode="both", only_open=True, ref_mes=None, default_symbol="AUTO", lock_types=None, lock_states=None,
+        no_locks=False, source="live", detail="summary", fields=None, as_of=None, fmt="json", db=db, membership=None,
+    )
+    return json.loads(router.contracts_mtm(farm_id, **(params | kw)).body)
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 11, 50])
+def test_router_walk_covers_book_once(db, book, limit):
+    ids = _book(book)
+
+    seen, cursors = _walk(lambda **kw: _router_page(db, book.farm_id, **kw), limit)
+
+    assert seen == sorted(ids, reverse=True)  # id desc, sem repetição nem buraco
+    assert cursors[-1] is None
+    assert len(cursors) == -(-len(ids) // limit)  # a última página cheia já volta com None
+    assert all(c is not None for c in cursors[:-1])
+
+
+@pytest.mark.parametrize(
+    ("types", "states"),
+    [("cbot", "locked"), ("cbot", "open"), ("cbot,fx", "locked"), ("fx", "open")],
+)
+def test_after_id_with_lock_filters(db, book, types, states):
+    _book(book)
+
+    def fetch(limit, after_id):
+        resp = _mtm.contracts_mtm(
+            db, book.farm_id, "both", True, None, "AUTO", limit,
+            lock_types=types, lock_states=states, after_id=after_id,
+        )
+        return json.loads(resp.model_dump_json())
+
+    full = fetch(1000, None)
+    seen, cursors = _walk(fetch, 2)
+
+    assert full["next_cursor"] is None
+    assert 0 < len(full["rows"]) < 11  # o filtro corta parte do book
+    assert seen == [r["contract"]["id"] for r in full["rows"]]
+    assert len(seen) == len(set(seen))
+    assert cursors[-1] is None
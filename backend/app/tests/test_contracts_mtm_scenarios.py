@@ -0,0 +1,115 @@
+# app/tests/test_contracts_mtm_scenarios.py
+"""What-if: choque zero = book atual; choques só mexem na parte sem trava de cada perna."""
+from __future__ import annotations
+
+import math
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.services.contracts_mtm_scenarios_service import ContractsMtmScenariosService
+from app.services.contracts_mtm_service import ContractsMtmService
+from app.services.mtm_engine import BUSHELS_PER_SACA, shock_market, value_book
+
+RM = date(2026, 7, 30)
+
+_mtm = ContractsMtmService()
+_scenarios = ContractsMtmScenariosService()
+
+
+def _book(book):
+    book.cbot_quote("ZSN26.CBT", RM, 1000.0)
+    book.fx_run({RM: 5.4})
+    book.fx_manual(RM, 5.5)
+
+    free = book.contract(1000, date(2026, 7, 10))                # nada travado
+    partial = book.contract(1000, date(2026, 7, 10))             # 40% CBOT, FX por montante
+    book.hedge_cbot(partial, 400, 1010.0)
+    book.hedge_fx(partial, 400, 100000, 5.2)
+    locked = book.contract(1000, date(2026, 7, 10))              # CBOT + prêmio + FX 100%
+    book.hedge_cbot(locked, 1000, 1010.0)
+    book.hedge_premium(locked, 1000, 0.5, "USD_BU")
+    book.hedge_fx(locked, 1000, 10**9, 5.2)
+    fixo = book.contract(300, date(2026, 7, 15), tipo="FIXO_BRL", preco_fixo_brl_value=130)
+    book.commit()
+    return [fixo, locked, partial, free]  # ordem do book (id desc)
+
+
+def _engine(db, book, contracts, **shock):
+    b, base = _mtm.value_contracts(db, book.farm_id, contracts, None, "AUTO")
+    nan = np.full(len(contracts), np.nan)  # sem t/cupom: só choques de spot/CBOT/prêmio
+    mkt = shock_market(b.market, nan, nan, **shock)
+    return base, value_book(b.positions, mkt)
+
+
+def test_zero_shock_reproduces_contracts_mtm_totals(db, book):
+    _book(book)
+    rows = _mtm.contracts_mtm(db, book.farm_id, "both", True, None, "AUTO", 1000).rows
+    resp = _scenarios.scenarios(db, book.farm_id, "both", True, None, "AUTO", 1000, cbot_cents="-10,0,10")
+
+    expected_usd = math.fsum(r.totals.usd_total_contract for r in rows if r.totals.usd_total_contract is not None)
+    expected_sys = math.fsum(r.totals.brl_total_contract.system for r in rows)
+    expected_man = math.fsum(r.totals.brl_total_contract.manual for r in rows if r.totals.brl_total_contract.manual)
+
+    zero = next(s for s in resp.scenarios if s.cbot_cents == 0)
+    for s in (resp.base, zero):
+        assert s.usd_total_contract == pytest.approx(expected_usd, abs=1e-3)
+        assert s.brl_total_contract.system == pytest.approx(expected_sys, abs=1e-3)
+        assert s.brl_total_contract.manual == pytest.approx(expected_man, abs=1e-3)
+        assert (s.brl_delta.system, s.brl_delta.manual) == (0.0, 0.0)
+
+
+def test_zero_shock_through_engine_is_identity(db, book):
+    contracts = _book(book)
+    base, shocked = _engine(db, book, contracts)
+
+    for a, b in [
+        (base.usd_total_contract, shocked.usd_total_contract),
+        (base.system.brl_total_net, shocked.system.brl_total_net),
+        (base.manual.brl_total_net, shocked.manual.brl_total_net),
+    ]:
+        np.testing.assert_array_equal(a, b)
+
+
+def test_cbot_shock_moves_only_unlocked_cbot_leg(db, book):
+    contracts = _book(book)
+    fixo, locked, partial, free = range(len(contracts))
+    base, shocked = _engine(db, book, contracts, cbot_cents=20.0)
+
+    usd_delta = shocked.usd_total_contract - base.usd_total_contract
+    per_saca = 0.20 * BUSHELS_PER_SACA  # USD a mais por saca sem trava CBOT
+    assert usd_delta[free] == pytest.approx(per_saca * base.sacas_total[free])
+    assert usd_delta[partial] == pytest.approx(0.6 * per_saca * base.sacas_total[partial])
+    assert usd_delta[locked] == 0.0
+    assert np.isnan(usd_delta[fixo])  # FIXO_BRL não tem perna USD
+
+    # o USD a mais cai no câmbio aberto: a parte travada por montante não muda
+    np.testing.assert_array_equal(shocked.system.fx_locked_usd, base.system.fx_locked_usd)
+    brl_delta = shocked.system.brl_total_net - base.system.brl_total_net
+    assert brl_delta[partial] == pytest.approx(usd_delta[partial] * 5.4)
+    assert brl_delta[locked] == 0.0
+    assert brl_delta[fixo] == 0.0
+
+
+def test_fx_and_premium_shocks_spare_locked_portions(db, book):
+    contracts = _book(book)
+    fixo, locked, partial, free = range(len(contracts))
+    base, shocked = _engine(db, book, contracts, fx_spot_pct=10.0, premium_usd_bu=0.3)
+
+    # prêmio: só quem não tem trava de prêmio
+    usd_delta = shocked.usd_total_contract - base.usd_total_contract
+    assert usd_delta[free] == pytest.approx(0.3 * BUSHELS_PER_SACA * base.sacas_total[free])
+    assert usd_delta[locked] == 0.0
+
+    # FX: o montante travado fica na taxa da trava; só o USD aberto vai para o spot chocado
+    np.testing.assert_array_equal(shocked.system.fx_locked_usd, base.system.fx_locked_usd)
+    for i in (partial, free):
+        expected = shocked.system.fx_unlocked_usd[i] * 5.4 * 1.1 - base.system.fx_unlocked_usd[i] * 5.4
+        assert shocked.system.brl_total_net[i] - base.system.brl_total_net[i] == pytest.approx(expected)
+        expected = shocked.manual.fx_unlocked_usd[i] * 5.5 * 1.1 - base.manual.fx_unlocked_usd[i] * 5.5
+        assert shocked.manual.brl_total_net[i] - base.manual.brl_total_net[i] == pytest.approx(expected)
+
+    for i in (locked, fixo):
+        assert shocked.system.brl_total_net[i] == base.system.brl_total_net[i]
+    assert shocked.manual.brl_total_net[locked] == base.manual.brl_total_net[locked]
@@ -0,0 +1,128 @@
+# app/tests/test_contracts_mtm_snapshots.py
+"""Snapshots do contracts-mtm: upsert por contract_id e invalidação (travas e dirty do worker)."""
+from __future__ import annotations
+
+from datetime import date, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.models.contract_mtm_snapshot import ContractMtmSnapshot
+from app.schemas.hedges import HedgeCbotCreate
+from app.services.contracts_mtm_snapshot_service import ContractsMtmSnapshotService
+from app.services.hedges_service import HedgesService
+from app.tests.conftest import AS_OF, backfill_latest
+
+RM = date(2026, 7, 30)
+SYMBOL = "ZSN26.CBT"
+
+_snapshots = ContractsMtmSnapshotService()
+
+
+def _setup(book):
+    book.cbot_quote(SYMBOL, RM, 1000.0)
+    book.fx_run({RM: 5.4})
+    c = book.contract(1000, date(2026, 7, 10))
+    book.commit()
+    return c
+
+
+def _row(db, book, contract_id):
+    resp = _snapshots.contracts_mtm(db, book.farm_id, "both", only_open=False, limit=100)
+    return next(r for r in resp.rows if r.contract.id == contract_id)
+
+
+def _snap(db, contract_id) -> ContractMtmSnapshot:
+    return db.query(ContractMtmSnapshot).filter(ContractMtmSnapshot.contract_id == contract_id).one()
+
+
+def test_first_read_creates_snapshot(db, book):
+    c = _setup(book)
+    row = _row(db, book, c.id)
+
+    snap = _snap(db, c.id)
+    assert snap.dirty is False
+    assert (snap.cbot_symbol, snap.cbot_ref_mes, snap.fx_ref_mes) == (SYMBOL, RM, RM)
+    assert row.quotes.cbot_system.cents_per_bu == 1000.0
+
+
+def test_refresh_upserts_row_created_by_another_request(db, book):
+    c = _setup(book)
+    # outra requisição gravou o snapshot entre a leitura e o refresh desta
+    db.execute(
+        text(
+            "INSERT INTO contract_mtm_snapshots (contract_id, farm_id, as_of_ts, dirty, payload, created_at, updated_at) "
+            "VALUES (:c, :f, :ts, 1, '{}', :ts, :ts)"
+        ),
+        {"c": c.id, "f": book.farm_id, "ts": AS_OF},
+    )
+
+    assert _snapshots.refresh_contracts(db, book.farm_id, [c.id]) == 1
+    assert _snapshots.refresh_contracts(db, book.farm_id, [c.id]) == 1
+    db.commit()
+
+    snap = _snap(db, c.id)
+    assert snap.dirty is False
+    assert snap.cbot_symbol == SYMBOL
+    assert snap.payload["quotes"]["cbot_system"]["cents_per_bu"] == 1000.0
+
+
+def test_hedge_create_and_delete_recompute_snapshot(db, book):
+    c = _setup(book)
+    assert _row(db, book, c.id).locks.cbot.coverage_pct == 0.0
+
+    h = HedgesService().create_cbot(
+        db, book.farm_id, c.id, book.user.id,
+        HedgeCbotCreate(
+            executado_em=AS_OF, volume_input_value=400, volume_input_unit="TON", volume_ton=400,
+            cbot_usd_per_bu=1020.0,
+        ),
+    )
+    assert _snap(db, c.id).payload["locks"]["cbot"]["coverage_pct"] == 0.4
+    assert _row(db, book, c.id).locks.cbot.locked_cents_per_bu == 1020.0
+
+    HedgesService().delete_cbot(db, book.farm_id, c.id, h.id, book.user.id)
+    assert _snap(db, c.id).payload["locks"]["cbot"]["coverage_pct"] == 0.0
+    assert _row(db, book, c.id).locks.cbot.locked is False
+
+
+def test_worker_dirty_marking_triggers_recompute(db, book):
+    c = _setup(book)
+    _row(db, book, c.id)
+    first_as_of = _snap(db, c.id).as_of_ts
+
+    # cotação nova sem marcar dirty: snapshot continua servindo o valor gravado
+    book.cbot_quote(SYMBOL, RM, 1010.0, ts=AS_OF + timedelta(minutes=1))
+    backfill_latest(db)
+    db.commit()
+    assert _row(db, book, c.id).quotes.cbot_system.cents_per_bu == 1000.0
+
+    # mesmo UPDATE do cbot_worker (mark_mtm_snapshots_dirty) para (farm, symbol, ref_mes)
+    db.execute(
+        text(
+            "UPDATE contract_mtm_snapshots SET dirty = 1 "
+            "WHERE farm_id = :f AND cbot_symbol = :s AND cbot_ref_mes = :rm AND NOT dirty"
+        ),
+        {"f": book.farm_id, "s": SYMBOL, "rm": RM},
+    )
+    db.commit()
+
+    assert _row(db, book, c.id).quotes.cbot_system.cents_per_bu == 1010.0
+    snap = _snap(db, c.id)
+    assert snap.dirty is False
+    assert snap.as_of_ts.replace(tzinfo=timezone.utc) >= first_as_of.replace(tzinfo=timezone.utc)
+
+
+def test_fx_worker_dirty_marking_triggers_recompute(db, book):
+    c = _setup(book)
+    assert _row(db, book, c.id).quotes.fx_system.brl_per_usd == 5.4
+
+    book.fx_run({RM: 5.5}, ts=AS_OF + timedelta(minutes=5))
+    backfill_latest(db)
+    # mesmo UPDATE do fx_model_worker: todo snapshot da farm com FX
+    db.execute(
+        text("UPDATE contract_mtm_snapshots SET dirty = 1 WHERE farm_id = :f AND fx_ref_mes IS NOT NULL AND NOT dirty"),
+        {"f": book.farm_id},
+    )
+    db.commit()
+
+    assert _row(db, book, c.id).quotes.fx_system.brl_per_usd == 5.5
@@ -0,0 +1,97 @@
+# app/tests/test_contracts_mtm_summary.py
+"""summary x contracts_mtm: mesmos filtros e mesma fatia (slice_pct) => total = soma dos totals_view."""
+from __future__ import annotations
+
+import math
+from datetime import date
+
+import pytest
+
+from app.services.contracts_mtm_service import ContractsMtmService
+from app.services.contracts_mtm_summary_service import ContractsMtmSummaryService
+
+RM_N = date(2026, 7, 30)
+RM_U = date(2026, 9, 30)
+
+_mtm = ContractsMtmService()
+_summary = ContractsMtmSummaryService()
+
+FILTERS = [
+    (None, None),
+    ("cbot", "locked"),
+    ("cbot", "open"),
+    ("cbot,fx", "locked,open"),
+    ("premium", "open"),
+]
+
+
+def _book(book):
+    book.cbot_quote("ZSN26.CBT", RM_N, 1000.0)
+    book.cbot_quote("ZSU26.CBT", RM_U, 1040.0)
+    book.fx_run({RM_N: 5.4, RM_U: 5.46})
+    book.fx_manual(RM_N, 5.5)
+
+    c = book.contract(1000, date(2026, 7, 10), frete_brl_total=1500)
+    book.hedge_cbot(c, 400, 1010.0)
+    book.hedge_premium(c, 1000, 0.5, "USD_BU")
+    book.hedge_fx(c, 300, 50000, 5.25)
+
+    c = book.contract(500, date(2026, 9, 5))
+    book.hedge_cbot(c, 500, 10.4)
+
+    book.contract(250, date(2026, 7, 20))  # sem trava
+
+    fixo = book.contract(300, date(2026, 7, 15), tipo="FIXO_BRL", preco_fixo_brl_value=130, frete_brl_per_ton=20)
+    book.commit()
+    return fixo
+
+
+def _sum(values) -> float | None:
+    present = [v for v in values if v is not None]
+    return math.fsum(present) if present else None
+
+
+def _approx(total, rows_sum):
+    if rows_sum is None:
+        return total is None
+    return total == pytest.approx(rows_sum, abs=1e-3)
+
+
+@pytest.mark.parametrize(("types", "states"), FILTERS)
+def test_total_matches_sum_of_row_views(db, book, types, states):
+    _book(book)
+    rows = _mtm.contracts_mtm(
+        db, book.farm_id, "both", False, None, "AUTO", 1000, lock_types=types, lock_states=states
+    ).rows
+    total = _summary.summary(
+        db, book.farm_id, "both", False, None, "AUTO", 1000, lock_types=types, lock_states=states
+    ).total
+
+    # sem filtro ativo não há fatia: a linha inteira (totals) entra no agregado
+    views = [r.totals_view or r.totals for r in rows]
+    assert total.contracts == len(rows)
+    assert total.ton_total == pytest.approx(math.fsum(v.ton_total for v in views), abs=1e-3)
+    assert _approx(total.usd_total_contract, _sum(v.usd_total_contract for v in views))
+    for side in ("system", "manual"):
+        assert _approx(getattr(total.brl_total_contract, side), _sum(getattr(v.brl_total_contract, side) for v in views))
+        assert _approx(getattr(total.fx_locked_usd_used, side), _sum(getattr(v.fx_locked_usd_used, side) for v in views))
+        assert _approx(
+            getattr(total.fx_unlocked_usd_used, side), _sum(getattr(v.fx_unlocked_usd_used, side) for v in views)
+        )
+
+
+def test_fixo_brl_lands_in_none_bucket_with_only_brl_system(db, book):
+    fixo = _book(book)
+    row = next(r for r in _mtm.contracts_mtm(db, book.farm_id, "both", False, None, "AUTO", 1000).rows
+               if r.contract.id == fixo.id)
+
+    resp = _summary.summary(db, book.farm_id, "both", False, None, "AUTO", 1000, group_by="lock_state")
+    buckets = {b.lock_state: b for b in resp.buckets}
+
+    none = buckets["none"]
+    assert none.contracts == 1
+    assert none.brl_total_contract.system == pytest.approx(row.totals.brl_total_contract.system)
+    assert none.brl_total_contract.manual is None
+    assert none.usd_total_contract is None
+    assert (none.fx_locked_usd_used.system, none.fx_unlocked_usd_used.system) == (None, None)
+    assert {"locked", "open"} <= set(buckets)
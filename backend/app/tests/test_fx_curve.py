@@ -0,0 +1,81 @@
+# app/tests/test_fx_curve.py
+"""Curva forward vetorizada x fórmula antiga por tenor; cupom a termo (interpolação e extrapolação flat)."""
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from app.utils.fx_curve import CouponCurve, forward_curve, parse_spreads, tenor_grid
+
+AS_OF = date(2026, 3, 2)
+
+# fx_model_worker antes da curva vetorizada: os 8 ref_mes fixos de abr a nov/2026
+LEGACY_TARGET_DATES = [date(2026, m, 30) for m in range(4, 12)]
+
+
+def _legacy_forward(spot: float, ref_dt: datetime, target: date, annual_rate: float) -> tuple[float, float, float]:
+    """forward_from_spot do worker antigo (um tenor por chamada)."""
+    t_years = (target - ref_dt.date()).days / 365.0
+    cupom_t = (1.0 + annual_rate) ** t_years - 1.0
+    return t_years, cupom_t, spot * (1.0 + cupom_t)
+
+
+@pytest.mark.parametrize("coupon", [0.0, 0.0615, 0.12])
+def test_flat_curve_matches_legacy_formula_on_monthly_grid(coupon):
+    spot = 5.3127
+    grid = tenor_grid(AS_OF, "monthly", 2.0)
+    t, cupom_t, fwd = forward_curve(spot, AS_OF, grid, CouponCurve.flat(coupon))
+
+    dates = grid.astype(object).tolist()
+    assert dates[:9] == [date(2026, 3, 30)] + LEGACY_TARGET_DATES  # os ref_mes antigos estão na grade
+    assert all(d.day == 30 or d.month == 2 for d in dates)
+
+    legacy = np.array([_legacy_forward(spot, datetime(2026, 3, 2, 10, 0), d, coupon) for d in dates])
+    np.testing.assert_allclose(t, legacy[:, 0], rtol=0, atol=1e-15)
+    np.testing.assert_allclose(cupom_t, legacy[:, 1], rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(fwd, legacy[:, 2], rtol=1e-12)
+
+
+def test_grid_covers_years_and_keeps_ref_mes():
+    monthly = tenor_grid(AS_OF, "monthly", 1.0).astype(object).tolist()
+    assert monthly[0] == date(2026, 3, 30) and monthly[-1] == date(2027, 2, 28)
+
+    weekly = tenor_grid(AS_OF, "weekly", 1.0).astype(object).tolist()
+    assert set(monthly) <= set(weekly)
+    assert weekly == sorted(set(weekly))
+    assert date(2026, 3, 9) in weekly and max(weekly) <= date(2027, 3, 2)
+
+    with pytest.raises(ValueError):
+        tenor_grid(AS_OF, "quarterly")
+
+
+def test_dates_on_or_before_as_of_are_spot():
+    t, cupom_t, fwd = forward_curve(5.0, AS_OF, [date(2026, 2, 28), AS_OF], CouponCurve.flat(0.1))
+    np.testing.assert_array_equal(t, [0.0, 0.0])
+    np.testing.assert_array_equal(fwd, [5.0, 5.0])
+
+
+def test_coupon_curve_interpolates_and_extrapolates_flat():
+    curve = CouponCurve.from_knots([[1.0, 0.06], [0.25, 0.05], [2.0, 0.08]])  # fora de ordem
+    np.testing.assert_array_equal(curve.t, [0.25, 1.0, 2.0])
+
+    at = curve.at(np.array([0.0, 0.1, 0.25, 0.625, 1.0, 1.5, 2.0, 3.0, 10.0]))
+    np.testing.assert_allclose(at, [0.05, 0.05, 0.05, 0.055, 0.06, 0.07, 0.08, 0.08, 0.08])
+    assert curve.knots() == [[0.25, 0.05], [1.0, 0.06], [2.0, 0.08]]
+
+    # fwd depois do último nó usa o cupom do último nó
+    t, _, fwd = forward_curve(5.0, AS_OF, [date(2029, 3, 2)], curve)
+    assert fwd[0] == pytest.approx(5.0 * 1.08 ** t[0])
+
+
+def test_coupon_curve_constructors():
+    np.testing.assert_array_equal(CouponCurve.from_knots(None, fallback=0.07).at(np.array([0.0, 5.0])), [0.07, 0.07])
+    assert CouponCurve.with_spreads(0.06, []).knots() == [[0.0, 0.06]]
+
+    spreads = parse_spreads(" 1:0.001, 0.5:0 ,2:-0.1")
+    assert spreads == [(0.5, 0.0), (1.0, 0.001), (2.0, -0.1)]
+    np.testing.assert_allclose(
+        CouponCurve.with_spreads(0.06, spreads).knots(), [[0.5, 0.06], [1.0, 0.061], [2.0, 0.0]]  # nunca < 0
+    )
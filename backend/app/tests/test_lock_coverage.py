@@ -0,0 +1,92 @@
+# app/tests/test_lock_coverage.py
+"""contract_lock_coverage: upsert por contract_id e pré-filtro SQL x lock_filter do engine."""
+from __future__ import annotations
+
+import itertools
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from app.models.contract import Contract
+from app.models.contract_lock_coverage import ContractLockCoverage
+from app.services.contracts_mtm_service import ContractsMtmService
+from app.services.lock_coverage_service import LockCoverageService
+from app.services.mtm_engine import lock_filter
+from app.tests.conftest import AS_OF
+
+_mtm = ContractsMtmService()
+_coverage = LockCoverageService()
+
+TYPES = [None, "cbot", "premium", "fx", "cbot,fx", "cbot,premium,fx"]
+STATES = ["locked", "open", "locked,open"]
+
+
+def _book(book):
+    """Todas as combinações de ton travado (0, parcial, total, excedente) por tipo + casos de borda."""
+    rm = date(2026, 7, 30)
+    book.cbot_quote("ZSN26.CBT", rm, 1000.0)
+    book.fx_run({rm: 5.4})
+
+    for cbot, prem, fx in itertools.product([0, 40, 100, 120], [0, 100], [0, 30, 100]):
+        c = book.contract(100, date(2026, 7, 10))
+        if cbot:
+            book.hedge_cbot(c, cbot, 1000.0)
+        if prem:
+            book.hedge_premium(c, prem, 0.5, "USD_BU")
+        if fx:
+            book.hedge_fx(c, fx, 1000, 5.2)
+
+    c = book.contract(0, date(2026, 7, 10))  # volume zero com trava
+    book.hedge_cbot(c, 10, 1000.0)
+    book.contract(100, date(2026, 7, 10), tipo="FIXO_BRL", preco_fixo_brl_value=130)
+    c = book.contract(100, date(2026, 7, 10), tipo="FIXO_BRL", preco_fixo_brl_value=130)
+    book.hedge_cbot(c, 50, 1000.0)
+    book.commit()
+
+
+def test_refresh_upserts_row_created_by_another_request(db, book):
+    c = book.contract(100, date(2026, 7, 10))
+    book.hedge_cbot(c, 40, 1000.0)
+    # outro create de hedge criou a linha de cobertura entre a leitura e o refresh deste
+    db.execute(
+        text(
+            "INSERT INTO contract_lock_coverage (contract_id, farm_id, cbot_ton, premium_ton, fx_ton, created_at, updated_at) "
+            "VALUES (:c, :f, 0, 0, 0, :ts, :ts)"
+        ),
+        {"c": c.id, "f": book.farm_id, "ts": AS_OF},
+    )
+
+    assert _coverage.refresh_contracts(db, book.farm_id, [c.id]) == 1
+    assert _coverage.refresh_contracts(db, book.farm_id, [c.id]) == 1
+    db.commit()
+
+    cov = db.query(ContractLockCoverage).filter(ContractLockCoverage.contract_id == c.id).one()
+    assert (float(cov.cbot_ton), float(cov.premium_ton), float(cov.fx_ton)) == (40.0, 0.0, 0.0)
+
+
+@pytest.mark.parametrize(("types", "states"), list(itertools.product(TYPES, STATES)))
+def test_sql_prefilter_keeps_same_rows_as_engine(db, book, types, states):
+    _book(book)
+    selected_types, selected_states, filters_active = _mtm.lock_filters(types, states, False)
+
+    # referência: book inteiro avaliado + lock_filter do engine (sem filtro ativo, o service não corta nada)
+    everything = db.query(Contract).filter(Contract.farm_id == book.farm_id).order_by(Contract.id.desc()).all()
+    expected = {c.id for c in everything}
+    if filters_active:
+        values_book, v = _mtm.value_contracts(db, book.farm_id, everything)
+        keep, *_ = lock_filter(
+            v.cov_cbot, v.cov_premium, v.cov_fx, values_book.positions.is_fixo, selected_types, selected_states
+        )
+        expected = {c.id for c, k in zip(everything, keep.tolist()) if k}
+
+    # pré-filtro SQL (contract_lock_coverage) antes do MTM: sem casos de arredondamento no book, corta igual
+    prefiltered, _ = _mtm.page_contracts(
+        db, book.farm_id, False, False, filters_active, 1000, None,
+        lock_prefilter=True, selected_types=selected_types, selected_states=selected_states,
+    )
+    assert {c.id for c in prefiltered} == expected
+
+    # resposta final (pré-filtro + corte exato do engine) = referência
+    resp = _mtm.contracts_mtm(db, book.farm_id, "both", False, None, "AUTO", 1000, lock_types=types, lock_states=states)
+    assert {r.contract.id for r in resp.rows} == expected
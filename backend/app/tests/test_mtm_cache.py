@@ -0,0 +1,69 @@
+# app/tests/test_mtm_cache.py
+"""Cache de respostas do contracts-mtm: hit devolve o corpo serializado, imune a mutação do chamador."""
+from __future__ import annotations
+
+import json
+from datetime import date
+
+from app.api.routers import contracts_mtm as router
+from app.schemas.contracts_mtm import ContractsMtmResponse
+from app.services.mtm_cache import CachedJson, MtmResultCache, mtm_cache
+
+
+def _get(db, farm_id, **kw):
+    params = dict(
+        mode="both", only_open=True, ref_mes=None, default_symbol="AUTO", limit=200, after_id=None,
+        lock_types=None, lock_states=None, no_locks=False, source="live", detail="full", fields=None,
+        as_of=None, fmt="json", db=db, membership=None,
+    )
+    return router.contracts_mtm(farm_id, **(params | kw))
+
+
+def _book(book):
+    book.cbot_quote("ZSN26.CBT", date(2026, 7, 30), 1000.0)
+    book.fx_run({date(2026, 7, 30): 5.4})
+    c = book.contract(500, date(2026, 7, 10))
+    book.hedge_cbot(c, 100, 1010.0)
+    book.commit()
+    return c
+
+
+def test_hit_serves_same_body_and_caller_cannot_corrupt_it(db, book):
+    _book(book)
+    before = mtm_cache.stats()
+    first = _get(db, book.farm_id)
+    assert mtm_cache.stats()["misses"] == before["misses"] + 1
+
+    # o chamador mexe no que recebeu: não pode vazar para a próxima resposta
+    parsed = ContractsMtmResponse.model_validate_json(first.body)
+    parsed.rows[0].locks.cbot.coverage_pct = 0.99
+    parsed.rows.clear()
+
+    second = _get(db, book.farm_id)
+    assert mtm_cache.stats()["hits"] == before["hits"] + 1
+    assert second.media_type == "application/json"
+    assert second.body == first.body
+    assert json.loads(second.body)["rows"][0]["locks"]["cbot"]["coverage_pct"] == 0.2
+
+
+def test_version_change_recomputes(db, book):
+    c = _book(book)
+    before = mtm_cache.stats()
+    first = json.loads(_get(db, book.farm_id).body)
+
+    book.hedge_cbot(c, 100, 1020.0)
+    book.commit()
+    second = json.loads(_get(db, book.farm_id).body)
+
+    assert mtm_cache.stats()["hits"] == before["hits"]
+    assert first["rows"][0]["locks"]["cbot"]["coverage_pct"] == 0.2
+    assert second["rows"][0]["locks"]["cbot"]["coverage_pct"] == 0.4
+
+
+def test_lru_weight_is_rows():
+    cache = MtmResultCache(max_rows=5)
+    for k in range(3):
+        cache.get_or_compute(k, (), lambda: CachedJson(b"{}", 2), lambda v: v.rows)
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["rows"], stats["evictions"]) == (1, 3, 2)
@@ -0,0 +1,83 @@
+# app/tests/test_mtm_loader_hedges.py
+"""Agregação de todos os lotes de trava por contrato (VWAP) no mtm_loader."""
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+import pytest
+
+from app.services.contracts_mtm_service import ContractsMtmService
+from app.services.mtm_engine import TON_PER_BU
+from app.services.mtm_loader import load_mtm_inputs
+from app.tests.conftest import AS_OF
+
+RM = date(2026, 7, 30)
+
+
+def _contract_with_cbot_lots(book, lots: list[tuple[float, float]]):
+    c = book.contract(1000, date(2026, 7, 10))
+    for k, (ton, price) in enumerate(lots):
+        book.hedge_cbot(c, ton, price, ts=AS_OF - timedelta(days=len(lots) - k))
+    return c
+
+
+@pytest.mark.parametrize(
+    ("lots", "expected"),
+    [
+        # todos em cents: VWAP cru
+        ([(100, 1000.0), (100, 1100.0)], 1050.0),
+        # todos em USD/bu: VWAP cru em USD (o engine converte para cents depois)
+        ([(100, 10.0), (300, 11.0)], 10.75),
+        # escalas misturadas: lotes em USD/bu viram cents antes de ponderar
+        ([(100, 10.0), (300, 1040.0)], 1030.0),
+        ([(300, 1040.0), (100, 10.0)], 1030.0),  # ordem dos lotes não importa
+    ],
+)
+def test_cbot_vwap_across_lots(db, book, lots, expected):
+    c = _contract_with_cbot_lots(book, lots)
+    book.commit()
+
+    agg = load_mtm_inputs(db, [book.farm_id], [c.id], []).hedge_cbot[c.id]
+
+    assert agg.lots == len(lots)
+    assert agg.volume_ton == pytest.approx(sum(t for t, _ in lots))
+    assert agg.cbot_usd_per_bu == pytest.approx(expected)
+
+
+def test_cbot_symbol_and_ref_mes_come_from_latest_lot(db, book):
+    c = book.contract(1000, date(2026, 7, 10))
+    book.hedge_cbot(c, 100, 1000.0, ts=AS_OF - timedelta(days=2), symbol="ZSK26.CBT", ref_mes=date(2026, 5, 30))
+    book.hedge_cbot(c, 100, 1000.0, ts=AS_OF - timedelta(days=1), symbol="ZSN26.CBT", ref_mes=RM)
+    book.commit()
+
+    agg = load_mtm_inputs(db, [book.farm_id], [c.id], []).hedge_cbot[c.id]
+    assert (agg.symbol, agg.ref_mes) == ("ZSN26.CBT", RM)
+
+
+def test_mixed_scale_lots_value_in_cents(db, book):
+    book.cbot_quote("ZSN26.CBT", RM, 1000.0)
+    book.fx_run({RM: 5.4})
+    mixed = _contract_with_cbot_lots(book, [(100, 10.0), (300, 1040.0)])
+    usd = _contract_with_cbot_lots(book, [(100, 10.0), (300, 11.0)])
+    book.commit()
+
+    resp = ContractsMtmService().contracts_mtm(
+        db=db, farm_id=book.farm_id, mode="both", only_open=False, ref_mes=None, default_symbol="AUTO", limit=100,
+    )
+    rows = {r.contract.id: r for r in resp.rows}
+
+    assert rows[mixed.id].locks.cbot.locked_cents_per_bu == pytest.approx(1030.0)
+    assert rows[mixed.id].locks.cbot.coverage_pct == pytest.approx(0.4)
+    assert rows[usd.id].locks.cbot.locked_cents_per_bu == pytest.approx(1075.0)
+
+
+def test_premium_mixed_units_aggregate_in_usd_per_bu(db, book):
+    c = book.contract(1000, date(2026, 7, 10))
+    book.hedge_premium(c, 100, 0.5, "USD_BU")
+    book.hedge_premium(c, 100, 20.0, "USD_TON")
+    book.commit()
+
+    agg = load_mtm_inputs(db, [book.farm_id], [c.id], []).hedge_premium[c.id]
+
+    assert agg.premium_unit == "USD_BU"
+    assert agg.premium_value == pytest.approx((0.5 + 20.0 * TON_PER_BU) / 2)
@@ -0,0 +1,96 @@
+# app/utils/contract_calendar.py
+"""
+Calendário de contratos CBOT (soja): símbolo <-> month code <-> ref_mes.
+
+Padrão do sistema: ref_mes = dia 30 do mês (fevereiro: último dia do mês).
+A tabela (ano, mês) e os símbolos ZS{code}{yy}.CBT são pré-calculados no import;
+o resto das resoluções é lookup em dict (ou lru_cache para símbolos fora da tabela).
+
+Só stdlib: os workers importam este mesmo módulo (workers/common/contract_calendar.py).
+"""
+from __future__ import annotations
+
+import calendar
+from datetime import date
+from functools import lru_cache
+
+REF_MES_DAY = 30
+
+MONTH_CODES = "FGHJKMNQUVXZ"
+MONTH_TO_CODE = {i + 1: c for i, c in enumerate(MONTH_CODES)}
+CODE_TO_MONTH = {c: i + 1 for i, c in enumerate(MONTH_CODES)}
+
+# símbolo mensal padrão (Yahoo): ZSN26.CBT
+SOY_ROOT = "ZS"
+SOY_SUFFIX = ".CBT"
+
+_YEARS = range(2000, 2100)
+
+
+def _ref_mes(year: int, month: int) -> date:
+    return date(year, month, min(REF_MES_DAY, calendar.monthrange(year, month)[1]))
+
+
+# (ano, mês) -> ref_mes | ref_mes -> símbolo AUTO | símbolo -> ref_mes
+_REF_MES_BY_YM: dict[tuple[int, int], date] = {(y, m): _ref_mes(y, m) for y in _YEARS for m in range(1, 13)}
+_AUTO_SYMBOL_BY_REF_MES: dict[date, str] = {
+    rm: f"{SOY_ROOT}{MONTH_TO_CODE[m]}{y % 100:02d}{SOY_SUFFIX}" for (y, m), rm in _REF_MES_BY_YM.items()
+}
+_REF_MES_BY_SYMBOL: dict[str, date] = {s: rm for rm, s in _AUTO_SYMBOL_BY_REF_MES.items()}
+
+
+def ref_mes_for(year: int, month: int) -> date:
+    rm = _REF_MES_BY_YM.get((year, month))
+    return rm if rm is not None else _ref_mes(year, month)
+
+
+def ref_mes_of(d: date) -> date:
+    """Normaliza qualquer data do mês para o ref_mes (dia 30)."""
+    return ref_mes_for(d.year, d.month)
+
+
+def is_ref_mes(d: date) -> bool:
+    return d == ref_mes_for(d.year, d.month)
+
+
+def auto_symbol(ref_mes: date) -> str:
+    """AUTO -> ZS{MonthCode}{YY}.CBT do mês/ano do ref_mes."""
+    s = _AUTO_SYMBOL_BY_REF_MES.get(ref_mes_of(ref_mes))
+    if s is not None:
+        return s
+    return f"{SOY_ROOT}{MONTH_TO_CODE[ref_mes.month]}{ref_mes.year % 100:02d}{SOY_SUFFIX}"
+
+
+def symbol_ref_mes(symbol: str | None) -> date | None:
+    """
+    ref_mes de um símbolo mensal (ZSN26.CBT -> 2026-07-30, ZSX25 -> 2025-11-30).
+    Contínuos (ZS=F) ou fora do padrão -> None.
+    """
+    s = (symbol or "").strip().upper()
+    rm = _REF_MES_BY_SYMBOL.get(s)
+    return rm if rm is not None else _parse_symbol_ref_mes(s)
+
+
+@lru_cache(maxsize=4096)
+def _parse_symbol_ref_mes(s: str) -> date | None:
+    # padrão esperado: ...[MonthCode][YY](.EXCH)
+    root = s.split(".", 1)[0]
+    if len(root) < 4:
+        return None
+    month = CODE_TO_MONTH.get(root[-3])
+    yy = root[-2:]
+    if month is None or not yy.isdigit():
+        return None
+    return ref_mes_for(2000 + int(yy), month)
+
+
+@lru_cache(maxsize=4096)
+def resolve_symbol(raw: str | None, ref_mes: date | None) -> str:
+    """
+    Símbolo efetivo de uma trava/contrato: strip; 'AUTO' (qualquer caixa) vira o vencimento do ref_mes.
+    Sem ref_mes, AUTO não tem como resolver e volta vazio.
+    """
+    s = (raw or "").strip()
+    if s.upper() == "AUTO":
+        return auto_symbol(ref_mes) if ref_mes else ""
+    return s
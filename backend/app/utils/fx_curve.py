@@ -0,0 +1,110 @@
+# app/utils/fx_curve.py
+"""
+Curva forward USDBRL vetorizada: fwd(d) = spot * (1 + cupom(t)) ** t, t = dias / 365.
+
+- grade de tenores configurável (monthly = ref_mes dia 30 | weekly | daily) até N anos
+- cupom como estrutura a termo: nós (t_anos, cupom anual) com interpolação linear em t e
+  extrapolação flat; um nó só = cupom único (comportamento antigo)
+- uma operação NumPy para a curva inteira; qualquer data de entrega pode ser avaliada
+
+NumPy + stdlib: o fx_model_worker importa este mesmo módulo (workers/common/fx_curve.py).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from .contract_calendar import ref_mes_for
+
+DAYS_PER_YEAR = 365.0
+GRID_KINDS = ("monthly", "weekly", "daily")
+
+
+@dataclass(frozen=True, eq=False)
+class CouponCurve:
+    """Cupom cambial anual por prazo (t_anos crescente)."""
+
+    t: np.ndarray
+    coupon: np.ndarray
+
+    @classmethod
+    def flat(cls, coupon_annual: float) -> "CouponCurve":
+        return cls(np.array([0.0]), np.array([float(coupon_annual)]))
+
+    @classmethod
+    def from_knots(cls, knots: Iterable[Sequence[float]] | None, fallback: float | None = None) -> "CouponCurve":
+        """knots = [[t_anos, cupom], ...] (ex.: fx_model_runs.coupon_curve); vazio -> flat(fallback)."""
+        pts = sorted((float(t), float(c)) for t, c in (knots or []))
+        if not pts:
+            return cls.flat(fallback or 0.0)
+        return cls(np.array([p[0] for p in pts]), np.array([p[1] for p in pts]))
+
+    @classmethod
+    def with_spreads(cls, base: float, spreads: Sequence[tuple[float, float]]) -> "CouponCurve":
+        """Cupom base + spread por prazo (nunca negativo); sem spreads -> flat(base)."""
+        if not spreads:
+            return cls.flat(max(base, 0.0))
+        return cls.from_knots([(t, max(base + s, 0.0)) for t, s in spreads])
+
+    def at(self, t_years: np.ndarray) -> np.ndarray:
+        return np.interp(t_years, self.t, self.coupon)
+
+    def knots(self) -> list[list[float]]:
+        return [[float(t), float(c)] for t, c in zip(self.t, self.coupon)]
+
+
+def parse_spreads(raw: str | None) -> list[tuple[float, float]]:
+    """'0.5:0,1:0.001,2:0.0025' -> [(0.5, 0.0), (1.0, 0.001), (2.0, 0.0025)]."""
+    out: list[tuple[float, float]] = []
+    for part in (raw or "").split(","):
+        part = part.strip()
+        if part:
+            t, s = part.split(":", 1)
+            out.append((float(t), float(s)))
+    return sorted(out)
+
+
+def tenor_grid(as_of: date, kind: str = "monthly", years: float = 2.0) -> np.ndarray:
+    """
+    Datas (datetime64[D]) estritamente depois de as_of até as_of + years.
+    Os ref_mes mensais (dia 30) sempre entram: são a chave do FX do contracts-mtm.
+    """
+    if kind not in GRID_KINDS:
+        raise ValueError(f"grade inválida: {kind} (use {', '.join(GRID_KINDS)})")
+    end = as_of + timedelta(days=int(round(years * DAYS_PER_YEAR)))
+
+    monthly: list[date] = []
+    y, m = as_of.year, as_of.month
+    while True:
+        rm = ref_mes_for(y, m)
+        if rm > end:
+            break
+        if rm > as_of:
+            monthly.append(rm)
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+
+    out = np.array(monthly, dtype="datetime64[D]")
+    if kind != "monthly":
+        step = 1 if kind == "daily" else 7
+        start = np.datetime64(as_of, "D")
+        n = (end - as_of).days // step
+        out = np.union1d(out, start + np.arange(1, n + 1, dtype=np.int64) * step)
+    return out
+
+
+def forward_curve(
+    spot: float,
+    as_of: date,
+    dates: np.ndarray | Sequence[date],
+    coupon: CouponCurve,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (t_anos, cupom_t, fwd) para cada data. Datas <= as_of viram t=0 (fwd = spot).
+    """
+    days = (np.asarray(dates, dtype="datetime64[D]") - np.datetime64(as_of, "D")).astype(np.int64)
+    t = np.maximum(days, 0) / DAYS_PER_YEAR
+    cupom_t = np.power(1.0 + coupon.at(t), t) - 1.0
+    return t, cupom_t, float(spot) * (1.0 + cupom_t)
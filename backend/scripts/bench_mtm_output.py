@@ -0,0 +1,144 @@
+# scripts/bench_mtm_output.py
+"""
+Benchmark da saída do MTM: conversão por campo (float(Decimal) + _r por célula, caminho antigo)
+vs colunas convertidas uma vez por book (OutputColumns), e reprodutibilidade dos totais
+(np.sum vs exact_sum com o book embaralhado / em lotes).
+
+Sem banco: book sintético direto no engine.
+    cd backend && python -m scripts.bench_mtm_output [n_contratos] [repeticoes]
+"""
+from __future__ import annotations
+
+import sys
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from app.services.mtm_engine import (
+    PREMIUM_UNIT_USD_BU,
+    BookMarket,
+    BookPositions,
+    OutputColumns,
+    exact_sum,
+    value_book,
+)
+
+
+def _book(n: int, seed: int = 7) -> tuple[BookPositions, BookMarket]:
+    rnd = np.random.default_rng(seed)
+    vol = np.round(rnd.uniform(10, 5000, n), 6)
+    locked = rnd.random(n) < 0.7
+    pos = BookPositions(
+        vol_total_ton=vol,
+        is_fixo=rnd.random(n) < 0.1,
+        fixo_brl_per_saca=np.full(n, 130.5),
+        frete_brl_total=np.where(rnd.random(n) < 0.3, 1500.0, 0.0),
+        cbot_hedge_ton=np.where(locked, np.round(vol * rnd.choice([0.25, 0.5, 1.0], n), 6), np.nan),
+        cbot_locked_raw=np.where(locked, rnd.uniform(950, 1100, n), np.nan),
+        prem_hedge_ton=np.where(locked, np.round(vol * 0.5, 6), np.nan),
+        prem_value=np.where(locked, rnd.uniform(-0.5, 1.5, n), np.nan),
+        prem_unit=np.full(n, PREMIUM_UNIT_USD_BU, dtype=np.int8),
+        fx_hedge_ton=np.where(locked, np.round(vol * 0.25, 6), np.nan),
+        fx_locked_rate=np.where(locked, rnd.uniform(5.0, 5.8, n), np.nan),
+        fx_locked_usd_amount=np.where(locked & (rnd.random(n) < 0.5), rnd.uniform(1e3, 1e6, n), np.nan),
+    )
+    mkt = BookMarket(
+        cbot_cents=rnd.uniform(950, 1100, n),
+        fx_system=rnd.uniform(5.2, 5.9, n),
+        fx_manual=np.where(rnd.random(n) < 0.8, rnd.uniform(5.2, 5.9, n), np.nan),
+    )
+    return pos, mkt
+
+
+def _fields(v) -> list[tuple[np.ndarray, int]]:
+    s, m = v.system, v.manual
+    cols = [
+        (v.cov_cbot, 6), (v.cov_premium, 6), (v.cov_fx, 6), (v.cbot_locked_cents, 4),
+        (v.usd_per_saca, 4), (v.ton_total, 4), (v.sacas_total, 0), (v.usd_total_contract, 4),
+        (v.cbot_locked_usd_per_bu, 6), (v.cbot_live_usd_per_bu, 6), (v.cbot_effective_usd_per_bu, 6),
+        (v.premium_locked_usd_per_bu, 6), (v.premium_effective_usd_per_bu, 6), (v.frete_brl_total, 4),
+    ]
+    for side in (s, m):
+        cols += [
+            (side.brl_per_saca_net, 4), (side.brl_total_net, 4), (side.fx_locked_usd, 4),
+            (side.fx_unlocked_usd, 4), (side.fx_locked_pct, 6), (side.fx_unlocked_pct, 6),
+            (side.fx_live, 6), (side.fx_effective, 6), (side.brl_per_saca_gross, 4), (side.brl_total_gross, 4),
+        ]
+    return cols
+
+
+def _legacy_r(v, nd):
+    # caminho antigo: ContractsMtmService._r por célula (+ _to_float nos campos Decimal)
+    if v is None:
+        return None
+    try:
+        x = float(v)
+    except Exception:
+        return None
+    if x != x:
+        return None
+    return round(x, nd)
+
+
+def _legacy(v, decimals: list[list[Decimal | None]], n: int) -> list[list]:
+    fields = _fields(v)
+    rows = []
+    for i in range(n):
+        row = [_legacy_r(a[i], nd) for a, nd in fields]
+        row += [_legacy_r(float(d[i]) if d[i] is not None else None, 6) for d in decimals]
+        rows.append(row)
+    return rows
+
+
+def _columns(v, decimals_f: list[np.ndarray], n: int) -> list[list]:
+    fields = _fields(v) + [(a, 6) for a in decimals_f]
+    out = OutputColumns()
+    rows = []
+    for i in range(n):
+        r = out.row(i)
+        rows.append([r(a, nd) for a, nd in fields])
+    return rows
+
+
+def main(n: int = 20000, reps: int = 3) -> None:
+    pos, mkt = _book(n)
+    v = value_book(pos, mkt)
+
+    # campos que chegam como Decimal do ORM (antes: float() a cada leitura; agora: 1x no load)
+    decimals = [
+        [None if x != x else Decimal(str(round(x, 6))) for x in a.tolist()]
+        for a in (pos.fx_locked_rate, pos.prem_value, mkt.cbot_cents, mkt.fx_system, mkt.fx_manual)
+    ]
+
+    best_legacy = best_cols = float("inf")
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        a = _legacy(v, decimals, n)
+        t1 = time.perf_counter()
+        decimals_f = [np.array([np.nan if d is None else float(d) for d in col]) for col in decimals]
+        b = _columns(v, decimals_f, n)
+        t2 = time.perf_counter()
+        best_legacy = min(best_legacy, t1 - t0)
+        best_cols = min(best_cols, t2 - t1)
+
+    assert a == b, "saída diferente entre os caminhos"
+    cells = n * len(a[0])
+    print(f"contratos={n} células={cells}")
+    print(f"por campo : {best_legacy * 1e3:8.1f} ms  ({best_legacy / cells * 1e9:6.0f} ns/célula)")
+    print(f"por coluna: {best_cols * 1e3:8.1f} ms  ({best_cols / cells * 1e9:6.0f} ns/célula)")
+    print(f"speedup   : {best_legacy / best_cols:6.2f}x  (saída idêntica)")
+
+    # totais: mesma carteira em outra ordem / em lotes de 500 (como o stream) deve dar o mesmo número
+    col = v.system.brl_total_net[~np.isnan(v.system.brl_total_net)]
+    perm = np.random.default_rng(1).permutation(col)
+    chunks = [col[k : k + 500] for k in range(0, len(col), 500)]
+    np_vals = {float(col.sum()), float(perm.sum()), float(sum(c.sum() for c in chunks))}
+    fs_vals = {exact_sum(col), exact_sum(perm), exact_sum(np.concatenate(chunks))}
+    print(f"total BRL np.sum   : {len(np_vals)} valor(es) distinto(s) -> {sorted(np_vals)}")
+    print(f"total BRL exact_sum: {len(fs_vals)} valor(es) distinto(s) -> {sorted(fs_vals)}")
+
+
+if __name__ == "__main__":
+    args = [int(x) for x in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,91 @@
+# workers/common/cbot_session.py
+"""
+Calendário de pregão CBOT (grãos, CME Globex) e agenda de polling do cbot_worker.
+
+Sessões (horário de Chicago):
+  - noturna:  19:00 -> 07:45 do dia seguinte (pertence ao pregão do dia seguinte)
+  - diurna:   08:30 -> 13:20
+Pregão = segunda a sexta, fora de CBOT_HOLIDAYS (YYYY-MM-DD,...). Domingo 19:00 abre o pregão
+de segunda; sexta 19:00 seria sábado -> fechado.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time as dtime, timedelta
+
+from dateutil import tz
+
+CHICAGO = tz.gettz("America/Chicago")
+
+NIGHT_OPEN = dtime(19, 0)
+NIGHT_CLOSE = dtime(7, 45)
+DAY_OPEN = dtime(8, 30)
+DAY_CLOSE = dtime(13, 20)
+
+
+def parse_holidays(raw: str | None) -> frozenset[date]:
+    out: set[date] = set()
+    for part in (raw or "").split(","):
+        part = part.strip()
+        if part:
+            out.add(datetime.strptime(part, "%Y-%m-%d").date())
+    return frozenset(out)
+
+
+class CbotSession:
+    def __init__(self, holidays: frozenset[date] = frozenset()):
+        self.holidays = holidays
+
+    def trade_date(self, dt_ct: datetime) -> date:
+        """Sessão noturna conta para o pregão do dia seguinte."""
+        return dt_ct.date() + timedelta(days=1) if dt_ct.time() >= NIGHT_OPEN else dt_ct.date()
+
+    def is_open(self, dt: datetime) -> bool:
+        dt_ct = dt.astimezone(CHICAGO)
+        td = self.trade_date(dt_ct)
+        if td.weekday() >= 5 or td in self.holidays:
+            return False
+        t = dt_ct.time()
+        return t >= NIGHT_OPEN or t < NIGHT_CLOSE or DAY_OPEN <= t < DAY_CLOSE
+
+    def next_open(self, dt: datetime) -> datetime:
+        """Próxima abertura (19:00 ou 08:30 de Chicago) depois de dt; procura até 15 dias à frente."""
+        dt_ct = dt.astimezone(CHICAGO)
+        d = dt_ct.date()
+        for i in range(16):
+            day = d + timedelta(days=i)
+            for t in (DAY_OPEN, NIGHT_OPEN):
+                cand = datetime.combine(day, t, tzinfo=CHICAGO)
+                if cand > dt_ct and self.is_open(cand):
+                    return cand.astimezone(dt.tzinfo)
+        return dt + timedelta(days=1)
+
+
+class PollScheduler:
+    """
+    Intervalo entre polls:
+      - pregão aberto e preço andando -> fast_sec
+      - pregão aberto e preço parado  -> dobra a cada ciclo sem mudança, até slow_sec
+      - pregão fechado                -> closed_sec (pega ajuste/settlement), ou dorme até a
+                                         abertura se closed_sec=0; nunca passa da próxima abertura
+    """
+
+    def __init__(self, session: CbotSession, fast_sec: float, slow_sec: float, closed_sec: float):
+        self.session = session
+        self.fast_sec = fast_sec
+        self.slow_sec = max(slow_sec, fast_sec)
+        self.closed_sec = closed_sec
+        self.flat_cycles = 0
+
+    def observe(self, moved: bool):
+        self.flat_cycles = 0 if moved else self.flat_cycles + 1
+
+    def interval(self, now: datetime) -> float:
+        if self.session.is_open(now):
+            return min(self.slow_sec, self.fast_sec * (2 ** min(self.flat_cycles, 16)))
+        until_open = (self.session.next_open(now) - now).total_seconds()
+        if self.closed_sec <= 0:
+            return max(until_open, 1.0)
+        return max(min(self.closed_sec, until_open), 1.0)
+
+    def should_poll(self, now: datetime) -> bool:
+        return self.closed_sec > 0 or self.session.is_open(now)
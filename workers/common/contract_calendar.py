@@ -0,0 +1,4 @@
+# workers/common/contract_calendar.py
+"""Calendário CBOT: o mesmo módulo da API (backend/app/utils/contract_calendar.py)."""
+from common import shared  # noqa: F401  (backend/ no sys.path)
+from app.utils.contract_calendar import *  # noqa: F401,F403
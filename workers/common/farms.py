@@ -0,0 +1,39 @@
+# workers/common/farms.py
+"""
+Farms atendidas pelos workers: 1 fetch de mercado por ciclo, gravado para cada farm.
+
+FARM_IDS=1,3 (ou o legado FARM_ID=3) fixa a lista; sem isso, usa farms.ativo do banco,
+relido a cada FARMS_REFRESH_SEC (farm nova/desativada entra/sai sem reiniciar o container).
+"""
+from __future__ import annotations
+
+import os
+import time
+
+
+def pinned_farm_ids() -> list[int] | None:
+    raw = os.getenv("FARM_IDS") or os.getenv("FARM_ID")
+    if not raw or not raw.strip():
+        return None
+    return sorted({int(x) for x in raw.split(",") if x.strip()})
+
+
+class ActiveFarms:
+    def __init__(self, pinned: list[int] | None = None, refresh_sec: float | None = None):
+        self.pinned = pinned
+        self.refresh_sec = refresh_sec if refresh_sec is not None else float(os.getenv("FARMS_REFRESH_SEC", "60"))
+        self._ids: list[int] = []
+        self._loaded_at: float | None = None
+
+    def get(self, cur) -> list[int]:
+        if self.pinned is not None:
+            return self.pinned
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at >= self.refresh_sec:
+            cur.execute("SELECT id FROM farms WHERE ativo ORDER BY id")
+            self._ids = [int(r[0]) for r in cur.fetchall()]
+            self._loaded_at = now
+        return self._ids
+
+    def describe(self) -> str:
+        return f"farm_ids={self.pinned}" if self.pinned is not None else "farms=ativo (auto)"
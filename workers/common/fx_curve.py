@@ -0,0 +1,4 @@
+# workers/common/fx_curve.py
+"""Curva forward USDBRL: o mesmo módulo da API (backend/app/utils/fx_curve.py)."""
+from common import shared  # noqa: F401  (backend/ no sys.path)
+from app.utils.fx_curve import *  # noqa: F401,F403
@@ -0,0 +1,16 @@
+# workers/common/shared.py
+"""
+Módulos puros da API (backend/app/utils) usados também pelos workers, sem cópia.
+
+Localmente o backend fica ao lado de workers/; no container o workers/Dockerfile copia os
+módulos para /backend/app/utils (e o docker-compose monta o mesmo diretório em dev).
+"""
+from __future__ import annotations
+
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "backend")
+
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
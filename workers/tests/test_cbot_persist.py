@@ -0,0 +1,121 @@
+# workers/tests/test_cbot_persist.py
+"""cbot_worker: o que grava por (farm_id, symbol, ref_mes) e como o ciclo vira 3 statements para N farms."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from cbot import cbot_worker as w
+
+T0 = datetime(2026, 3, 2, 15, 0, tzinfo=timezone.utc)
+ZSN, ZSU = "ZSN26.CBT", "ZSU26.CBT"
+RM_N, RM_U = w.ref_mes_from_symbol(ZSN), w.ref_mes_from_symbol(ZSU)
+
+
+class FakeCursor:
+    def __init__(self):
+        self.calls: list[tuple[str, tuple | None]] = []
+
+    def execute(self, sql, args=None):
+        self.calls.append((" ".join(sql.split()), args))
+
+
+@pytest.fixture(autouse=True)
+def policy(monkeypatch):
+    monkeypatch.setattr(w, "HEARTBEAT_SEC", 300.0)
+    monkeypatch.setattr(w, "DEADBAND", 0.5)
+
+
+@pytest.fixture
+def executed(monkeypatch):
+    """execute_values sem banco: registra (tabela, linhas); o INSERT em cbot_quotes devolve o RETURNING."""
+    calls: list[tuple[str, list]] = []
+
+    def fake_execute_values(cur, sql, values, fetch=False, **kw):
+        values = list(values)
+        calls.append((sql.split("INSERT INTO")[1].split()[0], values))
+        if fetch:
+            return [(900 + k, fid, sym, rm, px) for k, (fid, _, _, sym, rm, px) in enumerate(values)]
+        return None
+
+    monkeypatch.setattr(w.psycopg2.extras, "execute_values", fake_execute_values)
+    return calls
+
+
+def test_deadband_and_heartbeat_per_farm_symbol_ref_mes():
+    last = {
+        (1, ZSN, RM_N): (1000.0, T0 - timedelta(seconds=60)),   # recente
+        (2, ZSN, RM_N): (1000.0, T0 - timedelta(seconds=400)),  # heartbeat vencido
+        (1, ZSU, RM_U): (1040.0, T0 - timedelta(seconds=60)),
+        (2, ZSU, RM_U): (1040.0, T0 - timedelta(seconds=60)),
+    }
+    farms = [1, 2, 3]  # farm 3 nunca gravou
+
+    # dentro do deadband: só grava quem está sem heartbeat ou sem histórico
+    rows, status = w.plan_quotes(T0, {ZSN: 1000.2, ZSU: 1040.0, "ZS=F": 1000.0}, last, farms)
+    assert sorted(rows) == [(2, ZSN, RM_N, 1000.2), (3, ZSN, RM_N, 1000.2), (3, ZSU, RM_U, 1040.0)]
+    assert status == {ZSN: "write", ZSU: "write", "ZS=F": "skip"}
+
+    # mesmas farms já com histórico recente: igual => same, abaixo do deadband => band
+    fresh = {k: (px, T0) for k, (px, _) in last.items()}
+    rows, status = w.plan_quotes(T0 + timedelta(seconds=15), {ZSN: 1000.0, ZSU: 1040.3}, fresh, [1, 2])
+    assert rows == []
+    assert status == {ZSN: "same", ZSU: "band"}
+
+    # fora do deadband: grava para todas as farms
+    rows, status = w.plan_quotes(T0 + timedelta(seconds=15), {ZSN: 1000.5}, fresh, [1, 2])
+    assert rows == [(1, ZSN, RM_N, 1000.5), (2, ZSN, RM_N, 1000.5)]
+    assert status == {ZSN: "write"}
+
+
+def test_heartbeat_zero_always_writes(monkeypatch):
+    monkeypatch.setattr(w, "HEARTBEAT_SEC", 0.0)  # sem heartbeat: sem estado, grava todo ciclo
+    old = T0 - timedelta(days=1)
+    last = {(1, ZSN, RM_N): (1000.0, old)}
+    rows, status = w.plan_quotes(T0, {ZSN: 1000.0}, last, [1])
+    assert (rows, status) == ([(1, ZSN, RM_N, 1000.0)], {ZSN: "write"})
+
+
+def test_persist_fans_rows_out_to_farms_in_three_statements(executed):
+    farms = [1, 2, 3]
+    rows, _ = w.plan_quotes(T0, {ZSN: 1001.25, ZSU: 1040.0}, {}, farms)
+    cur = FakeCursor()
+
+    assert w.persist_quotes(cur, 7, T0, rows) == 6
+
+    (t1, quotes), (t2, latest) = executed
+    assert (t1, t2) == ("cbot_quotes", "cbot_quotes_latest")
+    assert sorted(quotes) == sorted((fid, 7, T0, sym, rm, px) for fid, sym, rm, px in rows)
+    assert {(fid, sym) for fid, _, _, sym, _, _ in quotes} == {(f, s) for f in farms for s in (ZSN, ZSU)}
+    # latest aponta para o id devolvido pelo INSERT da mesma linha
+    assert sorted(r[:4] for r in latest) == sorted(
+        (fid, sym, rm, 900 + k) for k, (fid, _, _, sym, rm, _) in enumerate(quotes)
+    )
+
+    (sql, args), = cur.calls  # um UPDATE só para os snapshots de todas as farms
+    assert sql.startswith("UPDATE contract_mtm_snapshots SET dirty = true")
+    assert sorted(zip(*args)) == sorted((fid, sym, rm) for fid, sym, rm, _ in rows)
+
+
+def test_persist_skips_latest_for_conflicting_rows(executed, monkeypatch):
+    rows = [(1, ZSN, RM_N, 1000.0), (2, ZSN, RM_N, 1000.0)]
+
+    def only_farm_2(cur, sql, values, fetch=False, **kw):
+        executed.append((sql.split("INSERT INTO")[1].split()[0], list(values)))
+        if fetch:  # farm 1 já tinha a linha desse capturado_em: ON CONFLICT DO NOTHING
+            return [(900, 2, ZSN, RM_N, 1000.0)]
+        return None
+
+    monkeypatch.setattr(w.psycopg2.extras, "execute_values", only_farm_2)
+    cur = FakeCursor()
+
+    assert w.persist_quotes(cur, 7, T0, rows) == 1
+    assert [r[0] for r in executed[1][1]] == [2]
+    assert list(zip(*cur.calls[0][1])) == [(2, ZSN, RM_N)]
+
+
+def test_persist_without_rows_touches_nothing(executed):
+    cur = FakeCursor()
+    assert w.persist_quotes(cur, 7, T0, []) == 0
+    assert executed == [] and cur.calls == []
@@ -0,0 +1,124 @@
+# workers/tests/test_cbot_quote_source.py
+"""Adapters Yahoo do cbot_worker contra respostas gravadas (quote batch, chart e falha de crumb)."""
+from __future__ import annotations
+
+import pytest
+
+from cbot import cbot_worker as w
+from conftest import FakeResponse, FakeSession, load_fixture
+
+SYMBOLS = ["ZSN26.CBT", "ZSQ26.CBT", "ZSU26.CBT", "ZSX26.CBT"]
+
+CHARTS = {
+    "ZSU26.CBT": "yahoo_chart_no_meta_price.json",
+    "ZSX26.CBT": "yahoo_chart_ZSX26.json",
+}
+
+
+def _routes(crumb=FakeResponse(text="AbC.dEf123"), quote=None):
+    quote = quote or FakeResponse(payload=load_fixture("yahoo_quote_response.json"))
+
+    def route(url, params):
+        if url == w.YahooQuoteSource.COOKIE_URL:
+            return FakeResponse(status_code=404)
+        if url == w.YahooQuoteSource.CRUMB_URL:
+            return crumb
+        if url == w.YahooQuoteSource.QUOTE_URL:
+            return quote() if callable(quote) else quote
+        sym = url.rsplit("/", 1)[-1]
+        return FakeResponse(payload=load_fixture(CHARTS.get(sym, "yahoo_chart_not_found.json")))
+
+    return route
+
+
+@pytest.fixture()
+def http(monkeypatch):
+    def install(routes) -> FakeSession:
+        fake = FakeSession(routes)
+        monkeypatch.setattr(w, "_session", lambda: fake)
+        return fake
+
+    return install
+
+
+def test_parse_quote_response_fixture():
+    out = w.parse_quote_response(load_fixture("yahoo_quote_response.json"), SYMBOLS + ["ZSH26.CBT"])
+
+    # símbolo em caixa diferente casa com o pedido; sem preço / preço 0 / não pedido ficam de fora
+    assert out == {"ZSN26.CBT": 1063.25, "ZSQ26.CBT": 1051.0}
+
+
+def test_chart_meta_price_and_close_fallback(http):
+    http(_routes())
+    assert w.get_last_price("ZSX26.CBT") == 1072.5
+    # sem meta.regularMarketPrice: último close não nulo
+    assert w.get_last_price("ZSU26.CBT") == 1034.75
+    with pytest.raises(RuntimeError, match="sem result"):
+        w.get_last_price("ZSF27.CBT")
+
+
+def test_batch_then_chart_only_for_missing_symbols(http):
+    fake = http(_routes())
+    src = w.YahooQuoteSource()
+
+    out = src.fetch(SYMBOLS, deadline_sec=5)
+
+    assert out == {"ZSN26.CBT": 1063.25, "ZSQ26.CBT": 1051.0, "ZSU26.CBT": 1034.75, "ZSX26.CBT": 1072.5}
+    assert src.fallbacks == 2
+    assert fake.urls("/v7/finance/quote") == [{"symbols": ",".join(SYMBOLS), "crumb": "AbC.dEf123"}]
+    charted = sorted(u.rsplit("/", 1)[-1] for u, _ in fake.calls if "/v8/finance/chart/" in u)
+    assert charted == ["ZSU26.CBT", "ZSX26.CBT"]
+
+
+def test_crumb_reused_across_cycles(http):
+    fake = http(_routes())
+    src = w.YahooQuoteSource()
+    src.fetch(SYMBOLS[:2], deadline_sec=5)
+    src.fetch(SYMBOLS[:2], deadline_sec=5)
+
+    assert len(fake.urls("getcrumb")) == 1
+    assert len(fake.urls("/v7/finance/quote")) == 2
+
+
+@pytest.mark.parametrize(
+    "crumb",
+    [
+        FakeResponse(status_code=429, text="Too Many Requests"),
+        FakeResponse(text="<html><body>consent</body></html>"),
+        FakeResponse(text=""),
+    ],
+)
+def test_crumb_failure_falls_back_to_chart_for_all(http, crumb):
+    fake = http(_routes(crumb=crumb))
+    src = w.YahooQuoteSource()
+
+    out = src.fetch(["ZSU26.CBT", "ZSX26.CBT"], deadline_sec=5)
+
+    assert out == {"ZSU26.CBT": 1034.75, "ZSX26.CBT": 1072.5}
+    assert src.fallbacks == 2
+    assert fake.urls("/v7/finance/quote") == []
+    assert src._crumb is None
+
+
+def test_expired_crumb_is_renewed_once(http):
+    answers = iter([FakeResponse(status_code=401), FakeResponse(payload=load_fixture("yahoo_quote_response.json"))])
+    fake = http(_routes(quote=lambda: next(answers)))
+    src = w.YahooQuoteSource()
+
+    out = src.fetch(["ZSN26.CBT"], deadline_sec=5)
+
+    assert out == {"ZSN26.CBT": 1063.25}
+    assert src.fallbacks == 0
+    assert len(fake.urls("getcrumb")) == 2
+    assert len(fake.urls("/v7/finance/quote")) == 2
+
+
+def test_unauthorized_twice_falls_back_to_chart(http):
+    fake = http(_routes(quote=FakeResponse(status_code=403)))
+    src = w.YahooQuoteSource()
+
+    out = src.fetch(["ZSX26.CBT"], deadline_sec=5)
+
+    assert out == {"ZSX26.CBT": 1072.5}
+    assert src.fallbacks == 1
+    assert len(fake.urls("/v7/finance/quote")) == 2
@@ -0,0 +1,192 @@
+# workers/tests/test_fx_spot_and_rates.py
+"""fx_model_worker: cascata do SpotFeed e cache de taxas invalidado por NOTIFY."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pytest
+from conftest import FakeResponse, FakeSession
+
+from fx_model import fx_model_worker as w
+
+DT = datetime(2026, 10, 19, 13, 0, tzinfo=timezone.utc)
+NOW = int(DT.timestamp())
+
+
+def chart(candles: list[tuple[int, float | None]]) -> dict:
+    return {
+        "chart": {
+            "result": [
+                {
+                    "timestamp": [ts for ts, _ in candles],
+                    "indicators": {"quote": [{"close": [px for _, px in candles]}]},
+                }
+            ]
+        }
+    }
+
+
+def feed_with(candles_by_interval: dict[str, list[tuple[int, float | None]]]) -> w.SpotFeed:
+    """SpotFeed servido por intervalo; intervalo ausente responde 404."""
+
+    def routes(url, params):
+        candles = candles_by_interval.get(params["interval"])
+        if candles is None:
+            return FakeResponse(404, text="not found")
+        return FakeResponse(200, chart([c for c in candles if params["period1"] <= c[0] <= params["period2"]]))
+
+    feed = w.SpotFeed()
+    feed.http = FakeSession(routes)
+    return feed
+
+
+@pytest.fixture(autouse=True)
+def spot_env(monkeypatch):
+    monkeypatch.setattr(w, "SPOT_MAX_GAP_SEC", 300.0)
+    monkeypatch.setattr(w, "SPOT_BUFFER_SEC", 3600.0)
+    monkeypatch.setattr(w, "RETRIES", 1)
+
+
+def intervals(feed: w.SpotFeed) -> list[str]:
+    return [p["interval"] for _, p in feed.http.calls]
+
+
+def test_fresh_1m_candle_needs_no_cascade():
+    feed = feed_with({"1m": [(NOW - 120, 5.40), (NOW - 60, 5.41), (NOW + 60, 9.99)]})
+
+    assert feed.spot_at(DT, deadline_sec=5) == 5.41  # candle depois de dt não entra
+    assert intervals(feed) == ["1m"]
+    assert feed.cascades == 0
+
+
+def test_stale_1m_falls_back_to_next_interval():
+    feed = feed_with({
+        "1m": [(NOW - 301, 5.40)],  # passou de SPOT_MAX_GAP_SEC: buraco real no 1m
+        "5m": [(NOW - 900, 5.30), (NOW - 300, 5.42)],
+    })
+
+    assert feed.spot_at(DT, deadline_sec=5) == 5.42
+    assert intervals(feed) == ["1m", "5m"]
+    assert feed.cascades == 1
+
+
+def test_all_stale_uses_newest_known_candle():
+    feed = feed_with({
+        "1m": [(NOW - 4000, 5.38), (NOW - 3000, None)],  # close nulo é descartado
+        "5m": [(NOW - 3500, 5.39)],
+        "15m": [(NOW - 2000, 5.37)],
+        "1h": [(NOW - 7300, 5.30)],
+        "1d": [(NOW - 200000, 5.20)],
+    })
+
+    assert feed.spot_at(DT, deadline_sec=5) == 5.37
+    assert intervals(feed) == ["1m", "5m", "15m", "1h", "1d"]
+
+
+def test_no_candles_raises():
+    feed = feed_with({})
+    with pytest.raises(RuntimeError):
+        feed.spot_at(DT, deadline_sec=5)
+
+
+def test_buffer_asks_only_for_new_candles_and_drops_old_ones():
+    candles = {"1m": [(NOW - 4000, 5.30), (NOW - 120, 5.40), (NOW - 60, 5.41)]}
+    feed = feed_with(candles)
+
+    assert feed.spot_at(DT, deadline_sec=5) == 5.41
+    first = feed.http.calls[0][1]
+    assert first["period1"] == NOW - 3600  # SPOT_BUFFER_SEC de histórico na 1ª chamada
+    assert feed._ts["1m"] == [NOW - 120, NOW - 60]
+
+    # uma hora depois: pede só do último candle (menos 1, ainda aberto) em diante e
+    # descarta do buffer o que ficou mais velho que SPOT_BUFFER_SEC
+    candles["1m"] = [(NOW - 60, 5.415), (NOW, 5.42), (NOW + 3540, 5.43)]
+    assert feed.spot_at(datetime.fromtimestamp(NOW + 3570, timezone.utc), deadline_sec=5) == 5.43
+    second = feed.http.calls[1][1]
+    assert second["period1"] == NOW - 60 - 60
+    assert feed._ts["1m"] == [NOW, NOW + 3540]
+    assert feed._px["1m"] == [5.42, 5.43]
+
+
+class RatesCursor:
+    """interest_rates/offset_calibration por farm; conta as leituras."""
+
+    def __init__(self, rates: dict[int, tuple[float, float, float]]):
+        self.rates = rates
+        self.reads: list[int] = []
+        self._row = None
+
+    def execute(self, sql, args=None):
+        farm_id = args[0]
+        cdi, sofr, off = self.rates[farm_id]
+        if "interest_rates" in sql:
+            self.reads.append(farm_id)
+            self._row = (cdi, sofr)
+        else:
+            self._row = (off,)
+
+    def fetchone(self):
+        return self._row
+
+
+class FakeNotify:
+    def __init__(self, payload: str):
+        self.payload = payload
+
+
+class FakeListenConn:
+    def __init__(self):
+        self.notifies: list[FakeNotify] = []
+
+    def poll(self):
+        pass
+
+
+def listener_with(monkeypatch, *payloads: str) -> w.RatesListener:
+    monkeypatch.setattr(w.select, "select", lambda r, *_: (r, [], []))
+    listener = w.RatesListener("postgresql://unused")
+    listener.conn = FakeListenConn()
+    listener.conn.notifies = [FakeNotify(p) for p in payloads]
+    return listener
+
+
+def test_notify_invalidates_only_that_farm(monkeypatch):
+    cur = RatesCursor({1: (0.1415, 0.043, 0.0), 2: (0.14, 0.043, 0.001), 3: (0.13, 0.04, 0.0)})
+    rates = w.RatesCache(refresh_sec=3600)
+    for fid in (1, 2, 3):
+        rates.get(cur, fid)
+    assert (rates.loads, cur.reads) == (3, [1, 2, 3])
+
+    cur.rates[2] = (0.15, 0.043, 0.001)  # RatesService grava e dispara NOTIFY rates_changed '2'
+    changed = listener_with(monkeypatch, "2").wait(0)
+    assert changed == [2]
+    for fid in changed:
+        rates.invalidate(fid)
+
+    assert [rates.get(cur, fid) for fid in (1, 2, 3)] == [
+        (0.1415, 0.043, 0.0), (0.15, 0.043, 0.001), (0.13, 0.04, 0.0),
+    ]
+    assert cur.reads == [1, 2, 3, 2]  # só a farm notificada foi relida
+
+
+def test_unparseable_notify_invalidates_all(monkeypatch):
+    cur = RatesCursor({1: (0.14, 0.04, 0.0), 2: (0.14, 0.04, 0.0)})
+    rates = w.RatesCache(refresh_sec=3600)
+    rates.get(cur, 1), rates.get(cur, 2)
+
+    for fid in listener_with(monkeypatch, "").wait(0):
+        rates.invalidate(fid)
+
+    rates.get(cur, 1), rates.get(cur, 2)
+    assert cur.reads == [1, 2, 1, 2]
+
+
+def test_failed_read_is_not_cached():
+    class Empty(RatesCursor):
+        def fetchone(self):
+            return None
+
+    rates = w.RatesCache(refresh_sec=3600)
+    with pytest.raises(RuntimeError):
+        rates.get(Empty({1: (0.14, 0.04, 0.0)}), 1)
+    assert rates.loads == 0
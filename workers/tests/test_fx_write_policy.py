@@ -0,0 +1,145 @@
+# workers/tests/test_fx_write_policy.py
+"""fx_model_worker: quando um run é gravado (FxWritePolicy) e o que cada run gravado leva."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from dateutil import tz
+
+from fx_model import fx_model_worker as w
+
+T0 = datetime(2026, 10, 19, 10, 0, tzinfo=tz.gettz("America/Sao_Paulo"))
+
+
+class FakeCursor:
+    """Sem banco: farm sem run anterior; guarda cada SQL executado."""
+
+    def __init__(self):
+        self.sql: list[str] = []
+
+    def execute(self, sql, args=None):
+        self.sql.append(" ".join(sql.split()))
+
+    def fetchone(self):
+        return (101,) if self.sql and "RETURNING id" in self.sql[-1] else None
+
+    def fetchall(self):
+        return []
+
+
+class FakeRates:
+    def __init__(self, cdi=0.1415, sofr=0.043, offset=0.0):
+        self.value = (cdi, sofr, offset)
+
+    def get(self, cur, farm_id):
+        return self.value
+
+
+@pytest.fixture
+def executed(monkeypatch):
+    """execute_values precisa de conexão real: registra (tabela, linhas) em vez de executar."""
+    calls: list[tuple[str, list]] = []
+
+    def fake_execute_values(cur, sql, values, **kw):
+        calls.append((sql.split("INSERT INTO")[1].split()[0], list(values)))
+
+    monkeypatch.setattr(w.psycopg2.extras, "execute_values", fake_execute_values)
+    return calls
+
+
+def test_policy_reasons():
+    cur, rates = FakeCursor(), FakeRates()
+    policy = w.FxWritePolicy(deadband_bps=2, heartbeat_sec=600, min_interval_sec=30)
+
+    def step(dt, spot):
+        run, _ = w.build_farm_run(cur, rates, 1, dt, spot)
+        reason = policy.reason(cur, 1, dt, run)
+        if reason is not None:
+            policy.advance(1, dt, run)
+        return reason
+
+    assert step(T0, 5.40) == "first"
+    assert step(T0 + timedelta(seconds=5), 5.45) is None  # antes do intervalo mínimo
+    assert step(T0 + timedelta(seconds=35), 5.4005) is None  # ~0.9 bp, dentro da banda
+    assert step(T0 + timedelta(seconds=40), 5.4015) == "spot"
+    assert step(T0 + timedelta(seconds=45), 5.4015) is None
+    assert step(T0 + timedelta(seconds=700), 5.4015) == "heartbeat"
+    rates.value = (0.15, 0.043, 0.0)
+    assert step(T0 + timedelta(seconds=705), 5.4015) == "rates"
+    assert step(T0 + timedelta(days=1), 5.4015) == "day"
+
+
+def test_every_persisted_run_has_full_curve_and_dirties_snapshots(executed):
+    cur = FakeCursor()
+    run, points = w.build_farm_run(cur, FakeRates(), 1, T0, 5.40)
+    n = len(points["ref_mes"])
+    assert n > 0
+
+    # heartbeat com a mesma curva: run novo continua com todos os pontos, latest e snapshots atualizados
+    for k in range(2):
+        executed.clear()
+        cur.sql.clear()
+        run_id = w.persist_run_and_points(cur, 1, T0 + timedelta(minutes=10 * k), run, points)
+
+        assert run_id == 101
+        assert [(table, len(rows)) for table, rows in executed] == [("fx_model_points", n), ("fx_curve_latest", n)]
+        assert {row[0] for row in executed[0][1]} == {run_id}
+        assert any(sql.startswith("UPDATE contract_mtm_snapshots SET dirty = true") for sql in cur.sql)
+
+
+class FailingFarmCursor(FakeCursor):
+    """Farm 2 cai no INSERT do run (depois do spot tick): o savepoint desfaz o que ela já escreveu."""
+
+    def execute(self, sql, args=None):
+        super().execute(sql, args)
+        if "INSERT INTO fx_model_runs" in sql and args[0] == 2:
+            raise RuntimeError("boom")
+
+
+def test_failing_farm_rolls_back_to_savepoint_and_keeps_other_runs(executed):
+    cur = FailingFarmCursor()
+    policy = w.FxWritePolicy()
+
+    written, runs, skipped = w.persist_farm_runs(cur, FakeRates(), policy, [1, 2, 3], T0, T0, 5.40)
+
+    assert [farm_id for farm_id, _, _ in written] == [1, 3]
+    assert all(run["persist_reason"] == "first" for _, run, _ in written)
+    assert len(runs) == 2 and skipped == 0
+    assert [sql for sql in cur.sql if "SAVEPOINT" in sql] == [
+        "SAVEPOINT farm_run", "RELEASE SAVEPOINT farm_run",
+        "SAVEPOINT farm_run", "ROLLBACK TO SAVEPOINT farm_run",
+        "SAVEPOINT farm_run", "RELEASE SAVEPOINT farm_run",
+    ]
+    # farm 2 não chegou aos pontos; 1 e 3 gravaram a curva inteira
+    assert [table for table, _ in executed] == ["fx_model_points", "fx_curve_latest"] * 2
+
+
+def test_farm_without_rates_is_skipped(executed):
+    class NoRatesForFarm2(FakeRates):
+        def get(self, cur, farm_id):
+            if farm_id == 2:
+                raise RuntimeError("Tabela interest_rates vazia para esta fazenda.")
+            return self.value
+
+    cur = FakeCursor()
+    written, _, skipped = w.persist_farm_runs(cur, NoRatesForFarm2(), w.FxWritePolicy(), [1, 2], T0, T0, 5.40)
+
+    assert [farm_id for farm_id, _, _ in written] == [1] and skipped == 0
+    assert [sql for sql in cur.sql if "SAVEPOINT" in sql][-2:] == [
+        "SAVEPOINT farm_run", "ROLLBACK TO SAVEPOINT farm_run",
+    ]
+
+
+def test_skipped_farm_releases_savepoint(executed):
+    cur, rates, policy = FakeCursor(), FakeRates(), w.FxWritePolicy(min_interval_sec=30)
+    written, _, _ = w.persist_farm_runs(cur, rates, policy, [1], T0, T0, 5.40)
+    for farm_id, run, _ in written:
+        policy.advance(farm_id, T0, run)
+
+    cur.sql.clear()
+    later = T0 + timedelta(seconds=5)
+    written, runs, skipped = w.persist_farm_runs(cur, rates, policy, [1], later, later, 5.40)
+
+    assert (written, runs, skipped) == ([], [], 1)
+    assert cur.sql == ["SAVEPOINT farm_run", "RELEASE SAVEPOINT farm_run"]
@@ -0,0 +1,34 @@
+# workers/tests/test_shared_modules.py
+"""Calendário CBOT e curva FX dos workers são os módulos da API (backend/app/utils), não cópias."""
+from __future__ import annotations
+
+from pathlib import Path
+
+from common import contract_calendar, fx_curve, shared
+
+BACKEND_UTILS = Path(__file__).resolve().parents[2] / "backend" / "app" / "utils"
+
+
+def test_backend_dir_points_at_the_api():
+    assert Path(shared.BACKEND_DIR) / "app" / "utils" == BACKEND_UTILS
+
+
+def test_workers_import_the_api_modules():
+    from app.utils import contract_calendar as api_calendar
+    from app.utils import fx_curve as api_fx_curve
+
+    assert Path(api_calendar.__file__) == BACKEND_UTILS / "contract_calendar.py"
+    assert Path(api_fx_curve.__file__) == BACKEND_UTILS / "fx_curve.py"
+    for name in ("symbol_ref_mes", "is_ref_mes", "ref_mes_for", "resolve_symbol"):
+        assert getattr(contract_calendar, name) is getattr(api_calendar, name)
+    for name in ("CouponCurve", "forward_curve", "parse_spreads", "tenor_grid"):
+        assert getattr(fx_curve, name) is getattr(api_fx_curve, name)
+
+
+def test_workers_use_the_shared_functions():
+    from cbot import cbot_worker
+    from fx_model import fx_model_worker
+
+    assert cbot_worker.symbol_ref_mes is contract_calendar.symbol_ref_mes
+    assert fx_model_worker.forward_curve is fx_curve.forward_curve
+    assert fx_model_worker.is_ref_mes is contract_calendar.is_ref_mes